@@ -0,0 +1 @@
+"""Standalone benchmark scripts. Run from the project root, e.g. `python -m benchmarks.bench_fee_issuance`."""
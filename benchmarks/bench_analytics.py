@@ -0,0 +1,53 @@
+"""Benchmark the NumPy department attendance report against row-by-row ORM aggregation."""
+import argparse
+from datetime import date, timedelta
+
+from benchmarks.common import make_app, seed_students, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=2_000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--subjects', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context(), app.test_request_context():
+        from extensions import db
+        from models import Attendance, StudentDetails, Subject
+        from services.analytics import department_report
+        from services.dimensions import dimension_ids
+
+        seed_students(args.students, departments=('CS',))
+        ids = [r[0] for r in db.session.query(StudentDetails.id)]
+        start = date(2026, 1, 5)
+        end = start + timedelta(days=args.days)
+        subject_ids = dimension_ids(Subject, [f'Subject {s}' for s in range(args.subjects)])
+        with timed(f'seed {len(ids) * args.days * args.subjects:,} marks'):
+            for d in range(args.days):
+                day = start + timedelta(days=d)
+                db.session.execute(db.insert(Attendance), [
+                    {'student_id': sid, 'date': day, 'subject_id': subject_ids[f'Subject {s}'],
+                     'status': 'Present' if (sid + d + s) % 6 else 'Absent'}
+                    for sid in ids for s in range(args.subjects)])
+            db.session.commit()
+
+        with timed('ORM row-by-row (attendance_analysis style)'):
+            cells = {}
+            for a in Attendance.query.join(StudentDetails).filter(StudentDetails.department == 'CS',
+                                                                  Attendance.date >= start,
+                                                                  Attendance.date < end):
+                present, total = cells.get((a.student_id, a.subject), (0, 0))
+                cells[(a.student_id, a.subject)] = (present + (a.status == 'Present'), total + 1)
+        db.session.expunge_all()
+        with timed('NumPy report, cold (raw cursor + .npy write)'):
+            report = department_report('CS', start, end)
+        with timed('NumPy report, warm (memory-mapped snapshot)'):
+            department_report('CS', start, end)
+        print(f"   {len(report['rows'])} students x {len(report['subjects'])} subjects, "
+              f"{len(report['weeks'])} weeks, {report['marks']:,} marks")
+
+
+if __name__ == '__main__':
+    main()
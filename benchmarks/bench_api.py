@@ -0,0 +1,120 @@
+"""Benchmark payload size and latency of the /api/v1 JSON endpoints against the HTML pages.
+
+Signs in as one student with a timetable, a term of attendance, fees, leave
+requests, broadcasts and calendar events, then fetches each HTML page and its
+API counterpart ``--requests`` times. Reports bytes on the wire (the API
+uncompressed, gzip and, when the ``brotli`` package is installed, brotli),
+mean latency, and the latency of an If-None-Match revalidation (304).
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import make_app, seed_marks, seed_students
+
+PAIRS = [
+    ('/dashboard', '/api/v1/timetable'),
+    ('/my_attendance', '/api/v1/attendance'),
+    ('/fees', '/api/v1/fees'),
+    ('/leaves', '/api/v1/leaves'),
+    ('/broadcasts', '/api/v1/broadcasts'),
+    ('/calendar', '/api/v1/calendar'),
+]
+
+
+def setup(subjects, fees, leaves, broadcasts, events):
+    from extensions import db
+    from models import Broadcast, ClassAllotment, Event, FacultyDetails, Fee, HODDetails, Leaves, StudentDetails, \
+        TimeSlot, User
+    from services.terms import current_term
+    seed_students(1, departments=('CS',), semesters=(1,), sections=('A',))
+    student = StudentDetails.query.one()
+    student.user.set_password('bench')
+    hod_user = User(username='bench_hod', role='HOD', department='CS')
+    hod_user.set_password('bench')
+    faculty_user = User(username='bench_f', role='Faculty', department='CS')
+    faculty_user.set_password('bench')
+    db.session.add_all([hod_user, faculty_user])
+    db.session.flush()
+    hod = HODDetails(user_id=hod_user.id, department='CS')
+    db.session.add(hod)
+    db.session.flush()
+    faculty = FacultyDetails(user_id=faculty_user.id, department='CS', designation='Lecturer', hod_id=hod.id)
+    db.session.add(faculty)
+    db.session.flush()
+    for n in range(subjects):
+        slot = TimeSlot(hod_id=hod.id, name=f'Slot {n}', day_of_week='Mon Tue Wed Thu Fri'.split()[n % 5],
+                        start_time=f'{9 + n:02d}:00', end_time=f'{10 + n:02d}:00', department='CS')
+        db.session.add(slot)
+        db.session.flush()
+        db.session.add(ClassAllotment(faculty_id=faculty.id, department='CS', course='B.Tech', semester=1,
+                                      class_name='A', subject=f'Subject {n}', slot_id=slot.id))
+    db.session.commit()
+    seed_marks([student.id], [current_term()], 60, subjects)
+
+    today = date.today()
+    db.session.execute(db.insert(Fee), [
+        {'student_id': student.id, 'title': f'Fee {i}', 'amount_paise': 1_250_000 + i,
+         'due_date': today - timedelta(days=30 * i), 'status': 'Paid' if i % 3 else 'Unpaid', 'semester': 1}
+        for i in range(fees)])
+    db.session.execute(db.insert(Leaves), [
+        {'user_id': student.user_id, 'type': 'Casual', 'reason': 'Family function in home town',
+         'start_date': today - timedelta(days=i), 'end_date': today - timedelta(days=i), 'status': 'Approved',
+         'date_submitted': datetime.combine(today - timedelta(days=i), datetime.min.time())} for i in range(leaves)])
+    db.session.execute(db.insert(Broadcast), [
+        {'title': f'Notice {i}', 'content': 'Please note the revised schedule. ' * 6, 'created_by_id': hod_user.id,
+         'scope': 'institution'} for i in range(broadcasts)])
+    db.session.execute(db.insert(Event), [
+        {'title': f'Event {i}', 'description': 'Seminar hall, all students welcome', 'event_date':
+         today.replace(day=1) + timedelta(days=i % 28)} for i in range(events)])
+    db.session.commit()
+    return student.user.username
+
+
+def measure(client, path, requests, headers=None):
+    """(body bytes, mean ms, ETag) of ``requests`` GETs."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers or {})
+    elapsed = (time.perf_counter() - start) / requests * 1000
+    assert response.status_code == 200, (path, response.status_code)
+    return len(response.data), elapsed, response.headers.get('ETag')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--fees', type=int, default=40)
+    parser.add_argument('--leaves', type=int, default=40)
+    parser.add_argument('--broadcasts', type=int, default=100)
+    parser.add_argument('--events', type=int, default=60)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from services import api
+        from services.compression import available
+        username = setup(args.subjects, args.fees, args.leaves, args.broadcasts, args.events)
+        client = app.test_client()
+        client.post('/login', data={'username': username, 'password': 'bench'})
+        print(f'encoder: {"orjson" if api.orjson else "json"}, codings: {", ".join(available())}')
+
+        codings = available()
+        header = f'{"route":<34}{"bytes":>8}' + ''.join(f'{c:>8}' for c in codings) + f'{"ms":>8}{"304 ms":>8}'
+        print(header)
+        for html_path, api_path in PAIRS:
+            size, ms, _ = measure(client, html_path, args.requests)
+            print(f'{html_path:<34}{size:>8}' + ''.join(f'{"":>8}' for _ in codings) + f'{ms:>8.2f}')
+            size, ms, etag = measure(client, api_path, args.requests)
+            compressed = [measure(client, api_path, 1, {'Accept-Encoding': c})[0] for c in codings]
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                assert client.get(api_path, headers={'If-None-Match': etag}).status_code == 304
+            revalidate = (time.perf_counter() - start) / args.requests * 1000
+            print(f'{api_path:<34}{size:>8}' + ''.join(f'{c:>8}' for c in compressed)
+                  + f'{ms:>8.2f}{revalidate:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
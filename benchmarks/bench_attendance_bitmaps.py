@@ -0,0 +1,124 @@
+"""Benchmark the attendance bitsets (`services.bitmaps`) against one row per mark, at 10M marks.
+
+Seeds ``--students`` x ``--subjects`` x ``--days`` x ``--terms`` marks (10M by
+default), builds the bitsets from them, and compares:
+
+* storage: the attendance table and its indexes vs ``attendance_bitmap``
+  (SQLite ``dbstat`` pages, PostgreSQL ``pg_total_relation_size``);
+* one student's term page: decoding rows vs decoding bitsets;
+* one student's per-subject percentages: GROUP BY vs popcounts;
+* a department's term percentages for every (student, subject), the
+  low-attendance report's query: GROUP BY vs popcounts;
+* marking one class: the row upsert alone vs the upsert plus the bitset update.
+"""
+import argparse
+import random
+
+from benchmarks.common import make_app, seed_marks, seed_students, timed
+
+
+def storage(db):
+    """{'rows': bytes, 'bitmaps': bytes} for the two layouts, indexes included."""
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.session.execute(db.text(
+            "SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree('attendance')")).scalar()
+        bitmaps = db.session.execute(db.text("SELECT pg_total_relation_size('attendance_bitmap')")).scalar()
+        return {'rows': int(rows), 'bitmaps': int(bitmaps)}
+    sizes = dict(db.session.execute(db.text('SELECT name, sum(pgsize) FROM dbstat GROUP BY name')).all())
+    indexes = dict(db.session.execute(db.text(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")).all())
+    total = {'rows': 0, 'bitmaps': 0}
+    for name, size in sizes.items():
+        table = indexes.get(name, name)
+        if table == 'attendance':
+            total['rows'] += size
+        elif table == 'attendance_bitmap':
+            total['bitmaps'] += size
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=5_000)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--days', type=int, default=100, help='teaching days per term')
+    parser.add_argument('--terms', type=int, default=4)
+    parser.add_argument('--sample', type=int, default=200, help='students whose pages are read')
+    parser.add_argument('--db-url', help='run against this database instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from extensions import db
+        from models import Attendance, AttendanceBitmap, StudentDetails
+        from services import bitmaps
+        from services.attendance import student_attendance, upsert_attendance
+        from services.terms import current_term, previous_term, term_bounds
+
+        labels = [current_term()]
+        while len(labels) < args.terms:
+            labels.insert(0, previous_term(labels[0]))
+        with timed(f'seed {args.students:,} students'):
+            seed_students(args.students)
+        student_ids = [sid for sid, in db.session.query(StudentDetails.id)]
+        with timed(f'seed {len(labels)} terms of marks'):
+            seed_marks(student_ids, labels, args.days, args.subjects)
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+        marks = db.session.query(db.func.count(Attendance.id)).scalar()
+        with timed('build bitsets from rows'):
+            built = bitmaps.rebuild()
+        print(f'   {marks:,} marks -> {built:,} bitset rows ({db.engine.dialect.name})')
+
+        size = storage(db)
+        print(f"{'storage, one row per mark':<45} {size['rows'] / 2**20:10.1f} MB  "
+              f"({size['rows'] / marks:.1f} B/mark)")
+        print(f"{'storage, bitsets':<45} {size['bitmaps'] / 2**20:10.1f} MB  "
+              f"({size['bitmaps'] / marks:.2f} B/mark, {size['rows'] / size['bitmaps']:.0f}x smaller)")
+
+        sample = random.Random(1).sample(student_ids, min(args.sample, len(student_ids)))
+        start, end = term_bounds(labels[-1])
+        present = db.func.sum(db.case((Attendance.status == 'Present', 1), else_=0))
+        for label, func in (
+            ('student term page, rows', lambda sid: student_attendance(sid, start, end)),
+            ('student term page, bitsets', lambda sid: bitmaps.student_marks(sid, start, end)),
+            ('student subject percentages, GROUP BY', lambda sid: db.session.query(
+                Attendance.subject_id, present, db.func.count()).filter(
+                Attendance.student_id == sid, Attendance.date >= start, Attendance.date < end)
+                .group_by(Attendance.subject_id).all()),
+            ('student subject summary, popcounts', lambda sid: bitmaps.subject_summary(sid, start, end)),
+        ):
+            func(sample[0])  # warm
+            with timed(f'{label} x{len(sample)}'):
+                for sid in sample:
+                    func(sid)
+
+        with timed('department term percentages, GROUP BY'):
+            grouped = db.session.query(Attendance.student_id, Attendance.subject_id, present, db.func.count()) \
+                .join(StudentDetails, StudentDetails.id == Attendance.student_id) \
+                .filter(StudentDetails.department == 'CS', Attendance.date >= start, Attendance.date < end) \
+                .group_by(Attendance.student_id, Attendance.subject_id).all()
+        with timed('department term percentages, popcounts'):
+            counted = [(sid, subject, bitmaps.to_int(p).bit_count(), bitmaps.to_int(s).bit_count())
+                       for sid, subject, s, p in db.session.query(
+                           AttendanceBitmap.student_id, AttendanceBitmap.subject_id, AttendanceBitmap.sessions,
+                           AttendanceBitmap.present)
+                       .join(StudentDetails, StudentDetails.id == AttendanceBitmap.student_id)
+                       .filter(StudentDetails.department == 'CS', AttendanceBitmap.term == labels[-1])]
+        print(f'   {len(grouped):,} vs {len(counted):,} (student, subject) pairs, '
+              f'same totals: {sorted(map(tuple, grouped)) == sorted(counted)}')
+
+        day = end - (end - start) // 2
+        klass = student_ids[:60]
+        marks_for = [{'student_id': sid, 'date': day, 'subject': 'Subject 0', 'status': 'Present'} for sid in klass]
+        for enabled in (False, True):
+            app.config['ATTENDANCE_BITMAPS'] = enabled
+            with timed(f"mark a class of {len(klass)}, {'rows + bitsets' if enabled else 'rows only'} x20"):
+                for _ in range(20):
+                    upsert_attendance(marks_for)
+                    db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark the streaming attendance CSV import: throughput and peak memory."""
+import argparse
+import csv
+import os
+import resource
+import tempfile
+from datetime import date, timedelta
+
+from benchmarks.common import make_app, seed_students, timed
+
+
+def write_csv(path, students, days, subjects):
+    start = date(2024, 1, 1)
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['enrollment_no', 'date', 'subject', 'status'])
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            for subject in subjects:
+                for i in range(students):
+                    writer.writerow([f'EN{i:08d}', day, subject, 'P' if (i + d) % 5 else 'A'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=2_000)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    subjects = [f'Subject {s}' for s in range(args.subjects)]
+    path = os.path.join(tempfile.mkdtemp(prefix='lumen-bench-'), 'attendance.csv')
+    total = args.students * args.days * args.subjects
+    with timed(f'write {total:,}-row CSV'):
+        write_csv(path, args.students, args.days, subjects)
+    print(f'   {os.path.getsize(path) / 1e6:.1f} MB')
+
+    app = make_app()
+    with app.app_context():
+        from services.attendance import import_attendance_csv
+        seed_students(args.students)
+        for label in ('first import', 're-import (all upserts hit existing rows)'):
+            with timed(label), open(path, newline='') as fh:
+                report = import_attendance_csv(fh, batch_size=args.batch_size)
+            print(f"   {report['imported']:,} rows, {report['rows_per_second']:,} rows/s")
+    print(f'peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
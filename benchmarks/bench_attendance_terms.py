@@ -0,0 +1,75 @@
+"""Benchmark term-partitioned attendance (`services.terms`).
+
+Seeds ``--terms`` past terms plus the current one of synthetic marks, then
+times the reads the student pages and exports make (one student's current
+term, one student's full history, a department's current-term count) before
+and after ``archive_terms`` moves the closed terms out of the hot table. On
+PostgreSQL the "before" run already reads a partitioned table (migration 0006),
+so the two runs should match; on SQLite the hot table shrinks to one term.
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.common import make_app, seed_marks, seed_students, timed
+
+
+def run_reads(sample, results, suffix):
+    from services.attendance import count_attendance, student_attendance
+    from services.terms import current_term, term_bounds
+    start, end = term_bounds(current_term())
+    with timed(f'student, current term x{len(sample)} {suffix}', results):
+        for sid in sample:
+            student_attendance(sid, start, end)
+    with timed(f'student, all terms x{len(sample)} {suffix}', results):
+        for sid in sample:
+            student_attendance(sid)
+    with timed(f'department count, current term {suffix}', results):
+        count_attendance('CS', start, end - timedelta(days=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=2_000)
+    parser.add_argument('--terms', type=int, default=3, help='closed terms before the current one')
+    parser.add_argument('--days', type=int, default=40, help='teaching days per term')
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=200, help='students whose pages are read')
+    parser.add_argument('--db-url', help='run against this database instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from extensions import db
+        from models import Attendance, StudentDetails
+        from services.terms import archive_terms, current_term, prepare_terms, previous_term
+
+        labels = [current_term()]
+        while len(labels) <= args.terms:
+            labels.insert(0, previous_term(labels[0]))
+        prepare_terms()
+        with timed(f'seed {args.students:,} students'):
+            seed_students(args.students)
+        student_ids = [sid for sid, in db.session.query(StudentDetails.id)]
+        with timed(f'seed {len(labels)} terms of marks'):
+            seed_marks(student_ids, labels, args.days, args.subjects)
+        total = db.session.query(db.func.count(Attendance.id)).scalar()
+        print(f'   {total:,} marks, {db.engine.dialect.name}')
+
+        sample = random.Random(1).sample(student_ids, min(args.sample, len(student_ids)))
+        results = {}
+        run_reads(sample, {}, '(warm-up)')
+        run_reads(sample, results, '(before)')
+        with timed('archive closed terms'):
+            moved = archive_terms()
+        print(f'   {sum(moved.values()):,} marks in {len(moved)} archived term(s)')
+        if db.engine.dialect.name == 'sqlite':
+            print(f'   {db.session.query(db.func.count(Attendance.id)).scalar():,} left in the hot table')
+        run_reads(sample, results, '(after)')
+        for label in [key for key in results if key.endswith('(before)')]:
+            after = results[label.replace('(before)', '(after)')]
+            print(f'{label[:-9]:<45} {results[label] / after:9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark response compression and HTML minification on the largest pages.
+
+Seeds ``--students`` students (the admin user list renders every one) and a
+term of attendance for one student, then fetches each page plain, gzip and,
+when the ``brotli`` package is installed, brotli, with template minification
+off and then on. Reports bytes per response and the mean latency, so the CPU
+cost of compressing is visible next to the bytes it saves.
+"""
+import argparse
+import time
+from datetime import date
+
+from benchmarks.common import make_app, seed_marks, seed_students
+
+PAGES = [
+    ('admin', '/admin/users'),
+    ('admin', '/fees'),
+    ('student', '/my_attendance'),
+    ('student', '/attendance/analysis'),
+]
+
+
+def measure(client, path, requests, coding=None):
+    headers = {'Accept-Encoding': coding} if coding else {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+    elapsed = (time.perf_counter() - start) / requests * 1000
+    assert response.status_code == 200, (path, response.status_code)
+    return len(response.data), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from extensions import db
+        from models import Fee, StudentDetails
+        from services.terms import current_term
+        seed_students(args.students)
+        first = StudentDetails.query.order_by(StudentDetails.id).first()
+        first.user.set_password('bench')
+        student = first.user.username
+        db.session.execute(db.insert(Fee), [
+            {'student_id': sid, 'title': 'Tuition', 'amount_paise': 4_500_000, 'due_date': date(2026, 7, 1),
+             'status': 'Unpaid', 'semester': 1}
+            for sid, in db.session.query(StudentDetails.id)])
+        db.session.commit()
+        seed_marks([first.id], [current_term()], args.days, 6)
+
+    # Requests run outside the app context: inside one, Flask-Login would reuse the first user it loads
+    from services.compression import MinifyExtension, available
+    clients = {'admin': app.test_client(), 'student': app.test_client()}
+    clients['admin'].post('/login', data={'username': 'admin', 'password': 'admin123'})
+    clients['student'].post('/login', data={'username': student, 'password': 'bench'})
+
+    codings = (None,) + available()
+    print(f'{"page":<24}{"minify":>7}' + ''.join(f'{c or "plain":>10}{"ms":>8}' for c in codings))
+    for minify in (False, True):
+        if minify:
+            app.jinja_env.add_extension(MinifyExtension)
+            app.jinja_env.cache.clear()
+        for role, path in PAGES:
+            row = f'{path:<24}{"on" if minify else "off":>7}'
+            for coding in codings:
+                size, ms = measure(clients[role], path, args.requests, coding)
+                row += f'{size:>10}{ms:>8.1f}'
+            print(row)
+
+if __name__ == '__main__':
+    main()
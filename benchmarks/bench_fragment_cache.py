@@ -0,0 +1,53 @@
+"""Benchmark render time saved by the Jinja fragment cache on the calendar and broadcasts pages."""
+import argparse
+from datetime import date, timedelta
+
+from benchmarks.common import make_app, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from extensions import db
+        from models import User, Event, Broadcast
+        from services.fragments import cache_stats
+
+        student = User(username='bench_student', role='Student', department='CS')
+        student.set_password('bench')
+        db.session.add(student)
+        start = date(2026, 1, 1)
+        db.session.execute(db.insert(Event), [
+            {'title': f'Event {i}', 'description': 'Lorem ipsum dolor sit amet ' * 4,
+             'event_date': start + timedelta(days=i % 365)} for i in range(args.events)])
+        db.session.execute(db.insert(Broadcast), [
+            {'title': f'Notice {i}', 'content': 'Please note ' * 20, 'created_by_id': 1,
+             'scope': 'institution' if i % 2 else 'department', 'department': 'CS'} for i in range(100)])
+        db.session.commit()
+
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench_student', 'password': 'bench'})
+
+        results = {}
+        for path in ('/calendar', '/broadcasts'):
+            app.config['FRAGMENT_CACHE_ENABLED'] = False
+            with timed(f'{path} x{args.requests} (cache off)', results):
+                for _ in range(args.requests):
+                    client.get(path)
+            app.config['FRAGMENT_CACHE_ENABLED'] = True
+            client.get(path)  # warm
+            with timed(f'{path} x{args.requests} (cache on)', results):
+                for _ in range(args.requests):
+                    client.get(path)
+            off = results[f'{path} x{args.requests} (cache off)']
+            on = results[f'{path} x{args.requests} (cache on)']
+            print(f'   saved {(off - on) / args.requests * 1000:.2f} ms per request ({(1 - on / off) * 100:.0f}%)')
+        print('cache:', cache_stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark the schema migrations on a large database: DDL time and how long writers are blocked.
+
+Seeds a synthetic database at revision 0001 (no query-performance indexes),
+then upgrades to head while a background writer keeps inserting events
+through its own connection. Reports the duration of each DDL statement and the
+writer's worst and p99 commit latency during the upgrade, i.e. how long the
+migration held the write lock. On SQLite every CREATE INDEX blocks writers for
+its full duration; pass a PostgreSQL ``--db-url`` to see CREATE INDEX
+CONCURRENTLY leave them running.
+"""
+import argparse
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import column, event, table
+
+from benchmarks.common import make_app, timed
+
+# Revision 0001 shapes of the tables whose names later moved into dimension tables (0008)
+STUDENTS_0001 = table('student_details', column('user_id'), column('enrollment_no'), column('course'),
+                      column('department'), column('class_name'), column('semester'))
+ATTENDANCE_0001 = table('attendance', column('student_id'), column('date'), column('subject'), column('status'))
+
+
+def seed(students, days, subjects, fees_per_student, broadcasts):
+    from extensions import db
+    from models import Broadcast, Fee, User
+    db.session.execute(db.insert(User), [
+        {'username': f'bench_s{i}', 'role': 'Student', 'password_hash': '!', 'image_file': 'default.jpg',
+         'total_leaves': 30, 'leaves_taken': 0, 'department': 'CS'} for i in range(students)])
+    first_id = db.session.query(db.func.min(User.id)).filter(User.username == 'bench_s0').scalar()
+    db.session.execute(db.insert(STUDENTS_0001), [
+        {'user_id': first_id + i, 'enrollment_no': f'EN{i:08d}', 'course': 'B.Tech',
+         'department': ('CS', 'EE', 'ME', 'CE')[i % 4], 'class_name': 'AB'[i // 4 % 2], 'semester': 1}
+        for i in range(students)])
+    ids = [r[0] for r in db.session.execute(db.text('SELECT id FROM student_details'))]
+    start = date(2025, 7, 1)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        db.session.execute(db.insert(ATTENDANCE_0001), [
+            {'student_id': sid, 'date': day, 'subject': f'Subject {s}',
+             'status': 'Present' if (sid + d + s) % 6 else 'Absent'}
+            for sid in ids for s in range(subjects)])
+    db.session.execute(db.insert(Fee), [
+        {'student_id': sid, 'title': f'Term {n}', 'amount_paise': 5_000_000, 'semester': 1,
+         'due_date': start + timedelta(days=30 * n), 'status': 'Paid' if (sid + n) % 3 else 'Pending'}
+        for sid in ids for n in range(fees_per_student)])
+    author_id = db.session.query(db.func.min(User.id)).scalar()
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Broadcast), [
+        {'title': f'Notice {i}', 'content': 'Lorem ipsum', 'created_by_id': author_id,
+         'scope': 'institution' if i % 4 == 0 else 'department', 'department': 'CS',
+         'created_at': now - timedelta(minutes=i), 'updated_at': now, 'is_pinned': i % 50 == 0}
+        for i in range(broadcasts)])
+    db.session.commit()
+
+
+class Writer(threading.Thread):
+    """Insert one event per loop on its own connection, recording each commit latency."""
+
+    def __init__(self, engine):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.latencies = []
+        self.running = True
+
+    def run(self):
+        from models import Event
+        with self.engine.connect() as conn:
+            while self.running:
+                start = time.perf_counter()
+                conn.execute(Event.__table__.insert(), {'title': 'probe', 'event_date': date.today()})
+                conn.commit()
+                self.latencies.append(time.perf_counter() - start)
+                time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=5_000)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--fees-per-student', type=int, default=8)
+    parser.add_argument('--broadcasts', type=int, default=50_000)
+    parser.add_argument('--db-url', help='migrate this database instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, bootstrap=False)
+    with app.app_context():
+        from flask_migrate import upgrade
+        from extensions import db
+        upgrade(revision='0001')
+        marks = args.students * args.days * args.subjects
+        with timed(f'seed {marks:,} marks at revision 0001'):
+            seed(args.students, args.days, args.subjects, args.fees_per_student, args.broadcasts)
+        db.session.remove()
+
+        statements = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('ddl_start', []).append(time.perf_counter())
+
+        @event.listens_for(db.engine, 'after_cursor_execute')
+        def after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info['ddl_start'].pop()
+            if statement.lstrip().upper().startswith(('CREATE', 'DELETE', 'DROP')):
+                statements.append((' '.join(statement.split())[:70], time.perf_counter() - started))
+
+        writer = Writer(db.engine)
+        writer.start()
+        time.sleep(0.2)
+        baseline = len(writer.latencies)
+        with timed('upgrade 0001 -> head'):
+            upgrade()
+        writer.running = False
+        writer.join()
+
+        for statement, seconds in statements:
+            print(f'   {seconds * 1000:9.1f} ms  {statement}')
+        during = sorted(writer.latencies[baseline:]) or [0.0]
+        p99 = during[min(len(during) - 1, int(len(during) * 0.99))]
+        print(f'writer commits during upgrade: {len(during)}, '
+              f'p99 {p99 * 1000:.1f} ms, worst {during[-1] * 1000:.1f} ms (longest time blocked)')
+
+
+if __name__ == '__main__':
+    main()
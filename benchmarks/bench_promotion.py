@@ -0,0 +1,86 @@
+"""Benchmark the semester promotion engine (`services.promotion`) at 50k students.
+
+Compares the set-based promotion (one UPDATE per call, one transaction) with
+promoting the same students one at a time through the ORM, as editing each
+student in the admin UI would. The ORM run uses ``--orm-sample`` students and
+is extrapolated to the full cohort.
+"""
+import argparse
+import time
+
+from benchmarks.common import make_app, seed_students, timed
+
+
+def seed_allotments(departments, semesters, sections, subjects):
+    """One FacultyDetails per department and ``subjects`` allotments per class."""
+    from extensions import db
+    from models import ClassAllotment, Course, Department, FacultyDetails, Section, Subject, User
+    from services.dimensions import dimension_ids
+    department_ids = dimension_ids(Department, departments)
+    course_ids = dimension_ids(Course, ['B.Tech'])
+    section_ids = dimension_ids(Section, sections)
+    subject_ids = dimension_ids(Subject, [f'Subject {sem}.{n}' for sem in semesters for n in range(subjects)])
+    for dept in departments:
+        user = User(username=f'bench_fac_{dept}', role='Faculty', department=dept, password_hash='!')
+        db.session.add(user)
+        db.session.flush()
+        faculty = FacultyDetails(user_id=user.id, department=dept, designation='Lecturer')
+        db.session.add(faculty)
+        db.session.flush()
+        db.session.execute(db.insert(ClassAllotment), [
+            {'faculty_id': faculty.id, 'faculty_name': user.username, 'department_id': department_ids[dept],
+             'course_id': course_ids['B.Tech'], 'semester': sem, 'section_id': section_ids[section],
+             'subject_id': subject_ids[f'Subject {sem}.{n}']}
+            for sem in semesters for section in sections for n in range(subjects)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=50_000)
+    parser.add_argument('--orm-sample', type=int, default=2_000, help='students promoted one at a time')
+    parser.add_argument('--db-url', help='run against this database instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    departments = ('CS', 'EE', 'ME', 'CE')
+    semesters = (1, 3, 5, 7)
+    sections = ('A', 'B')
+    app = make_app(args.db_url)
+    with app.app_context():
+        from extensions import db
+        from models import ClassAllotmentArchive, StudentDetails
+        from services.promotion import promote_semester
+
+        with timed(f'seed {args.students:,} students'):
+            seed_students(args.students, departments=departments, semesters=semesters, sections=sections)
+            seed_allotments(departments, semesters, sections, subjects=5)
+
+        with timed('dry run (whole institution)'):
+            preview = promote_semester(term='bench-1', dry_run=True)
+        print(f"   {preview['promoted']:,} to promote, {preview['allotments_archived']:,} allotments to archive")
+        with timed('promote one department'):
+            one = promote_semester(department='CS', term='bench-1', sections={'A': 'A2'})
+        print(f"   {one['promoted']:,} promoted, {one['sections_renamed']:,} sections renamed")
+        with timed('promote the rest (one transaction each)'):
+            for dept in departments[1:]:
+                promote_semester(department=dept, term='bench-1')
+        try:
+            promote_semester(department='CS', term='bench-1')
+        except ValueError as e:
+            print(f'   second run refused: {e}')
+
+        ids = [sid for sid, in db.session.query(StudentDetails.id).limit(args.orm_sample)]
+        db.session.expire_all()
+        start = time.perf_counter()
+        for sid in ids:  # what editing each student in the admin UI amounts to
+            student = db.session.get(StudentDetails, sid)
+            student.semester = student.semester + 1
+            db.session.commit()
+        per_student = (time.perf_counter() - start) / len(ids)
+        print(f"{'ORM, one student per request (extrapolated)':<45} "
+              f'{per_student * args.students * 1000:10.1f} ms  ({per_student * 1000:.2f} ms/student)')
+        print('archived allotments:', db.session.query(db.func.count(ClassAllotmentArchive.id)).scalar())
+
+
+if __name__ == '__main__':
+    main()
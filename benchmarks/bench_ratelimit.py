@@ -0,0 +1,59 @@
+"""Benchmark sign-in under a credential-stuffing burst, with and without rate limits.
+
+Sends ``--attempts`` wrong-password logins for one username from one client,
+first with rate limiting off and then on with each store. Reports attempts
+served per second, how many reached the password hash check, and the mean
+cost of one bucket take in each store.
+"""
+import argparse
+import time
+
+from benchmarks.common import make_app
+
+MODES = [
+    ('off', {}),
+    ('memory', {'RATELIMIT_ENABLED': True, 'RATELIMIT_STORAGE': 'memory'}),
+    ('sqlite', {'RATELIMIT_ENABLED': True, 'RATELIMIT_STORAGE': 'sqlite'}),
+]
+
+
+def stuff(app, attempts):
+    from models import User
+    checks = []
+    check_password = User.check_password
+    User.check_password = lambda user, password: checks.append(1) or check_password(user, password)
+    try:
+        client = app.test_client()
+        start = time.perf_counter()
+        for _ in range(attempts):
+            client.post('/login', data={'username': 'admin', 'password': 'wrong'})
+        elapsed = time.perf_counter() - start
+    finally:
+        User.check_password = check_password
+    return attempts / elapsed, len(checks)
+
+
+def take_cost(app, takes):
+    store = app.extensions['ratelimit'].store
+    start = time.perf_counter()
+    for i in range(takes):
+        store.take(f'bench:{i % 100}', 1_000_000, 1_000.0)
+    return (time.perf_counter() - start) / takes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--attempts', type=int, default=300)
+    parser.add_argument('--takes', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f'{"limits":<10}{"attempts/s":>12}{"hash checks":>13}{"us/take":>10}')
+    for name, overrides in MODES:
+        app = make_app(**overrides)
+        rate, checks = stuff(app, args.attempts)
+        cost = f'{take_cost(app, args.takes):>10.1f}' if overrides else f'{"-":>10}'
+        print(f'{name:<10}{rate:>12.1f}{checks:>13}{cost}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark worker startup: module import time, create_app, and first-request latency.
+
+Each measurement runs in a fresh interpreter, as a new gunicorn worker would,
+against a database that has already been bootstrapped. Compares
+BOOTSTRAP_ON_STARTUP on (schema work in every worker) with off (production).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+import app as app_module
+from config import Config
+t1 = time.perf_counter()
+
+class ProbeConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ['PROBE_DB']
+    UPLOAD_FOLDER = os.environ['PROBE_UPLOADS']
+    BOOTSTRAP_ON_STARTUP = os.environ['PROBE_BOOTSTRAP'] == '1'
+
+application = app_module.create_app(ProbeConfig)
+t2 = time.perf_counter()
+client = application.test_client()
+client.get('/login')
+t3 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2}))
+'''
+
+
+def probe(env, bootstrap):
+    out = subprocess.run([sys.executable, '-c', PROBE], env=dict(env, PROBE_BOOTSTRAP=bootstrap),
+                         capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='lumen-bench-')
+    env = dict(os.environ, PROBE_DB='sqlite:///' + os.path.join(tmp, 'bench.db'),
+               PROBE_UPLOADS=os.path.join(tmp, 'uploads'))
+    probe(env, '1')  # create and bootstrap the database once, like the release step
+
+    for label, bootstrap in (('BOOTSTRAP_ON_STARTUP=1', '1'), ('BOOTSTRAP_ON_STARTUP=0 (production)', '0')):
+        runs = [probe(env, bootstrap) for _ in range(args.runs)]
+        print(label)
+        for key in ('import', 'create_app', 'first_request'):
+            values = sorted(r[key] * 1000 for r in runs)
+            print(f'   {key:<15} median {values[len(values) // 2]:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark streamed against buffered rendering of the admin user list.
+
+Seeds ``--students`` students and fetches /admin/users with STREAM_TEMPLATES
+off and on. Reports the time to the first body chunk, the time to the last
+one, and the peak Python memory allocated while serving the request
+(tracemalloc), which is what bounds a worker's footprint on large tables.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import make_app, seed_students
+
+
+def fetch(client, path):
+    """(seconds to first chunk, seconds to last chunk, peak bytes, body bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    first_at = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    response.close()
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200, response.status_code
+    return first_at, total, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        seed_students(args.students)
+
+    # Requests run outside the app context so each one gets its own (as under a real server)
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    client.get('/admin/users')  # warm the template cache
+
+    print(f'{"mode":<10}{"first ms":>10}{"total ms":>10}{"peak MB":>10}{"bytes":>12}')
+    for stream in (False, True):
+        app.config['STREAM_TEMPLATES'] = stream
+        runs = [fetch(client, '/admin/users') for _ in range(args.requests)]
+        first, total, peak, size = (min(values) for values in zip(*runs))
+        print(f'{"stream" if stream else "buffered":<10}{first * 1000:>10.1f}{total * 1000:>10.1f}'
+              f'{peak / 1024 / 1024:>10.1f}{size:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark an attendance write burst on SQLite and PostgreSQL.
+
+Simulates the start of a period: ``--faculty`` teachers submit the mark
+attendance form (POST /attendance) at the same time, each for their own class
+of ``--class-size`` students, over ``--days`` dates. Every submission goes
+through the real route, one process per teacher as with gunicorn workers.
+Reports submissions and marks per second, latency percentiles, and failed
+requests (e.g. "database is locked") per backend.
+
+PostgreSQL runs against BENCH_POSTGRES_URL, or a throwaway local server when
+the optional ``pgserver`` package is installed.
+"""
+import argparse
+import multiprocessing
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import make_app, postgres_url, seed_students
+
+
+def setup(faculty, class_size):
+    """One HOD, ``faculty`` teachers, and a class of ``class_size`` students allotted to each."""
+    from extensions import db
+    from models import ClassAllotment, FacultyDetails, HODDetails, User
+    sections = tuple(f'S{i}' for i in range(faculty))
+    seed_students(faculty * class_size, departments=('CS',), semesters=(1,), sections=sections)
+    hod_user = User(username='bench_hod', role='HOD', department='CS')
+    hod_user.set_password('bench')
+    db.session.add(hod_user)
+    db.session.flush()
+    hod = HODDetails(user_id=hod_user.id, department='CS')
+    db.session.add(hod)
+    db.session.flush()
+    allotments = []
+    for i, section in enumerate(sections):
+        user = User(username=f'bench_f{i}', role='Faculty', department='CS')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.flush()
+        profile = FacultyDetails(user_id=user.id, department='CS', designation='Lecturer', hod_id=hod.id)
+        db.session.add(profile)
+        db.session.flush()
+        allotment = ClassAllotment(faculty_id=profile.id, department='CS', class_name=section,
+                                   subject=f'Subject {i % 5}')
+        db.session.add(allotment)
+        db.session.flush()
+        allotments.append((user.username, allotment.id, section))
+    db.session.commit()
+    return allotments
+
+
+def teacher(app, username, allotment_id, student_ids, days, barrier, results):
+    """One teacher's submissions, in a forked worker process with its own connections."""
+    from extensions import db
+    with app.app_context():
+        db.engine.dispose(close=False)  # never share the parent's pooled connections
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': 'bench'})
+    latencies, failures = [], []
+    barrier.wait()
+    for d in range(days):
+        form = {'allotment_id': allotment_id, 'date': (date(2026, 1, 5) + timedelta(days=d)).isoformat()}
+        form.update({f'status_{sid}': 'Present' if (sid + d) % 7 else 'Absent' for sid in student_ids})
+        start = time.perf_counter()
+        response = client.post('/attendance', data=form)
+        if response.status_code == 302:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append(f'HTTP {response.status_code}')
+    results.put((latencies, failures))
+
+
+def burst(app, allotments, days):
+    """Run every teacher in its own process (like gunicorn workers); returns wall time and latencies."""
+    from models import StudentDetails
+    with app.app_context():
+        roster = {section: [sid for sid, in StudentDetails.query.with_entities(StudentDetails.id)
+                            .filter_by(class_name=section)]
+                  for _username, _allotment_id, section in allotments}
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(len(allotments) + 1)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=teacher, args=(app, username, allotment_id, roster[section], days,
+                                                 barrier, results))
+               for username, allotment_id, section in allotments]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    latencies, failures = [], []
+    for _ in workers:
+        worker_latencies, worker_failures = results.get()
+        latencies += worker_latencies
+        failures += worker_failures
+    elapsed = time.perf_counter() - start
+    for w in workers:
+        w.join()
+    return elapsed, sorted(latencies), failures
+
+
+def run(backend, args):
+    db_url = postgres_url() if backend == 'postgresql' else None
+    app = make_app(db_url)
+    with app.app_context():
+        from extensions import db
+        allotments = setup(args.faculty, args.class_size)
+        db.session.remove()
+        db.engine.dispose()
+    elapsed, latencies, failures = burst(app, allotments, args.days)
+    with app.app_context():
+        from extensions import db
+        from models import Attendance
+        marks = db.session.query(db.func.count(Attendance.id)).scalar()
+        db.session.remove()
+        db.engine.dispose()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    return {'backend': backend, 'submits': len(latencies), 'failed': len(failures),
+            'submits_per_s': len(latencies) / elapsed, 'marks_per_s': marks / elapsed,
+            'p50_ms': pct(0.50), 'p95_ms': pct(0.95), 'max_ms': pct(1.0), 'marks': marks,
+            'sample_failure': failures[0] if failures else ''}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', choices=('sqlite', 'postgresql', 'both'), default='both')
+    parser.add_argument('--faculty', type=int, default=16, help='concurrent teachers (processes)')
+    parser.add_argument('--class-size', type=int, default=60)
+    parser.add_argument('--days', type=int, default=10, help='submissions per teacher')
+    args = parser.parse_args()
+
+    backends = ('sqlite', 'postgresql') if args.backend == 'both' else (args.backend,)
+    results = [run(backend, args) for backend in backends]
+    print(f"\n{args.faculty} teachers x {args.days} submissions x {args.class_size} students")
+    print(f"{'backend':<12}{'ok':>6}{'failed':>8}{'submits/s':>11}{'marks/s':>10}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['submits']:>6}{r['failed']:>8}{r['submits_per_s']:>11.1f}"
+              f"{r['marks_per_s']:>10.0f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['max_ms']:>9.1f}")
+        if r['sample_failure']:
+            print(f"   first failure: {r['sample_failure']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Shared helpers for the benchmark scripts: throwaway app, synthetic data, timing."""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from config import Config
+
+_servers = []  # keep throwaway PostgreSQL servers alive until the process exits
+
+
+def make_app(db_url=None, bootstrap=True, **overrides):
+    """Create an app bound to a fresh temporary SQLite DB (or ``db_url``); ``bootstrap=False`` leaves it empty.
+
+    Rate limits are off unless ``overrides`` (extra config values) turn them on.
+    """
+    from app import create_app
+    tmp = tempfile.mkdtemp(prefix='lumen-bench-')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = db_url or 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+        STORAGE_FOLDER = os.path.join(tmp, 'storage')
+        BOOTSTRAP_ON_STARTUP = bootstrap
+        RATELIMIT_ENABLED = False
+        RATELIMIT_SQLITE_PATH = os.path.join(tmp, 'ratelimit.sqlite')
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    return create_app(BenchConfig)
+
+
+def postgres_url(server_url=None):
+    """URL of a new, empty PostgreSQL database for one benchmark run.
+
+    Uses the server at ``server_url`` or BENCH_POSTGRES_URL if set; otherwise
+    starts a throwaway local server with the optional ``pgserver`` package
+    (pip install pgserver).
+    """
+    from uuid import uuid4
+    from sqlalchemy import create_engine, make_url, text
+    url = server_url or os.environ.get('BENCH_POSTGRES_URL')
+    if not url:
+        try:
+            import pgserver
+        except ImportError:
+            raise SystemExit('PostgreSQL benchmarks need BENCH_POSTGRES_URL or `pip install pgserver`.')
+        server = pgserver.get_server(tempfile.mkdtemp(prefix='lumen-pg-'), cleanup_mode='stop')
+        _servers.append(server)
+        url = server.get_uri()
+    name = f'lumen_bench_{uuid4().hex[:8]}'
+    engine = create_engine(url, isolation_level='AUTOCOMMIT')
+    with engine.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE {name}'))
+    engine.dispose()
+    return make_url(url).set(database=name).render_as_string(hide_password=False)
+
+
+def seed_students(n, departments=('CS', 'EE', 'ME', 'CE'), courses=('B.Tech',), semesters=(1, 3, 5, 7),
+                  sections=('A', 'B')):
+    """Bulk-insert ``n`` student users and profiles with Core executemany (no password hashing)."""
+    from extensions import db
+    from models import Course, Department, Section, User, StudentDetails
+    from services.dimensions import dimension_ids
+    department_ids = dimension_ids(Department, departments)
+    course_ids = dimension_ids(Course, courses)
+    section_ids = dimension_ids(Section, sections)
+    users = [{'username': f'bench_s{i}', 'role': 'Student', 'password_hash': '!',
+              'image_file': 'default.jpg', 'total_leaves': 30, 'leaves_taken': 0,
+              'department': departments[i % len(departments)]} for i in range(n)]
+    db.session.execute(db.insert(User), users)
+    first_id = db.session.query(db.func.min(User.id)).filter(User.username == 'bench_s0').scalar()
+    profiles = [{'user_id': first_id + i, 'enrollment_no': f'EN{i:08d}',
+                 'course_id': course_ids[courses[i % len(courses)]],
+                 'department_id': department_ids[departments[i % len(departments)]],
+                 'section_id': section_ids[sections[(i // len(departments)) % len(sections)]],
+                 'semester': semesters[(i // 7) % len(semesters)]} for i in range(n)]
+    db.session.execute(db.insert(StudentDetails), profiles)
+    db.session.commit()
+
+
+def seed_marks(student_ids, labels, days, subjects, batch=50_000):
+    """``days`` weekdays of marks per term, one per subject, for every student."""
+    from extensions import db
+    from models import Attendance, Subject
+    from services.dimensions import dimension_ids
+    from services.terms import term_bounds
+    rng = random.Random(0)
+    subject_ids = dimension_ids(Subject, [f'Subject {n}' for n in range(subjects)])
+    rows = []
+    for label in labels:
+        day = term_bounds(label)[0]
+        for _ in range(days):
+            while day.weekday() >= 5:
+                day += timedelta(days=1)
+            for sid in student_ids:
+                for n in range(subjects):
+                    rows.append({'student_id': sid, 'date': day, 'subject_id': subject_ids[f'Subject {n}'],
+                                 'status': 'Present' if rng.random() < 0.8 else 'Absent'})
+                if len(rows) >= batch:
+                    db.session.execute(db.insert(Attendance), rows)
+                    rows.clear()
+            day += timedelta(days=1)
+    if rows:
+        db.session.execute(db.insert(Attendance), rows)
+    db.session.commit()
+
+
+@contextmanager
+def timed(label, results=None):
+    """Print (and optionally record) the wall time of the enclosed block."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f'{label:<45} {elapsed * 1000:10.1f} ms')
+    if results is not None:
+        results[label] = elapsed
@@ -1,16 +1,14 @@
 #!/usr/bin/env python
 """Check database tables and verify Broadcast table exists."""
 from app import create_app
-from extensions import db
-from sqlalchemy import text
+from services.database import columns, dialect_name, table_names
 
 app = create_app()
 with app.app_context():
-    result = db.session.execute(text("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"))
-    tables = [row[0] for row in result]
+    tables = table_names()
     
     print("=" * 60)
-    print("DATABASE TABLE REPORT")
+    print(f"DATABASE TABLE REPORT ({dialect_name()})")
     print("=" * 60)
     print("\nTables in database:")
     for table in tables:
@@ -23,11 +21,8 @@ with app.app_context():
         print("\n✓ SUCCESS: Broadcast table EXISTS in database!")
         
         # Show table columns
-        result = db.session.execute(text("PRAGMA table_info(broadcast)"))
-        columns = result.fetchall()
         print("\nBroadcast table columns:")
-        for col in columns:
-            col_id, col_name, col_type, notnull, default, pk = col
+        for col_name, col_type in columns('broadcast'):
             print(f"  - {col_name}: {col_type}")
     else:
         print("\n✗ ERROR: Broadcast table NOT found in database!")
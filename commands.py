@@ -0,0 +1,270 @@
+"""Flask CLI commands for batch and maintenance work (run with `flask <group> <command>`)."""
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+fees_cli = AppGroup('fees', help='Fee ledger operations.')
+
+
+@fees_cli.command('issue')
+@click.option('--title', required=True, help='Fee title; one fee per student per title and semester.')
+@click.option('--amount', required=True, help='Amount in rupees, e.g. 45000.00')
+@click.option('--due-date', required=True, help='Due date as YYYY-MM-DD.')
+@click.option('--department', default=None)
+@click.option('--course', default=None)
+@click.option('--semester', type=int, default=None)
+@click.option('--dry-run', is_flag=True, help='Only report how many fees would be issued.')
+def issue_fees_command(title, amount, due_date, department, course, semester, dry_run):
+    """Issue a fee to a whole department/course/semester cohort."""
+    from services.fees import issue_fees
+    result = issue_fees(title=title, amount=amount,
+                        due_date=datetime.strptime(due_date, '%Y-%m-%d').date(),
+                        department=department, course=course, semester=semester, dry_run=dry_run)
+    verb = 'Would issue' if dry_run else 'Issued'
+    click.echo(f"{verb} {result['created']} fee(s) to {result['matched']} matching student(s); "
+               f"{result['existing']} already issued.")
+
+
+jobs_cli = AppGroup('jobs', help='Background job scheduler.')
+
+
+@jobs_cli.command('worker')
+@click.option('--interval', type=int, default=30, help='Seconds between polls for due jobs.')
+def jobs_worker_command(interval):
+    """Run the scheduler loop in the foreground (used by the Procfile worker)."""
+    from flask import current_app
+    from services.jobs import run_worker
+    click.echo(f'Job worker started; polling every {interval}s.')
+    run_worker(current_app._get_current_object(), poll_interval=interval)
+
+
+@jobs_cli.command('run-due')
+def jobs_run_due_command():
+    """Run every job that is currently due, once (e.g. from system cron)."""
+    from services.jobs import sync_jobs, run_due_jobs
+    sync_jobs()
+    ran = run_due_jobs()
+    click.echo(f"Ran {len(ran)} job(s): {', '.join(ran) or '-'}")
+
+
+@jobs_cli.command('run')
+@click.argument('name')
+def jobs_run_command(name):
+    """Run one job now, regardless of its schedule."""
+    from models import Job
+    from services.jobs import sync_jobs, run_job, claim_job
+    sync_jobs()
+    job = Job.query.filter_by(name=name).first()
+    if job is None:
+        raise click.ClickException(f'Unknown job {name!r}')
+    if not claim_job(job.id, datetime.utcnow(), due=False):
+        raise click.ClickException(f'Job {name!r} is running elsewhere')
+    run_job(job)
+    click.echo(f'{job.name}: {job.last_status}' + (f' ({job.last_error})' if job.last_error else ''))
+
+
+@jobs_cli.command('list')
+def jobs_list_command():
+    """Show registered jobs and their last/next runs."""
+    from models import Job
+    from services.jobs import sync_jobs
+    sync_jobs()
+    for job in Job.query.order_by(Job.name).all():
+        click.echo(f'{job.name:<24} {job.schedule:<16} next={job.next_run_at} '
+                   f'last={job.last_run_at} status={job.last_status or "-"}')
+
+
+notes_cli = AppGroup('notes', help='Notes catalogue maintenance.')
+
+
+@notes_cli.command('reconcile')
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+@click.option('--import-loose', is_flag=True,
+              help='Also copy loose files at the top of UPLOAD_FOLDER into the catalogue (the originals stay).')
+def notes_reconcile_command(dry_run, import_loose):
+    """Sync the notes catalogue with the files in UPLOAD_FOLDER."""
+    from services.notes import reconcile_notes
+    report = reconcile_notes(dry_run=dry_run, import_loose=import_loose)
+    prefix = 'Would import' if dry_run else 'Imported'
+    click.echo(f"{prefix} {report['imported']} loose file(s); {report['missing']} catalogue row(s) with missing "
+               f"files; {report['blobs_removed']} unreferenced blob(s); "
+               f"{report['orphan_files']} stored file(s) without a blob row.")
+
+
+search_cli = AppGroup('search', help='Full-text search index.')
+
+
+@search_cli.command('reindex')
+def search_reindex_command():
+    """Rebuild the search index from broadcasts, events, notes and users."""
+    from services.search import reindex
+    click.echo(f'Indexed {reindex()} document(s).')
+
+
+broadcasts_cli = AppGroup('broadcasts', help='Broadcast feed maintenance.')
+
+
+@broadcasts_cli.command('archive')
+@click.option('--months', type=int, default=None, help='Age threshold (default: BROADCAST_ARCHIVE_AFTER_MONTHS).')
+@click.option('--dry-run', is_flag=True, help='Only report how many broadcasts would move.')
+def broadcasts_archive_command(months, dry_run):
+    """Move old unpinned broadcasts into broadcast_archive."""
+    from services.broadcasts import archive_broadcasts
+    count = archive_broadcasts(months=months, dry_run=dry_run)
+    click.echo(f"{'Would archive' if dry_run else 'Archived'} {count} broadcast(s).")
+
+
+attendance_cli = AppGroup('attendance', help='Attendance data operations.')
+
+
+@attendance_cli.command('import')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Rows per transaction.')
+@click.option('--date-format', default=None, help='strptime format if dates are not YYYY-MM-DD, e.g. %d/%m/%Y')
+@click.option('--dry-run', is_flag=True, help='Validate and count rows without writing.')
+def attendance_import_command(csv_path, batch_size, date_format, dry_run):
+    """Import attendance from a CSV of enrollment_no,date,subject,status."""
+    from services.attendance import import_attendance_csv
+
+    def progress(report):
+        click.echo(f"  {report['read']:>12,} rows read, {report['imported']:>12,} upserted "
+                   f"({report['rows_per_second']:,} rows/s)")
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as fh:
+        try:
+            report = import_attendance_csv(fh, batch_size=batch_size, date_format=date_format,
+                                           dry_run=dry_run, progress=progress)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    verb = 'Would upsert' if dry_run else 'Upserted'
+    click.echo(f"{verb} {report['imported']:,} of {report['read']:,} rows in {report['seconds']:.1f}s "
+               f"({report['rows_per_second']:,} rows/s); {report['unknown_student']:,} unknown student(s), "
+               f"{report['invalid']:,} invalid row(s).")
+    for error in report['errors']:
+        click.echo(f'  {error}', err=True)
+
+
+@attendance_cli.command('terms')
+def attendance_terms_command():
+    """List where each academic term's attendance is stored."""
+    from models import AttendanceTerm
+    from services.terms import current_term
+    click.echo(f'Current term: {current_term()}')
+    for term in AttendanceTerm.query.order_by(AttendanceTerm.start_date):
+        archived = f'archived {term.archived_at:%Y-%m-%d}, {term.rows or 0:,} marks' if term.archived_at else 'open'
+        click.echo(f'  {term.term:<8} {term.table_name:<20} {term.storage:<10} {archived}')
+
+
+@attendance_cli.command('archive-terms')
+@click.option('--before', default=None, help='Archive terms that ended before this one (default: current, e.g. 2026-2).')
+@click.option('--dry-run', is_flag=True, help='Only list the terms and how many marks would move.')
+def attendance_archive_terms_command(before, dry_run):
+    """Move closed terms out of the hot attendance table."""
+    import time
+    from services.terms import archive_terms
+    start = time.perf_counter()
+    try:
+        moved = archive_terms(before=before, dry_run=dry_run)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for label, count in moved.items():
+        click.echo(f'  {label:<8} {count:>12,} mark(s)')
+    verb = 'Would archive' if dry_run else 'Archived'
+    click.echo(f'{verb} {len(moved)} term(s) in {time.perf_counter() - start:.1f}s.')
+
+
+@attendance_cli.command('build-bitmaps')
+@click.option('--term', default=None, help='Only this term, e.g. 2026-1 (default: every term).')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Bitsets per insert.')
+def attendance_build_bitmaps_command(term, batch_size):
+    """Rebuild the per-student attendance bitsets from the attendance rows."""
+    import time
+    from services.bitmaps import rebuild
+    start = time.perf_counter()
+    try:
+        written = rebuild(term=term, batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Wrote {written:,} bitset row(s) in {time.perf_counter() - start:.1f}s.')
+
+
+schema_cli = AppGroup('schema', help='Database schema setup.')
+
+
+@schema_cli.command('bootstrap')
+def schema_bootstrap_command():
+    """Create/patch tables and indexes and seed the admin account (run once per deploy)."""
+    import time
+    from services.schema import bootstrap
+    start = time.perf_counter()
+    bootstrap()
+    click.echo(f'Schema bootstrapped in {time.perf_counter() - start:.2f}s.')
+
+
+students_cli = AppGroup('students', help='Student cohort operations.')
+
+
+@students_cli.command('promote')
+@click.option('--department', default=None, help='Only this department (default: all).')
+@click.option('--course', default=None, help='Only this course (default: all).')
+@click.option('--final-semester', type=int, default=8, show_default=True,
+              help='Students in this semester graduate instead of moving up.')
+@click.option('--section', 'sections', multiple=True, metavar='OLD=NEW', help='Rename a section (repeatable).')
+@click.option('--term', default=None, help='Label of the term that is ending (default: current, e.g. 2026-1).')
+@click.option('--clear-timetable', is_flag=True, help="Delete the term's allotments instead of keeping them.")
+@click.option('--dry-run', is_flag=True, help='Only report what would change.')
+@click.option('--force', is_flag=True, help='Promote even if this scope was already promoted for the term.')
+def students_promote_command(department, course, final_semester, sections, term, clear_timetable, dry_run, force):
+    """Move a whole department/course to the next semester at term end."""
+    from services.promotion import parse_sections, promote_semester
+    try:
+        report = promote_semester(department=department, course=course, final_semester=final_semester,
+                                  sections=parse_sections('\n'.join(sections)), term=term,
+                                  keep_timetable=not clear_timetable, dry_run=dry_run, force=force)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for cohort in report['cohorts']:
+        target = f"semester {cohort['to_semester']}" if cohort['to_semester'] else 'graduating'
+        click.echo(f"  {cohort['department']:<20} {cohort['course']:<16} semester {cohort['semester']:>2} -> "
+                   f"{target:<12} {cohort['students']:>8,}")
+    verb = 'Would promote' if dry_run else 'Promoted'
+    click.echo(f"{verb} {report['promoted']:,} student(s) for term {report['term']} in {report['seconds']:.2f}s; "
+               f"{report['graduating']:,} graduating, {report['sections_renamed']:,} section(s) renamed, "
+               f"{report['allotments_archived']:,} allotment(s) archived.")
+
+
+tasks_cli = AppGroup('tasks', help='Background admin tasks (user deletion, imports, exports).')
+
+
+@tasks_cli.command('worker')
+@click.option('--interval', type=int, default=2, help='Seconds between polls for queued tasks.')
+def tasks_worker_command(interval):
+    """Run queued tasks in the foreground (for TASK_RUNNER=worker)."""
+    from flask import current_app
+    from services.tasks import run_worker
+    click.echo(f'Task worker started; polling every {interval}s.')
+    run_worker(current_app._get_current_object(), poll_interval=interval)
+
+
+@tasks_cli.command('list')
+@click.option('--limit', type=int, default=20, show_default=True)
+def tasks_list_command(limit):
+    """Show the most recent tasks and their progress."""
+    from models import Task
+    for row in Task.query.order_by(Task.id.desc()).limit(limit):
+        progress = f'{row.done}/{row.total}' if row.total is not None else str(row.done)
+        click.echo(f'{row.id:>6} {row.kind:<20} {row.status:<10} {progress:>15} '
+                   f'{row.created_at:%Y-%m-%d %H:%M}  {row.error or row.message or ""}')
+
+
+def register_commands(app):
+    app.cli.add_command(fees_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(notes_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(broadcasts_cli)
+    app.cli.add_command(attendance_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(students_cli)
+    app.cli.add_command(tasks_cli)
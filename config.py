@@ -4,4 +4,68 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'neumorphic-secret-key-123'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///college.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine profile (services/database.py). PostgreSQL pool per process: size it so that
+    # (web workers + job worker) x (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under max_connections.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    # SQLite: seconds a writer waits for the lock, and WAL journal mode for concurrent readers
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 15))
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1').lower() in ('1', 'true', 'yes')
+    APP_ENV = os.environ.get('APP_ENV', 'development')
+    # Run the schema bootstrap (services/schema.py) inside create_app. Off in production, where
+    # `flask schema bootstrap` runs once per deploy instead of in every worker.
+    BOOTSTRAP_ON_STARTUP = os.environ.get(
+        'BOOTSTRAP_ON_STARTUP', '0' if APP_ENV == 'production' else '1').lower() in ('1', 'true', 'yes')
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static/uploads')
+    # Content-addressed upload store (services/storage.py), kept out of static/; default instance/storage
+    STORAGE_FOLDER = os.environ.get('STORAGE_FOLDER')
+    # Run the background job scheduler in a thread of the web process instead of a separate worker
+    JOB_SCHEDULER_IN_PROCESS = os.environ.get('JOB_SCHEDULER_IN_PROCESS', '').lower() in ('1', 'true', 'yes')
+    # Background tasks (services/tasks.py): 'thread' runs them in a pool inside each web process,
+    # 'worker' leaves them for `flask tasks worker`, 'inline' runs them during the request
+    TASK_RUNNER = os.environ.get('TASK_RUNNER', 'thread')
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 2))
+    TASK_CHUNK_SIZE = int(os.environ.get('TASK_CHUNK_SIZE', 2000))  # rows per transaction
+    TASK_STALE_AFTER = int(os.environ.get('TASK_STALE_AFTER', 600))  # seconds without a heartbeat
+    # Downloads: Cache-Control max-age for protected files, and optional hand-off to the front server.
+    # USE_X_SENDFILE (Flask built-in) for Apache/lighttpd; X_ACCEL_REDIRECT_PREFIX for nginx.
+    DOWNLOAD_MAX_AGE = 3600
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+    STATIC_FINGERPRINT_MAX_AGE = 31536000
+    # Unpinned broadcasts older than this move to broadcast_archive (archive_broadcasts job)
+    BROADCAST_ARCHIVE_AFTER_MONTHS = int(os.environ.get('BROADCAST_ARCHIVE_AFTER_MONTHS', 6))
+    # Jinja fragment cache ({% cache %} blocks): per-process LRU bounds
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    FRAGMENT_CACHE_MAX_ENTRIES = 512
+    FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    # Response compression (services/compression.py): gzip, or brotli with the optional package,
+    # for text responses of at least COMPRESS_MIN_SIZE bytes. Turn it off when the front server compresses.
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 512))
+    # Strip indentation and blank lines from .html templates when they are loaded
+    MINIFY_HTML = os.environ.get('MINIFY_HTML', '').lower() in ('1', 'true', 'yes')
+    # Stream the long list pages (users, certificates, leaves, fees) as they render (services/streaming.py),
+    # reading their rows STREAM_BATCH_SIZE at a time
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', '1').lower() in ('1', 'true', 'yes')
+    STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+    # Rate limits (services/ratelimit.py) as "<count>/<second|minute|hour|day>" token buckets; "0" turns one off.
+    # Sign-in is limited per client IP and per username before any password is checked; keep the IP limit
+    # generous when a whole campus signs in through one NAT address. Writes are limited per user.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE', 'sqlite')  # 'sqlite' (shared by workers) or 'memory'
+    RATELIMIT_SQLITE_PATH = os.environ.get('RATELIMIT_SQLITE_PATH')  # default: instance/ratelimit.sqlite
+    RATELIMIT_LOGIN_PER_IP = os.environ.get('RATELIMIT_LOGIN_PER_IP', '60/minute')
+    RATELIMIT_LOGIN_PER_USER = os.environ.get('RATELIMIT_LOGIN_PER_USER', '10/minute')
+    RATELIMIT_WRITES = os.environ.get('RATELIMIT_WRITES', '120/minute')
+    RATELIMIT_BULK = os.environ.get('RATELIMIT_BULK', '10/minute')  # imports, exports, bulk fees, starting a promotion
+    # Students below this percentage in any subject appear in the low-attendance report
+    LOW_ATTENDANCE_THRESHOLD = int(os.environ.get('LOW_ATTENDANCE_THRESHOLD', 75))
+    # HOD analytics (services/analytics.py): longest date range in days, and snapshots kept on disk
+    ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', 184))
+    ANALYTICS_MAX_SNAPSHOTS = int(os.environ.get('ANALYTICS_MAX_SNAPSHOTS', 32))
+    # Keep per (student, subject, term) attendance bitsets alongside the mark rows (services/bitmaps.py);
+    # backfill with `flask attendance build-bitmaps` before turning it on for existing data
+    ATTENDANCE_BITMAPS = os.environ.get('ATTENDANCE_BITMAPS', '').lower() in ('1', 'true', 'yes')
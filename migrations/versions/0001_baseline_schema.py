@@ -0,0 +1,335 @@
+"""Baseline schema
+
+Creates every table the app had when migrations were introduced. Databases that
+predate migrations (built by ``db.create_all`` and patched at startup) are
+adopted in place: tables and indexes that already exist are skipped, columns
+added after the first release are added if missing, and the legacy Float
+``fee.amount`` column is converted to integer ``amount_paise``.
+
+Query-performance indexes live in 0002 so they can be built online.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:35:53.832941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _create_table(name, *columns):
+    if not _inspector().has_table(name):
+        op.create_table(name, *columns)
+
+
+def _create_index(name, table, columns, unique=False):
+    if name not in {ix['name'] for ix in _inspector().get_indexes(table)}:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def _add_missing_columns(table, *columns, foreign_keys=()):
+    """Add ``columns`` not yet on ``table``; ``foreign_keys`` are (name, column, referent) for them."""
+    existing = {c['name'] for c in _inspector().get_columns(table)}
+    missing = [c for c in columns if c.name not in existing]
+    if missing:
+        with op.batch_alter_table(table) as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+            for name, column, referent in foreign_keys:
+                if column in {c.name for c in missing}:
+                    batch_op.create_foreign_key(name, referent.split('.')[0], [column], [referent.split('.')[1]])
+
+
+def _adopt_legacy_columns():
+    """Columns the pre-migration startup code patched onto existing databases."""
+    _add_missing_columns('class_allotment',
+                         sa.Column('course', sa.String(length=100), nullable=True),
+                         sa.Column('semester', sa.Integer(), nullable=True),
+                         sa.Column('slot_id', sa.Integer(), nullable=True),
+                         foreign_keys=[('fk_class_allotment_slot_id', 'slot_id', 'time_slot.id')])
+    _add_missing_columns('class_allotment_request',
+                         sa.Column('course', sa.String(length=100), nullable=True),
+                         sa.Column('semester', sa.Integer(), nullable=True))
+    _add_missing_columns('certificate',
+                         sa.Column('upload_id', sa.Integer(), nullable=True),
+                         foreign_keys=[('fk_certificate_upload_id', 'upload_id', 'upload.id')])
+    _add_missing_columns('upload',
+                         sa.Column('subject', sa.String(length=100), nullable=True),
+                         sa.Column('course', sa.String(length=100), nullable=True))
+
+    # fee.amount (Float rupees) -> fee.amount_paise (exact integer paise)
+    fee_columns = {c['name'] for c in _inspector().get_columns('fee')}
+    if 'amount' in fee_columns:
+        _add_missing_columns('fee', sa.Column('amount_paise', sa.BigInteger(), nullable=True))
+        op.execute('UPDATE fee SET amount_paise = CAST(ROUND(amount * 100) AS INTEGER) '
+                   'WHERE amount_paise IS NULL')
+        with op.batch_alter_table('fee') as batch_op:
+            batch_op.drop_column('amount')
+            batch_op.alter_column('amount_paise', existing_type=sa.BigInteger(), nullable=False)
+
+
+def upgrade():
+    _create_table('cached_stat',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'))
+
+    _create_table('event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('event_date', sa.Date(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('schedule', sa.String(length=100), nullable=False),
+        sa.Column('enabled', sa.Boolean(), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), nullable=True),
+        sa.Column('last_run_at', sa.DateTime(), nullable=True),
+        sa.Column('last_status', sa.String(length=20), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_retries', sa.Integer(), nullable=False),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'))
+    _create_index('ix_job_next_run_at', 'job', ['next_run_at'])
+
+    _create_table('search_document',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.Column('audience', sa.String(length=20), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'ref_id', name='uq_search_document_ref'))
+
+    _create_table('stored_file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256'))
+
+    _create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=64), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('image_file', sa.String(length=20), nullable=False),
+        sa.Column('total_leaves', sa.Integer(), nullable=True),
+        sa.Column('leaves_taken', sa.Integer(), nullable=True),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.PrimaryKeyConstraint('id'))
+    _create_index('ix_user_username', 'user', ['username'], unique=True)
+
+    _create_table('broadcast',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_by_id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(length=20), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('is_pinned', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('broadcast_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_by_id', sa.Integer(), nullable=True),
+        sa.Column('scope', sa.String(length=20), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('is_pinned', sa.Boolean(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['created_by_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+    _create_index('ix_broadcast_archive_created_at', 'broadcast_archive', ['created_at'])
+
+    _create_table('hod_details',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('rank', sa.String(length=20), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('leaves',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('reason', sa.Text(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('date_submitted', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('upload',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stored_file_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('uploader_id', sa.Integer(), nullable=True),
+        sa.Column('department', sa.String(length=100), nullable=True),
+        sa.Column('subject', sa.String(length=100), nullable=True),
+        sa.Column('course', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['stored_file_id'], ['stored_file.id'], ),
+        sa.ForeignKeyConstraint(['uploader_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+    _create_index('ix_upload_stored_file_id', 'upload', ['stored_file_id'])
+
+    _create_table('faculty_details',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('designation', sa.String(length=100), nullable=False),
+        sa.Column('hod_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['hod_id'], ['hod_details.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('time_slot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hod_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('day_of_week', sa.String(length=20), nullable=False),
+        sa.Column('start_time', sa.String(length=10), nullable=False),
+        sa.Column('end_time', sa.String(length=10), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.ForeignKeyConstraint(['hod_id'], ['hod_details.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('class_allotment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('faculty_id', sa.Integer(), nullable=False),
+        sa.Column('faculty_name', sa.String(length=100), nullable=True),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('course', sa.String(length=100), nullable=True),
+        sa.Column('semester', sa.Integer(), nullable=True),
+        sa.Column('class_name', sa.String(length=50), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=False),
+        sa.Column('slot_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['faculty_id'], ['faculty_details.id'], ),
+        sa.ForeignKeyConstraint(['slot_id'], ['time_slot.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('class_allotment_request',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('requesting_hod_id', sa.Integer(), nullable=False),
+        sa.Column('faculty_id', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('course', sa.String(length=100), nullable=True),
+        sa.Column('semester', sa.Integer(), nullable=True),
+        sa.Column('class_name', sa.String(length=50), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=False),
+        sa.Column('slot_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=30), nullable=False),
+        sa.Column('responding_hod_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['faculty_id'], ['faculty_details.id'], ),
+        sa.ForeignKeyConstraint(['requesting_hod_id'], ['hod_details.id'], ),
+        sa.ForeignKeyConstraint(['responding_hod_id'], ['hod_details.id'], ),
+        sa.ForeignKeyConstraint(['slot_id'], ['time_slot.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('student_details',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('enrollment_no', sa.String(length=20), nullable=False),
+        sa.Column('course', sa.String(length=100), nullable=False),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('class_name', sa.String(length=50), nullable=False),
+        sa.Column('semester', sa.Integer(), nullable=False),
+        sa.Column('hod_id', sa.Integer(), nullable=True),
+        sa.Column('faculty_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['faculty_id'], ['faculty_details.id'], ),
+        sa.ForeignKeyConstraint(['hod_id'], ['hod_details.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('enrollment_no'))
+
+    _create_table('attendance',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=False),
+        sa.ForeignKeyConstraint(['student_id'], ['student_details.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('certificate',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('file_path', sa.String(length=200), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('date_uploaded', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['student_id'], ['student_details.id'], ),
+        sa.ForeignKeyConstraint(['upload_id'], ['upload.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _create_table('fee',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('amount_paise', sa.BigInteger(), nullable=False),
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('semester', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['student_id'], ['student_details.id'], ),
+        sa.PrimaryKeyConstraint('id'))
+
+    _adopt_legacy_columns()
+
+
+def downgrade():
+    op.drop_table('fee')
+    op.drop_table('certificate')
+    op.drop_table('attendance')
+    op.drop_table('student_details')
+    op.drop_table('class_allotment_request')
+    op.drop_table('class_allotment')
+    op.drop_table('time_slot')
+    op.drop_table('faculty_details')
+    op.drop_table('upload')
+    op.drop_table('leaves')
+    op.drop_table('hod_details')
+    op.drop_table('broadcast_archive')
+    op.drop_table('broadcast')
+    op.drop_table('user')
+    op.drop_table('stored_file')
+    op.drop_table('search_document')
+    op.drop_table('job')
+    op.drop_table('event')
+    op.drop_table('cached_stat')
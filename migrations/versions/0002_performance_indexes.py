@@ -0,0 +1,75 @@
+"""Query-performance indexes
+
+Indexes behind the paginated lists, feeds and the attendance upsert. On
+PostgreSQL each one is built with CREATE INDEX CONCURRENTLY outside the
+migration transaction, so reads and writes to the table carry on while it
+builds. SQLite has no online index build; there the whole database is locked
+for the duration of each CREATE INDEX (see benchmarks/bench_migrations.py for
+timings on a large database).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:02:11.418250
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_event_event_date', 'event', ['event_date'], False),
+    ('ix_fee_student_status', 'fee', ['student_id', 'status'], False),
+    ('ix_fee_due_status', 'fee', ['due_date', 'status'], False),
+    ('ix_broadcast_feed', 'broadcast', ['scope', 'department', 'is_pinned', 'created_at'], False),
+    ('ix_upload_kind_dept_created', 'upload', ['kind', 'department', 'created_at'], False),
+    ('uq_attendance_student_date_subject', 'attendance', ['student_id', 'date', 'subject'], True),
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _existing_indexes(table):
+    return {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def create_index_online(name, table, columns, unique=False):
+    if name in _existing_indexes(table):
+        return
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True,
+                            postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def drop_index_online(name, table):
+    if name not in _existing_indexes(table):
+        return
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+    else:
+        op.drop_index(name, table_name=table)
+
+
+def upgrade():
+    for name, table, columns, unique in INDEXES:
+        if name == 'uq_attendance_student_date_subject' and name not in _existing_indexes(table):
+            # Keep only the latest mark of any duplicates before enforcing uniqueness
+            op.execute('DELETE FROM attendance WHERE id NOT IN '
+                       '(SELECT MAX(id) FROM attendance GROUP BY student_id, date, subject)')
+        create_index_online(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, _columns, _unique in reversed(INDEXES):
+        drop_index_online(name, table)
@@ -0,0 +1,31 @@
+"""Widen user.password_hash to 255 characters
+
+Werkzeug's default scrypt hashes are about 160 characters. SQLite never
+enforced the old VARCHAR(128); PostgreSQL rejects the insert.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:20:42.104733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128),
+                              type_=sa.String(length=255), existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=255),
+                              type_=sa.String(length=128), existing_nullable=True)
@@ -0,0 +1,39 @@
+"""Archive table for class allotments of finished terms
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:21:08.903417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('class_allotment_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('allotment_id', sa.Integer(), nullable=False),
+        sa.Column('term', sa.String(length=20), nullable=False),
+        sa.Column('faculty_id', sa.Integer(), nullable=True),
+        sa.Column('faculty_name', sa.String(length=100), nullable=True),
+        sa.Column('department', sa.String(length=100), nullable=False),
+        sa.Column('course', sa.String(length=100), nullable=True),
+        sa.Column('semester', sa.Integer(), nullable=True),
+        sa.Column('class_name', sa.String(length=50), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=False),
+        sa.Column('slot_id', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_class_allotment_archive_term_dept', 'class_allotment_archive', ['term', 'department'])
+
+
+def downgrade():
+    op.drop_index('ix_class_allotment_archive_term_dept', table_name='class_allotment_archive')
+    op.drop_table('class_allotment_archive')
@@ -0,0 +1,129 @@
+"""Term-partitioned attendance
+
+Adds ``attendance_term``, the registry of where each academic term's marks
+live (see services/terms.py). On PostgreSQL ``attendance`` is rebuilt as a
+table partitioned by range of ``date``, with one partition per term that has
+marks (plus the current and next term) and a default partition. The primary
+key becomes (id, date), as PostgreSQL requires the partition key in every
+unique constraint; ids keep coming from the same sequence. The copy runs
+inside the migration transaction, so schedule it with the deploy.
+
+SQLite has no native partitioning: the table stays as it is and closed terms
+are moved out later by ``flask attendance archive-terms``.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:40:27.118305
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, date, student_id, status, subject'
+
+
+def _term(day):
+    return day.year, 1 if day.month <= 6 else 2
+
+
+def _bounds(year, half):
+    return (date(year, 1, 1), date(year, 7, 1)) if half == 1 else (date(year, 7, 1), date(year + 1, 1, 1))
+
+
+def _terms(first, last):
+    """(year, half) for every term from the one containing ``first`` to the one containing ``last``."""
+    year, half = _term(first)
+    while (year, half) <= _term(last):
+        yield year, half
+        year, half = (year, 2) if half == 1 else (year + 1, 1)
+
+
+def upgrade():
+    op.create_table('attendance_term',
+        sa.Column('term', sa.String(length=10), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('storage', sa.String(length=20), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('term'))
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_attendance()
+
+
+def _partition_attendance():
+    bind = op.get_bind()
+    op.execute('ALTER TABLE attendance RENAME TO attendance_unpartitioned')
+    op.execute('ALTER TABLE attendance_unpartitioned RENAME CONSTRAINT attendance_pkey '
+               'TO attendance_unpartitioned_pkey')
+    op.execute('ALTER INDEX IF EXISTS uq_attendance_student_date_subject '
+               'RENAME TO uq_attendance_unpartitioned')
+    op.execute("""
+        CREATE TABLE attendance (
+            id INTEGER NOT NULL DEFAULT nextval('attendance_id_seq'),
+            date DATE NOT NULL,
+            student_id INTEGER NOT NULL REFERENCES student_details (id),
+            status VARCHAR(10) NOT NULL,
+            subject VARCHAR(100) NOT NULL,
+            CONSTRAINT attendance_pkey PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date)""")
+    op.execute('CREATE UNIQUE INDEX uq_attendance_student_date_subject ON attendance (student_id, date, subject)')
+    op.execute('CREATE TABLE attendance_default PARTITION OF attendance DEFAULT')
+
+    first, last = bind.execute(sa.text('SELECT min(date), max(date) FROM attendance_unpartitioned')).one()
+    today = date.today()
+    first = min(first or today, today)
+    last = max(last or today, today)
+    next_start = _bounds(*_term(last))[1]
+    registry = sa.table('attendance_term', sa.column('term'), sa.column('start_date'), sa.column('end_date'),
+                        sa.column('table_name'), sa.column('storage'))
+    rows = []
+    for year, half in _terms(first, next_start):
+        start, end = _bounds(year, half)
+        name = f'attendance_{year}_{half}'
+        op.execute(f"CREATE TABLE {name} PARTITION OF attendance "
+                   f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+        rows.append({'term': f'{year}-{half}', 'start_date': start, 'end_date': end,
+                     'table_name': name, 'storage': 'partition'})
+    op.bulk_insert(registry, rows)
+
+    op.execute(f'INSERT INTO attendance ({COLUMNS}) SELECT {COLUMNS} FROM attendance_unpartitioned')
+    op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+    op.execute('DROP TABLE attendance_unpartitioned')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE attendance RENAME CONSTRAINT attendance_pkey TO attendance_partitioned_pkey')
+        op.execute('ALTER INDEX uq_attendance_student_date_subject RENAME TO uq_attendance_partitioned')
+        op.execute('ALTER TABLE attendance RENAME TO attendance_partitioned')
+        op.execute("""
+            CREATE TABLE attendance (
+                id INTEGER NOT NULL DEFAULT nextval('attendance_id_seq'),
+                date DATE NOT NULL,
+                student_id INTEGER NOT NULL REFERENCES student_details (id),
+                status VARCHAR(10) NOT NULL,
+                subject VARCHAR(100) NOT NULL,
+                CONSTRAINT attendance_pkey PRIMARY KEY (id)
+            )""")
+        op.execute(f'INSERT INTO attendance ({COLUMNS}) SELECT {COLUMNS} FROM attendance_partitioned')
+        op.execute('ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id')
+        op.execute('DROP TABLE attendance_partitioned')  # and its partitions
+        op.execute('CREATE UNIQUE INDEX uq_attendance_student_date_subject ON attendance (student_id, date, subject)')
+    else:
+        # Put archived terms back into the single table
+        for (name,) in bind.execute(sa.text("SELECT table_name FROM attendance_term WHERE storage = 'table'")):
+            op.execute(f'INSERT OR IGNORE INTO attendance ({COLUMNS}) SELECT {COLUMNS} FROM {name}')
+            op.execute(f'DROP TABLE {name}')
+    op.drop_table('attendance_term')
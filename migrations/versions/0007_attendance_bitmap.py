@@ -0,0 +1,32 @@
+"""Attendance bitsets per student, subject and term
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:05:42.370915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_bitmap',
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('term', sa.String(length=10), nullable=False),
+        sa.Column('subject', sa.String(length=100), nullable=False),
+        sa.Column('sessions', sa.LargeBinary(), nullable=False),
+        sa.Column('present', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['student_id'], ['student_details.id'], ),
+        sa.PrimaryKeyConstraint('student_id', 'term', 'subject'))
+
+
+def downgrade():
+    op.drop_table('attendance_bitmap')
@@ -0,0 +1,190 @@
+"""Department, course, section and subject tables
+
+Students, class allotments, attendance marks and attendance bitsets stored
+the department, course, section (``class_name``) and subject as repeated
+strings. Each name now lives once in ``department``/``course``/``section``/
+``subject`` and those rows hold integer foreign keys; the unique mark index
+and the roster lookups are rebuilt on the integer columns.
+
+The dimension tables are filled from every place a name appears (faculty,
+HOD and user departments too, so the dropdowns keep offering them), then each
+``<name>_id`` column is set from its string and the string column dropped.
+On SQLite the tables are rebuilt (batch mode), including the archived
+``attendance_<year>_<n>`` term tables; on PostgreSQL they are plain ALTERs,
+and the partitioned ``attendance`` table applies them to every partition.
+Faculty, HOD, user, request, archive, broadcast and upload rows keep their
+plain-text names.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 19:12:08.554190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# dimension table -> name length, and every (table, column) its names are collected from
+DIMENSIONS = {
+    'department': (100, [('student_details', 'department'), ('class_allotment', 'department'),
+                         ('faculty_details', 'department'), ('hod_details', 'department'),
+                         ('user', 'department')]),
+    'course': (100, [('student_details', 'course'), ('class_allotment', 'course')]),
+    'section': (50, [('student_details', 'class_name'), ('class_allotment', 'class_name')]),
+    'subject': (100, [('class_allotment', 'subject'), ('attendance', 'subject')]),
+}
+
+# table -> (string column, dimension, id column, nullable)
+REFERENCES = {
+    'student_details': [('department', 'department', 'department_id', False),
+                        ('course', 'course', 'course_id', False),
+                        ('class_name', 'section', 'section_id', False)],
+    'class_allotment': [('department', 'department', 'department_id', False),
+                        ('course', 'course', 'course_id', True),
+                        ('class_name', 'section', 'section_id', False),
+                        ('subject', 'subject', 'subject_id', False)],
+    'attendance': [('subject', 'subject', 'subject_id', False)],
+    'attendance_bitmap': [('subject', 'subject', 'subject_id', False)],
+}
+
+INDEXES = [
+    ('ix_student_details_roster', 'student_details', ['department_id', 'section_id', 'course_id', 'semester']),
+    ('ix_class_allotment_class', 'class_allotment', ['department_id', 'section_id', 'course_id', 'semester']),
+]
+
+
+def _is_postgresql():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _archived_tables():
+    """SQLite term tables moved out of attendance by ``flask attendance archive-terms``."""
+    if _is_postgresql():
+        return []
+    return [name for name, in op.get_bind().execute(sa.text(
+        "SELECT table_name FROM attendance_term WHERE storage = 'table'"))]
+
+
+def _quote(name):
+    return op.get_bind().dialect.identifier_preparer.quote(name)
+
+
+def _bitmap_table(*columns):
+    """``attendance_bitmap`` as it stands before a batch step, with ``columns`` as its subject columns.
+
+    Given to ``batch_alter_table(copy_from=...)`` instead of reflecting the
+    table: reflected, student_id and term keep primary_key=True from the old
+    key in the SQLite copy, and SQLAlchemy warns when ``create_primary_key``
+    declares the new one. Spelled out here, they carry no flag until then.
+    """
+    meta = sa.MetaData()
+    sa.Table('student_details', meta, sa.Column('id', sa.Integer(), primary_key=True))
+    sa.Table('subject', meta, sa.Column('id', sa.Integer(), primary_key=True))
+    return sa.Table('attendance_bitmap', meta,
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('student_details.id'), nullable=False),
+        sa.Column('term', sa.String(length=10), nullable=False),
+        *columns,
+        sa.Column('sessions', sa.LargeBinary(), nullable=False),
+        sa.Column('present', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def _to_ids(table, references, foreign_keys=True, primary_key=None, copy_from=None):
+    for column, dimension, id_column, _nullable in references:
+        op.add_column(table, sa.Column(id_column, sa.Integer(), nullable=True))
+        op.execute(f'UPDATE {_quote(table)} SET {id_column} = '
+                   f'(SELECT id FROM {dimension} WHERE {dimension}.name = {_quote(table)}.{column})')
+    with op.batch_alter_table(table, copy_from=copy_from) as batch_op:
+        for column, dimension, id_column, nullable in references:
+            batch_op.drop_column(column)
+            if not nullable:
+                batch_op.alter_column(id_column, existing_type=sa.Integer(), nullable=False)
+            if foreign_keys:
+                batch_op.create_foreign_key(f'fk_{table}_{id_column}', dimension, [id_column], ['id'])
+        if primary_key:
+            batch_op.create_primary_key(f'{table}_pkey', primary_key)
+
+
+def _to_names(table, references, foreign_keys=True, primary_key=None, copy_from=None):
+    lengths = {dimension: length for dimension, (length, _sources) in DIMENSIONS.items()}
+    for column, dimension, id_column, _nullable in references:
+        op.add_column(table, sa.Column(column, sa.String(length=lengths[dimension]), nullable=True))
+        op.execute(f'UPDATE {_quote(table)} SET {column} = '
+                   f'(SELECT name FROM {dimension} WHERE {dimension}.id = {_quote(table)}.{id_column})')
+    with op.batch_alter_table(table, copy_from=copy_from) as batch_op:
+        for column, dimension, id_column, nullable in references:
+            if foreign_keys:
+                batch_op.drop_constraint(f'fk_{table}_{id_column}', type_='foreignkey')
+            batch_op.drop_column(id_column)
+            if not nullable:
+                batch_op.alter_column(column, existing_type=sa.String(length=lengths[dimension]), nullable=False)
+        if primary_key:
+            batch_op.create_primary_key(f'{table}_pkey', primary_key)
+
+
+def upgrade():
+    archived = _archived_tables()
+    for dimension, (length, sources) in DIMENSIONS.items():
+        if dimension == 'subject':
+            sources = sources + [(table, 'subject') for table in archived]
+        op.create_table(dimension,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=length), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name'))
+        names = ' UNION '.join(f'SELECT {column} AS name FROM {_quote(table)}' for table, column in sources)
+        op.execute(f'INSERT INTO {dimension} (name) SELECT name FROM ({names}) names '
+                   f'WHERE name IS NOT NULL ORDER BY name')
+
+    op.drop_index('uq_attendance_student_date_subject', table_name='attendance')
+    for table, references in REFERENCES.items():
+        if table == 'attendance_bitmap':
+            continue
+        _to_ids(table, references)
+    op.create_index('uq_attendance_student_date_subject', 'attendance', ['student_id', 'date', 'subject_id'],
+                    unique=True)
+    for table in archived:
+        op.drop_index(f'uq_{table}_student_date_subject', table_name=table)
+        _to_ids(table, REFERENCES['attendance'], foreign_keys=False)
+        op.create_index(f'uq_{table}_student_date_subject', table, ['student_id', 'date', 'subject_id'],
+                        unique=True)
+
+    # The bitset's subject is part of its primary key
+    _to_ids('attendance_bitmap', REFERENCES['attendance_bitmap'], primary_key=['student_id', 'term', 'subject_id'],
+            copy_from=_bitmap_table(sa.Column('subject', sa.String(length=100), nullable=False),
+                                    sa.Column('subject_id', sa.Integer(), nullable=True)))
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+
+    _to_names('attendance_bitmap', REFERENCES['attendance_bitmap'], primary_key=['student_id', 'term', 'subject'],
+              copy_from=_bitmap_table(sa.Column('subject_id', sa.Integer(), nullable=False),
+                                      sa.Column('subject', sa.String(length=100), nullable=True),
+                                      sa.ForeignKeyConstraint(['subject_id'], ['subject.id'],
+                                                              name='fk_attendance_bitmap_subject_id')))
+
+    for table in _archived_tables():
+        op.drop_index(f'uq_{table}_student_date_subject', table_name=table)
+        _to_names(table, REFERENCES['attendance'], foreign_keys=False)
+        op.create_index(f'uq_{table}_student_date_subject', table, ['student_id', 'date', 'subject'], unique=True)
+    op.drop_index('uq_attendance_student_date_subject', table_name='attendance')
+    for table, references in reversed(REFERENCES.items()):
+        if table == 'attendance_bitmap':
+            continue
+        _to_names(table, references)
+    op.create_index('uq_attendance_student_date_subject', 'attendance', ['student_id', 'date', 'subject'],
+                    unique=True)
+
+    for dimension in reversed(DIMENSIONS):
+        op.drop_table(dimension)
@@ -0,0 +1,41 @@
+"""Make broadcast.is_pinned NOT NULL
+
+Rows written before the column had a default hold NULL there. The feeds
+order and page on ``is_pinned``, and a NULL drops out of the cursor's tuple
+comparison, so those rows are set to false and the column (in
+``broadcast_archive`` too) becomes NOT NULL with a server default of false.
+Institution broadcasts also get a NULL department (the routes never set one),
+so the institution feed can seek ``ix_broadcast_feed`` on department IS NULL.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 21:04:37.318206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+TABLES = ['broadcast', 'broadcast_archive']
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f'UPDATE {table} SET is_pinned = false WHERE is_pinned IS NULL')
+        op.execute(f"UPDATE {table} SET department = NULL WHERE scope = 'institution'")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('is_pinned', existing_type=sa.Boolean(), nullable=False,
+                                  server_default=sa.false())
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('is_pinned', existing_type=sa.Boolean(), nullable=True,
+                                  server_default=None)
@@ -1,12 +1,14 @@
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from extensions import db
 from flask_login import UserMixin # Keeping for now to avoid breaking existing logic during migration
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))  # scrypt hashes are ~160 characters
     # Roles: Admin, HOD, Asst_HOD, Faculty, Student
     role = db.Column(db.String(20), nullable=False) 
     image_file = db.Column(db.String(20), nullable=False, default='default.jpg')
@@ -49,13 +51,94 @@ class FacultyDetails(db.Model):
     
     assigned_students = db.relationship('StudentDetails', backref='faculty_advisor', lazy='dynamic')
 
+# --- Dimension tables: names stored once, referenced by integer id (services/dimensions.py) ---
+
+class Department(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+class Course(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+class Section(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)  # e.g. A, I-CS
+
+class Subject(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class _NameComparator(Comparator):
+    """SQL side of ``dimension_name``: compares names through the integer key.
+
+    ``StudentDetails.department == 'CS'`` becomes ``department_id = (SELECT id
+    FROM department WHERE name = 'CS')``, so filters use integer indexes; in a
+    SELECT, ORDER BY or DISTINCT the attribute is the name itself.
+    """
+
+    def __init__(self, dimension, key):
+        name = db.select(dimension.name).where(dimension.id == key).correlate_except(dimension).scalar_subquery()
+        # Wrapped so ``key``'s table is in the outer FROM even when the name is selected on its own
+        super().__init__(db.case((key.is_not(None), name)))
+        self.dimension = dimension
+        self.key = key
+
+    def _id_of(self, name):
+        return db.select(self.dimension.id).where(self.dimension.name == name).scalar_subquery()
+
+    def __eq__(self, other):
+        if other is None:
+            return self.key.is_(None)
+        if isinstance(other, _NameComparator) and other.dimension is self.dimension:
+            return self.key == other.key
+        return self.key == self._id_of(other)
+
+    def __ne__(self, other):
+        if other is None:
+            return self.key.isnot(None)
+        return self.key != self._id_of(other)
+
+    def in_(self, names):
+        return self.key.in_(db.select(self.dimension.id).where(self.dimension.name.in_(names)))
+
+    def not_in(self, names):
+        return self.key.not_in(db.select(self.dimension.id).where(self.dimension.name.in_(names)))
+
+    def _bulk_update_tuples(self, value):
+        # query.update({'name': value}) sets the key to that (existing) name's id
+        return [(self.key, self._id_of(value))]
+
+
+def dimension_name(dimension, key, reference):
+    """A ``name`` attribute stored as the foreign key ``key`` into ``dimension``.
+
+    Reads give the name, assignments look the name up (adding it to the
+    dimension if new) and queries compare ids; see ``_NameComparator``.
+    """
+    def fget(self):
+        ref = getattr(self, reference)
+        return ref.name if ref is not None else None
+
+    def fset(self, value):
+        from services.dimensions import dimension as lookup
+        setattr(self, reference, lookup(dimension, value))
+
+    return hybrid_property(fget, fset, custom_comparator=lambda cls: _NameComparator(dimension, getattr(cls, key)))
+
+
 class StudentDetails(db.Model):
+    __table_args__ = (
+        # The class roster behind marking attendance: department + section (+ course, semester)
+        db.Index('ix_student_details_roster', 'department_id', 'section_id', 'course_id', 'semester'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     enrollment_no = db.Column(db.String(20), unique=True, nullable=False)
-    course = db.Column(db.String(100), nullable=False)
-    department = db.Column(db.String(100), nullable=False, default='General')
-    class_name = db.Column(db.String(50), nullable=False, default='A')
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)
     semester = db.Column(db.Integer, nullable=False)
     
     # Assignment
@@ -63,13 +146,54 @@ class StudentDetails(db.Model):
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculty_details.id'), nullable=True)
     
     attendances = db.relationship('Attendance', backref='student', lazy='dynamic', cascade="all, delete-orphan")
+    course_ref = db.relationship(Course, lazy='joined')
+    department_ref = db.relationship(Department, lazy='joined')
+    section_ref = db.relationship(Section, lazy='joined')
+    course = dimension_name(Course, 'course_id', 'course_ref')
+    department = dimension_name(Department, 'department_id', 'department_ref')
+    class_name = dimension_name(Section, 'section_id', 'section_ref')
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('department', 'General')
+        kwargs.setdefault('class_name', 'A')
+        super().__init__(**kwargs)
 
 class Attendance(db.Model):
+    __table_args__ = (
+        # One mark per student per subject per day; also the conflict target for bulk imports
+        db.Index('uq_attendance_student_date_subject', 'student_id', 'date', 'subject_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     student_id = db.Column(db.Integer, db.ForeignKey('student_details.id'), nullable=False)
     status = db.Column(db.String(10), nullable=False) # Present, Absent
-    subject = db.Column(db.String(100), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+
+    subject_ref = db.relationship(Subject, lazy='joined')
+    subject = dimension_name(Subject, 'subject_id', 'subject_ref')
+
+class AttendanceTerm(db.Model):
+    """Where one academic term's attendance is stored (see services/terms.py)."""
+    term = db.Column(db.String(10), primary_key=True)  # e.g. 2026-1 (Jan-Jun), 2026-2 (Jul-Dec)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)  # exclusive
+    table_name = db.Column(db.String(63), nullable=False)
+    storage = db.Column(db.String(20), nullable=False)  # partition (PostgreSQL) or table (SQLite archive)
+    rows = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=True)  # set once the term is closed and moved
+
+class AttendanceBitmap(db.Model):
+    """One student's marks in one subject for one term, as bitsets (see services/bitmaps.py)."""
+    __tablename__ = 'attendance_bitmap'
+    student_id = db.Column(db.Integer, db.ForeignKey('student_details.id'), primary_key=True)
+    term = db.Column(db.String(10), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    sessions = db.Column(db.LargeBinary, nullable=False)  # bit n: a class was marked on term day n
+    present = db.Column(db.LargeBinary, nullable=False)  # bit n: ... and the student was present
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    subject_ref = db.relationship(Subject)
+    subject = dimension_name(Subject, 'subject_id', 'subject_ref')
 
 class Leaves(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,7 +207,7 @@ class Leaves(db.Model):
     # Student: Pending_Faculty -> Pending_HOD -> Approved
     # Faculty: Pending_HOD -> Pending_Admin -> Approved
     # HOD: Pending_Admin -> Approved
-    # Others: Rejected, Revoked
+    # Others: Rejected, Revoked, Expired (still pending after end_date; set by the scheduler)
     status = db.Column(db.String(50), nullable=False, default='Pending') 
     
     date_submitted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -92,29 +216,55 @@ class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    event_date = db.Column(db.Date, nullable=False)
+    event_date = db.Column(db.Date, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Fee(db.Model):
+    __table_args__ = (
+        db.Index('ix_fee_student_status', 'student_id', 'status'),
+        db.Index('ix_fee_due_status', 'due_date', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student_details.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_paise = db.Column(db.BigInteger, nullable=False)  # exact amount in paise (1 INR = 100 paise)
     due_date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.String(20), nullable=False, default='Unpaid')
+    status = db.Column(db.String(20), nullable=False, default='Unpaid')  # Unpaid, Overdue, Paid
     semester = db.Column(db.Integer, nullable=False)
     
     student = db.relationship('StudentDetails', backref=db.backref('fees', lazy='dynamic', cascade="all, delete-orphan"))
 
+    @property
+    def amount(self):
+        """Amount in rupees as an exact Decimal."""
+        if self.amount_paise is None:
+            return None
+        return Decimal(self.amount_paise).scaleb(-2)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_paise = to_paise(value)
+
+
+def to_paise(value):
+    """Convert a rupee amount (str, int, float or Decimal) to integer paise."""
+    if value is None or value == '':
+        return None
+    rupees = Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return int(rupees * 100)
+
 class Certificate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student_details.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
-    file_path = db.Column(db.String(200), nullable=False)
+    file_path = db.Column(db.String(200), nullable=False)  # display filename (legacy rows: name under uploads/certificates)
+    upload_id = db.Column(db.Integer, db.ForeignKey('upload.id'), nullable=True)
     category = db.Column(db.String(50), nullable=False)
     date_uploaded = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     student = db.relationship('StudentDetails', backref=db.backref('certificates', lazy='dynamic', cascade="all, delete-orphan"))
+    upload = db.relationship('Upload')
 
 class TimeSlot(db.Model):
     """Time slots for classes (e.g. Mon 9-10, Tue 11-12). Created by HOD per department."""
@@ -131,17 +281,29 @@ class TimeSlot(db.Model):
 
 
 class ClassAllotment(db.Model):
+    __table_args__ = (
+        # A student's timetable: allotments for their department + section (+ course, semester)
+        db.Index('ix_class_allotment_class', 'department_id', 'section_id', 'course_id', 'semester'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculty_details.id'), nullable=False)
     faculty_name = db.Column(db.String(100), nullable=True)
-    department = db.Column(db.String(100), nullable=False)
-    course = db.Column(db.String(100), nullable=True)       # e.g. B.Tech CS - must match StudentDetails.course
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)  # must match the students' course
     semester = db.Column(db.Integer, nullable=True)          # must match StudentDetails.semester
-    class_name = db.Column(db.String(50), nullable=False)    # section e.g. A, I-CS
-    subject = db.Column(db.String(100), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
     slot_id = db.Column(db.Integer, db.ForeignKey('time_slot.id'), nullable=True)
 
     faculty = db.relationship('FacultyDetails', backref=db.backref('allotments', lazy='dynamic', cascade="all, delete-orphan"))
+    department_ref = db.relationship(Department, lazy='joined')
+    course_ref = db.relationship(Course, lazy='joined')
+    section_ref = db.relationship(Section, lazy='joined')
+    subject_ref = db.relationship(Subject, lazy='joined')
+    department = dimension_name(Department, 'department_id', 'department_ref')
+    course = dimension_name(Course, 'course_id', 'course_ref')  # e.g. B.Tech CS
+    class_name = dimension_name(Section, 'section_id', 'section_ref')  # section e.g. A, I-CS
+    subject = dimension_name(Subject, 'subject_id', 'subject_ref')
 
 
 class ClassAllotmentRequest(db.Model):
@@ -163,8 +325,33 @@ class ClassAllotmentRequest(db.Model):
     responding_hod = db.relationship('HODDetails', foreign_keys=[responding_hod_id])
     faculty = db.relationship('FacultyDetails', backref='allotment_requests_received')
 
+
+class ClassAllotmentArchive(db.Model):
+    """Class allotments of a finished term, copied here by the semester promotion (services/promotion.py)."""
+    __table_args__ = (
+        db.Index('ix_class_allotment_archive_term_dept', 'term', 'department'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    allotment_id = db.Column(db.Integer, nullable=False)  # id the row had in class_allotment
+    term = db.Column(db.String(20), nullable=False)  # e.g. 2026-1 (Jan-Jun), 2026-2 (Jul-Dec)
+    faculty_id = db.Column(db.Integer, nullable=True)  # no FK: history outlives the faculty account
+    faculty_name = db.Column(db.String(100), nullable=True)
+    department = db.Column(db.String(100), nullable=False)
+    course = db.Column(db.String(100), nullable=True)
+    semester = db.Column(db.Integer, nullable=True)
+    class_name = db.Column(db.String(50), nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    slot_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class Broadcast(db.Model):
     """Broadcast messages for institution-wide (Admin) or department-specific (HOD) announcements."""
+    __table_args__ = (
+        # Serves the pinned-first feeds (see services/broadcasts.py)
+        db.Index('ix_broadcast_feed', 'scope', 'department', 'is_pinned', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -173,9 +360,135 @@ class Broadcast(db.Model):
     department = db.Column(db.String(100), nullable=True)  # Only set if scope is 'department'
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
-    is_pinned = db.Column(db.Boolean, default=False)
+    is_pinned = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     
     created_by = db.relationship('User', backref=db.backref('broadcasts', lazy='dynamic'))
 
     def __repr__(self):
-        return f'<Broadcast {self.title}>'
\ No newline at end of file
+        return f'<Broadcast {self.title}>'
+
+
+class BroadcastArchive(db.Model):
+    """Broadcasts moved out of the hot feed by the archival policy; same columns plus archived_at."""
+    id = db.Column(db.Integer, primary_key=True)  # keeps the original broadcast id
+    title = db.Column(db.String(200), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    scope = db.Column(db.String(20), nullable=False)
+    department = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    is_pinned = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Job(db.Model):
+    """Persistent schedule and run state for a background job (see services/jobs.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    schedule = db.Column(db.String(100), nullable=False)  # cron expression: minute hour day month weekday
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # success, retrying, failed
+    last_error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # consecutive failures of the current run
+    max_retries = db.Column(db.Integer, nullable=False, default=3)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.name}>'
+
+
+class Task(db.Model):
+    """One run of a long admin operation and its progress (see services/tasks.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # registered task name, e.g. delete_user
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    done = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)  # None until the task knows its size
+    message = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def percent(self):
+        if self.status == 'succeeded':
+            return 100
+        if not self.total:
+            return None
+        return min(100, int(self.done * 100 / self.total))
+
+    def __repr__(self):
+        return f'<Task {self.id} {self.kind} {self.status}>'
+
+
+class CachedStat(db.Model):
+    """Precomputed dashboard figures, refreshed by the refresh_cached_stats job."""
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, nullable=False)  # JSON
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class StoredFile(db.Model):
+    """A content-addressed blob under UPLOAD_FOLDER/objects, shared by every upload with the same bytes."""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Upload(db.Model):
+    """One uploaded file as the user sees it: display name, uploader and tags, pointing at a blob.
+
+    Rows of kind 'note' double as the notes catalogue (see services/notes.py).
+    """
+    __table_args__ = (
+        db.Index('ix_upload_kind_dept_created', 'kind', 'department', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stored_file_id = db.Column(db.Integer, db.ForeignKey('stored_file.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # note, certificate
+    uploader_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    department = db.Column(db.String(100), nullable=True)
+    subject = db.Column(db.String(100), nullable=True)
+    course = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    blob = db.relationship('StoredFile', backref=db.backref('uploads', lazy='dynamic'))
+    uploader = db.relationship('User', backref=db.backref('uploads', lazy='dynamic'))
+
+    @property
+    def size(self):
+        return self.blob.size
+
+    @property
+    def mime_type(self):
+        return self.blob.mime_type
+
+
+class SearchDocument(db.Model):
+    """Denormalised text of a searchable record; full-text indexed by services/search.py."""
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'ref_id', name='uq_search_document_ref'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # broadcast, event, note, user
+    ref_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    department = db.Column(db.String(100), nullable=True)  # None = visible institution-wide
+    audience = db.Column(db.String(20), nullable=False, default='all')  # all, staff
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,33 +1,26 @@
 """Reset all database data except Admin user(s). Run with: python reset_db_except_admin.py"""
 from app import create_app
-from extensions import db
 
 app = create_app()
 
 with app.app_context():
-    from models import (
-        ClassAllotmentRequest, ClassAllotment, TimeSlot, Attendance,
-        Fee, Certificate, Leaves, Event, StudentDetails, FacultyDetails,
-        HODDetails, User
-    )
+    from models import User
+    from services.users import reset_except_admin, reset_size
 
-    # Delete in dependency order to avoid FK violations
-    ClassAllotmentRequest.query.delete()
-    ClassAllotment.query.delete()
-    TimeSlot.query.delete()
-    Attendance.query.delete()
-    Fee.query.delete()
-    Certificate.query.delete()
-    Leaves.query.delete()
-    Event.query.delete()
-    StudentDetails.query.delete()
-    FacultyDetails.query.delete()
-    HODDetails.query.delete()
+    total = reset_size()
+    deleted = 0
 
-    # Remove all non-Admin users
-    User.query.filter(User.role != 'Admin').delete()
+    def progress(count):
+        global deleted
+        deleted += count
+        print(f"  {deleted:>10,} / {total:,} rows deleted", end='\r', flush=True)
 
-    db.session.commit()
+    # Deletes in dependency order, a chunk per transaction, so the app stays usable meanwhile
+    summary = reset_except_admin(chunk_size=app.config['TASK_CHUNK_SIZE'], progress=progress)
+    print()
+    for table, count in summary.items():
+        if count:
+            print(f"  {table:<28} {count:>10,}")
     admin_count = User.query.filter_by(role='Admin').count()
     print(f"Database reset complete. {admin_count} Admin user(s) retained. All other data removed.")
     print("Login with admin / admin123")
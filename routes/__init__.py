@@ -3,5 +3,6 @@ from routes.auth import auth_bp
 from routes.main import main_bp
 from routes.admin import admin_bp
 from routes.hod import hod_bp
+from routes.api import api_bp
 
-__all__ = ['auth_bp', 'main_bp', 'admin_bp', 'hod_bp']
+__all__ = ['auth_bp', 'main_bp', 'admin_bp', 'hod_bp', 'api_bp']
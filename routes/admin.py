@@ -1,12 +1,11 @@
-"""Admin routes: panel, user management, fees, certificates, events."""
-import os
+"""Admin routes: panel, user management, fees, certificates, events, background tasks."""
 from datetime import datetime
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
 from extensions import db
+from services.ratelimit import limit_request, rate_limited
 from utils import role_required
 
 admin_bp = Blueprint('admin', __name__)
@@ -16,24 +15,50 @@ admin_bp = Blueprint('admin', __name__)
 @login_required
 @role_required('Admin')
 def admin_panel():
-    from models import User, StudentDetails, FacultyDetails, Leaves, Fee, HODDetails
-    stats = {
-        'total_users': User.query.count(),
-        'total_students': StudentDetails.query.count(),
-        'total_faculty': FacultyDetails.query.count(),
-        'pending_leaves': Leaves.query.filter_by(status='Pending_Admin').count(),
-        'total_revenue': db.session.query(db.func.sum(Fee.amount)).filter(Fee.status == 'Paid').scalar() or 0
-    }
+    from models import User, FacultyDetails, HODDetails
+    from services.stats import admin_stats
+    stats = admin_stats()
     all_faculty = FacultyDetails.query.join(User).order_by(User.department.asc()).all()
     all_hods = HODDetails.query.join(User).order_by(User.department.asc(), HODDetails.rank.asc()).all()
     return render_template('admin_panel.html', stats=stats, faculty=all_faculty, hods=all_hods)
 
 
+@admin_bp.route('/admin/cache/stats')
+@login_required
+@role_required('Admin')
+def cache_stats():
+    """Fragment cache hit/miss metrics for this worker process."""
+    from services.fragments import cache_stats as fragment_stats
+    return jsonify(fragment_stats())
+
+
+@admin_bp.route('/admin/compression/stats')
+@login_required
+@role_required('Admin')
+def compression_stats():
+    """Bytes rendered and sent per route (and saved by compression) for this worker process."""
+    from services.compression import compression_stats as route_stats
+    return jsonify(route_stats())
+
+
+@admin_bp.route('/admin/ratelimit/stats')
+@login_required
+@role_required('Admin')
+def ratelimit_stats():
+    """Requests allowed and refused per rate limit scope for this worker process."""
+    from services.ratelimit import ratelimit_stats as limit_stats
+    return jsonify(limit_stats())
+
+
 @admin_bp.route('/admin/users', methods=['GET', 'POST'])
 @login_required
 @role_required('Admin')
+@rate_limited()
 def manage_users():
-    from models import User, StudentDetails, FacultyDetails, HODDetails
+    from sqlalchemy.orm import joinedload
+    from models import Course, Department, User, StudentDetails, FacultyDetails, HODDetails
+    from services.dimensions import dimension, names
+    from services.streaming import render_page, stream_rows
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
@@ -69,11 +94,13 @@ def manage_users():
             new_user.department = dept
             faculty = FacultyDetails(user_id=new_user.id, department=dept, designation=desig, hod_id=hod_id)
             db.session.add(faculty)
+            dimension(Department, dept)
         elif role == 'HOD':
             dept = request.form.get('hod_department')
             rank = request.form.get('hod_rank')
             hod = HODDetails(user_id=new_user.id, department=dept, rank=rank)
             db.session.add(hod)
+            dimension(Department, dept)
 
         db.session.commit()
         flash('User created successfully!', 'success')
@@ -81,79 +108,76 @@ def manage_users():
 
     filter_role = request.args.get('filter_role', '')
     filter_department = request.args.get('filter_department', '')
-
-    faculty_details = FacultyDetails.query.all()
-    student_users = User.query.filter_by(role='Student').all()
-    admin_users = User.query.filter_by(role='Admin').all()
-    hods = HODDetails.query.all()
-    hods_sorted = sorted(hods, key=lambda h: (h.department or '', h.rank or ''))
-
-    if filter_role or filter_department:
-        if filter_role == 'Admin':
-            hods_sorted, faculty_details, student_users = [], [], []
-        elif filter_role == 'HOD':
-            admin_users = []
-            hods_sorted = [h for h in hods_sorted if not filter_department or h.department == filter_department]
-            faculty_details, student_users = [], []
-        elif filter_role == 'Faculty':
-            admin_users, hods_sorted = [], []
-            faculty_details = [f for f in faculty_details if not filter_department or f.department == filter_department]
-            student_users = []
-        elif filter_role == 'Student':
-            admin_users, hods_sorted, faculty_details = [], [], []
-            student_users = [s for s in student_users if s.student_profile and (not filter_department or s.student_profile.department == filter_department)]
-        else:
+    role = filter_role if filter_role in ('Admin', 'HOD', 'Faculty', 'Student') else ''
+
+    # Admins and HODs are a handful of rows; faculty and students stream from yield_per queries
+    admin_users, hods_sorted, faculty_details, student_users = [], [], [], []
+    if role == 'Admin' or not (role or filter_department):
+        admin_users = User.query.filter_by(role='Admin').all()
+    if role in ('', 'HOD'):
+        hods = HODDetails.query.options(joinedload(HODDetails.user))
+        if filter_department:
+            hods = hods.filter(HODDetails.department == filter_department)
+        hods_sorted = hods.order_by(HODDetails.department, HODDetails.rank).all()
+    if role in ('', 'Faculty'):
+        faculty = FacultyDetails.query.options(
+            joinedload(FacultyDetails.user), joinedload(FacultyDetails.hod).joinedload(HODDetails.user))
+        if filter_department:
+            faculty = faculty.filter(FacultyDetails.department == filter_department)
+        faculty_details = stream_rows(faculty.order_by(FacultyDetails.id))
+    if role in ('', 'Student'):
+        students = User.query.filter(User.role == 'Student').options(
+            joinedload(User.student_profile).joinedload(StudentDetails.hod).joinedload(HODDetails.user))
+        if role or filter_department:
+            # Filtered lists only show students with a profile
+            students = students.join(StudentDetails, StudentDetails.user_id == User.id)
             if filter_department:
-                admin_users = []
-                hods_sorted = [h for h in hods_sorted if h.department == filter_department]
-                faculty_details = [f for f in faculty_details if f.department == filter_department]
-                student_users = [s for s in student_users if s.student_profile and s.student_profile.department == filter_department]
+                students = students.filter(StudentDetails.department == filter_department)
+        student_users = stream_rows(students.order_by(User.id))
 
     dept_rows = db.session.query(HODDetails.department).distinct().all()
-    f_dept_rows = db.session.query(FacultyDetails.department).distinct().all()
-    s_dept_rows = db.session.query(StudentDetails.department).distinct().all()
-    all_dept_set = set(d[0] for d in dept_rows if d[0]) | set(d[0] for d in f_dept_rows if d[0]) | set(d[0] for d in s_dept_rows if d[0])
     departments = sorted(list(set(d[0] for d in dept_rows if d[0])))
-    all_departments = sorted(list(all_dept_set))
-    courses_query = db.session.query(StudentDetails.course).distinct().all()
-    courses = sorted([c[0] for c in courses_query if c[0]])
+    all_departments = names(Department)
+    courses = names(Course)
 
-    return render_template('manage_users.html', faculty=faculty_details, students=student_users,
-                          admins=admin_users, hods=hods_sorted, departments=departments, courses=courses,
-                          filter_role=filter_role, filter_department=filter_department, all_departments=all_departments)
+    return render_page('manage_users.html', faculty=faculty_details, students=student_users,
+                       admins=admin_users, hods=hods_sorted, departments=departments, courses=courses,
+                       filter_role=filter_role, filter_department=filter_department, all_departments=all_departments)
 
 
 @admin_bp.route('/admin/user/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 @role_required('Admin')
 def edit_user(id):
-    from models import User, StudentDetails, FacultyDetails, HODDetails
+    from models import Course, Department, User
+    from services.dimensions import dimension, names
+    from services.fragments import bump_version
     user = User.query.get_or_404(id)
     if request.method == 'POST':
+        renamed = user.username != request.form.get('username')
         user.username = request.form.get('username')
         if request.form.get('password'):
             user.set_password(request.form.get('password'))
 
         if user.role == 'Student':
             user.student_profile.enrollment_no = request.form.get('enrollment_no')
-            user.student_profile.course = request.form.get('course')
-            user.student_profile.department = request.form.get('department')
+            # Blank keeps the current name: the profile must always reference a course and department
+            user.student_profile.course = request.form.get('course') or user.student_profile.course
+            user.student_profile.department = request.form.get('department') or user.student_profile.department
             user.student_profile.semester = request.form.get('semester')
         elif user.role == 'Faculty':
             user.faculty_profile.department = request.form.get('department')
             user.faculty_profile.designation = request.form.get('designation')
+            dimension(Department, user.faculty_profile.department)
 
+        bump_version('allotments')
+        if renamed:
+            bump_version('broadcasts')  # the cached feeds show each author's username
         db.session.commit()
         flash('User updated successfully!', 'success')
         return redirect(url_for('admin.manage_users'))
 
-    f_depts = db.session.query(FacultyDetails.department).distinct().all()
-    s_depts = db.session.query(StudentDetails.department).distinct().all()
-    hod_depts = db.session.query(HODDetails.department).distinct().all()
-    departments = sorted(list(set([d[0] for d in f_depts if d[0]] + [d[0] for d in s_depts if d[0]] + [d[0] for d in hod_depts if d[0]])))
-    courses_query = db.session.query(StudentDetails.course).distinct().all()
-    courses = sorted([c[0] for c in courses_query if c[0]])
-    return render_template('edit_user.html', user=user, departments=departments, courses=courses)
+    return render_template('edit_user.html', user=user, departments=names(Department), courses=names(Course))
 
 
 @admin_bp.route('/admin/user/delete/<int:id>')
@@ -161,19 +185,20 @@ def edit_user(id):
 @role_required('Admin')
 def delete_user(id):
     from models import User
+    from services.tasks import enqueue
     if current_user.id == id:
         flash('You cannot delete yourself!', 'danger')
         return redirect(url_for('admin.manage_users'))
     user = User.query.get_or_404(id)
-    db.session.delete(user)
-    db.session.commit()
-    flash(f'User {user.username} and all associated data deleted!', 'warning')
-    return redirect(url_for('admin.manage_users'))
+    task = enqueue('delete_user', {'user_id': user.id}, user=current_user)
+    flash(f'Deleting {user.username} and all associated data in the background.', 'warning')
+    return redirect(url_for('admin.view_task', id=task.id))
 
 
 @admin_bp.route('/admin/fees/add', methods=['POST'])
 @login_required
 @role_required('Admin')
+@rate_limited()
 def add_fee():
     from models import Fee
     student_id = request.form.get('student_id')
@@ -188,11 +213,175 @@ def add_fee():
     return redirect(url_for('main.view_fees'))
 
 
+@admin_bp.route('/admin/fees/bulk', methods=['POST'])
+@login_required
+@role_required('Admin')
+@rate_limited('bulk')
+def bulk_issue_fees():
+    from services.fees import issue_fees
+    title = request.form.get('title', '').strip()
+    amount = request.form.get('amount')
+    due_date_str = request.form.get('due_date')
+    if not title or not amount or not due_date_str:
+        flash('Title, amount and due date are required for bulk issuance.', 'danger')
+        return redirect(url_for('main.view_fees'))
+
+    result = issue_fees(
+        title=title,
+        amount=amount,
+        due_date=datetime.strptime(due_date_str, '%Y-%m-%d').date(),
+        department=request.form.get('department', '').strip() or None,
+        course=request.form.get('course', '').strip() or None,
+        semester=request.form.get('semester', type=int),
+        dry_run=bool(request.form.get('dry_run')),
+    )
+    if request.form.get('dry_run'):
+        flash(f"Dry run: {result['created']} fee(s) would be issued to {result['matched']} matching student(s); "
+              f"{result['existing']} already have this fee.", 'info')
+    else:
+        flash(f"Issued {result['created']} fee(s); {result['existing']} student(s) already had this fee.", 'success')
+    return redirect(url_for('main.view_fees'))
+
+
+@admin_bp.route('/admin/attendance/import', methods=['POST'])
+@login_required
+@role_required('Admin')
+@rate_limited('bulk')
+def import_attendance():
+    import os
+    import uuid
+    from services.tasks import enqueue, task_dir
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash('Please choose a CSV file to import.', 'danger')
+        return redirect(url_for('admin.admin_panel'))
+
+    # Saved in chunks by Werkzeug; the task reads it from disk and removes it when done
+    path = os.path.join(task_dir(), f'import-{uuid.uuid4().hex}.csv')
+    file.save(path)
+    task = enqueue('import_attendance', {'path': path,
+                                         'date_format': request.form.get('date_format') or None,
+                                         'dry_run': bool(request.form.get('dry_run'))}, user=current_user)
+    return redirect(url_for('admin.view_task', id=task.id))
+
+
+@admin_bp.route('/admin/attendance/export', methods=['POST'])
+@login_required
+@role_required('Admin')
+@rate_limited('bulk')
+def export_attendance():
+    from services.tasks import enqueue
+    params = {key: request.form.get(key, '').strip() or None for key in ('department', 'start', 'end')}
+    try:
+        for key in ('start', 'end'):
+            if params[key]:
+                datetime.strptime(params[key], '%Y-%m-%d')
+    except ValueError:
+        flash('Dates must be YYYY-MM-DD.', 'danger')
+        return redirect(url_for('admin.admin_panel'))
+    task = enqueue('export_attendance', params, user=current_user)
+    return redirect(url_for('admin.view_task', id=task.id))
+
+
+@admin_bp.route('/admin/promotion', methods=['GET', 'POST'])
+@login_required
+@role_required('Admin')
+def semester_promotion():
+    """Preview (dry run) and start the end-of-term semester promotion."""
+    from models import Course, Department, StudentDetails
+    from services.dimensions import names
+    from services.promotion import DEFAULT_FINAL_SEMESTER, parse_sections, promote_semester, promotion_history
+    from services.tasks import enqueue
+    from services.terms import current_term
+    departments = names(Department, used_by=StudentDetails.department_id)
+    courses = names(Course, used_by=StudentDetails.course_id)
+    form = {'department': '', 'course': '', 'final_semester': DEFAULT_FINAL_SEMESTER, 'sections': '',
+            'term': current_term(), 'keep_timetable': True}
+    preview = None
+    if request.method == 'POST':
+        form = {'department': request.form.get('department', '').strip(),
+                'course': request.form.get('course', '').strip(),
+                'final_semester': request.form.get('final_semester', type=int) or DEFAULT_FINAL_SEMESTER,
+                'sections': request.form.get('sections', ''),
+                'term': request.form.get('term', '').strip() or form['term'],
+                'keep_timetable': bool(request.form.get('keep_timetable'))}
+        try:
+            options = {'department': form['department'] or None, 'course': form['course'] or None,
+                       'final_semester': form['final_semester'], 'sections': parse_sections(form['sections']),
+                       'term': form['term'], 'keep_timetable': form['keep_timetable']}
+            preview = promote_semester(dry_run=True, **options)
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            if request.form.get('action') == 'promote' and preview['already_promoted']:
+                flash(f"This scope was already promoted for term {form['term']}; "
+                      f"use `flask students promote --force` to run it again.", 'danger')
+            elif request.form.get('action') == 'promote':
+                refused = limit_request('bulk')  # previews are free; only starting the promotion counts
+                if refused is not None:
+                    return refused
+                task = enqueue('promote_semester', options, user=current_user)
+                return redirect(url_for('admin.view_task', id=task.id))
+    return render_template('admin_promotion.html', departments=departments, courses=courses, form=form,
+                           preview=preview, history=promotion_history())
+
+
+@admin_bp.route('/admin/tasks')
+@login_required
+@role_required('Admin')
+def list_tasks():
+    from models import Task
+    tasks = Task.query.order_by(Task.id.desc()).limit(100).all()
+    return render_template('admin_tasks.html', tasks=tasks)
+
+
+@admin_bp.route('/admin/tasks/<int:id>')
+@login_required
+@role_required('Admin')
+def view_task(id):
+    from models import Task
+    from services.tasks import serialize_task
+    task = Task.query.get_or_404(id)
+    return render_template('admin_task.html', task=serialize_task(task))
+
+
+@admin_bp.route('/admin/tasks/<int:id>.json')
+@login_required
+@role_required('Admin')
+def task_progress(id):
+    """Polled by the task page while the task is queued or running."""
+    from models import Task
+    from services.tasks import serialize_task
+    response = jsonify(serialize_task(Task.query.get_or_404(id)))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@admin_bp.route('/admin/tasks/<int:id>/download')
+@login_required
+@role_required('Admin')
+def download_task_result(id):
+    import json
+    import os
+    from flask import abort, send_file
+    from models import Task
+    from services.tasks import task_dir
+    task = Task.query.get_or_404(id)
+    result = json.loads(task.result) if task.status == 'succeeded' and task.result else {}
+    path = result.get('path')
+    # Only files the task runner wrote into the task directory are served
+    if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(task_dir()) or not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='text/csv', as_attachment=True, download_name=result.get('filename'))
+
+
 @admin_bp.route('/admin/certificates/upload', methods=['POST'])
 @login_required
 @role_required('Admin')
+@rate_limited()
 def upload_certificate():
-    from models import Certificate
+    from models import Certificate, StudentDetails
+    from services.storage import store_upload
     if 'file' not in request.files:
         flash('No file part', 'danger')
         return redirect(request.url)
@@ -206,13 +395,10 @@ def upload_certificate():
     category = request.form.get('category')
 
     if file:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        filename = secure_filename(file.filename)
-        upload_path = os.path.join(upload_folder, 'certificates', filename)
-        if not os.path.exists(os.path.dirname(upload_path)):
-            os.makedirs(os.path.dirname(upload_path))
-        file.save(upload_path)
-        new_cert = Certificate(student_id=student_id, title=title, category=category, file_path=filename)
+        student = StudentDetails.query.get_or_404(student_id)
+        upload = store_upload(file, kind='certificate', uploader=current_user, department=student.department)
+        new_cert = Certificate(student_id=student.id, title=title, category=category,
+                               file_path=upload.filename, upload=upload)
         db.session.add(new_cert)
         db.session.commit()
         flash('Certificate uploaded!', 'success')
@@ -225,6 +411,7 @@ def upload_certificate():
 @role_required('Admin')
 def add_event():
     from models import Event
+    from services.fragments import bump_version
     title = request.form.get('title')
     description = request.form.get('description')
     event_date_str = request.form.get('event_date')
@@ -236,6 +423,7 @@ def add_event():
     event_date = datetime.strptime(event_date_str, '%Y-%m-%d').date()
     new_event = Event(title=title, description=description, event_date=event_date)
     db.session.add(new_event)
+    bump_version('events')
     db.session.commit()
     flash('Event added!', 'success')
     return redirect(url_for('main.calendar'))
@@ -245,6 +433,8 @@ def add_event():
 @role_required('Admin')
 def manage_broadcasts():
     from models import Broadcast
+    from services.broadcasts import feed
+    from services.fragments import bump_version
     if request.method == 'POST':
         title = request.form.get('title')
         content = request.form.get('content')
@@ -260,12 +450,13 @@ def manage_broadcasts():
             scope='institution'
         )
         db.session.add(new_broadcast)
+        bump_version('broadcasts')
         db.session.commit()
         flash('Institution-wide broadcast created successfully!', 'success')
         return redirect(url_for('admin.manage_broadcasts'))
     
-    broadcasts = Broadcast.query.filter_by(scope='institution').order_by(Broadcast.created_at.desc()).all()
-    return render_template('admin_broadcasts.html', broadcasts=broadcasts)
+    broadcasts, next_cursor = feed('institution', after=request.args.get('after'))
+    return render_template('admin_broadcasts.html', broadcasts=broadcasts, next_cursor=next_cursor)
 
 
 @admin_bp.route('/admin/broadcasts/<int:id>/delete', methods=['POST'])
@@ -273,12 +464,14 @@ def manage_broadcasts():
 @role_required('Admin')
 def delete_broadcast(id):
     from models import Broadcast
+    from services.fragments import bump_version
     broadcast = Broadcast.query.get_or_404(id)
     if broadcast.scope != 'institution':
         flash('Unauthorized', 'danger')
         return redirect(url_for('admin.manage_broadcasts'))
     
     db.session.delete(broadcast)
+    bump_version('broadcasts')
     db.session.commit()
     flash('Broadcast deleted', 'success')
     return redirect(url_for('admin.manage_broadcasts'))
@@ -289,12 +482,14 @@ def delete_broadcast(id):
 @role_required('Admin')
 def pin_broadcast(id):
     from models import Broadcast
+    from services.fragments import bump_version
     broadcast = Broadcast.query.get_or_404(id)
     if broadcast.scope != 'institution':
         flash('Unauthorized', 'danger')
         return redirect(url_for('admin.manage_broadcasts'))
     
     broadcast.is_pinned = not broadcast.is_pinned
+    bump_version('broadcasts')
     db.session.commit()
     flash(f'Broadcast {"pinned" if broadcast.is_pinned else "unpinned"}', 'success')
     return redirect(url_for('admin.manage_broadcasts'))
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""Versioned JSON API (``/api/v1``) for the mobile app.
+
+Reads go through the same service queries as the HTML pages. Responses are
+compact JSON with ETags, optional ``?fields=`` selection, ``after``/``limit``
+keyset pages on the list endpoints (services/api.py), and gzip/brotli compression.
+Clients sign in with ``POST /api/v1/session`` and then send the session cookie;
+unauthenticated calls get a JSON 401 instead of the login page redirect.
+"""
+from functools import wraps
+
+from flask import Blueprint, request
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.exceptions import HTTPException
+
+from services.api import error_response, json_response, keyset_page, page_limit, requested_fields, select_fields
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+@api_bp.errorhandler(HTTPException)
+def api_error(e):
+    if e.code == 401:
+        return error_response(401, 'Sign in with POST /api/v1/session first.')
+    return error_response(e.code, e.description)
+
+
+@api_bp.app_errorhandler(404)
+@api_bp.app_errorhandler(405)
+def api_routing_error(e):
+    """URLs under /api/v1 that match no route belong to no blueprint, so ``api_error`` never sees them."""
+    if request.path == api_bp.url_prefix or request.path.startswith(api_bp.url_prefix + '/'):
+        return api_error(e)
+    return e
+
+
+def api_role_required(*roles):
+    """Like utils.role_required, but answers other roles with a JSON 403."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_user.role not in roles:
+                return error_response(403, 'You do not have permission to access this resource.')
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _serialize_user(user):
+    return {'id': user.id, 'username': user.username, 'role': user.role, 'department': user.department}
+
+
+@api_bp.route('/session', methods=['POST'])
+def create_session():
+    from models import User
+    from services.ratelimit import check_login, retry_after
+    data = request.get_json(silent=True) or {}
+    wait = check_login(data.get('username'))
+    if wait:
+        response = error_response(429, 'Too many sign-in attempts.')
+        response.headers['Retry-After'] = str(retry_after(wait))
+        return response
+    user = User.query.filter_by(username=data.get('username')).first()
+    if not user or not user.check_password(data.get('password') or ''):
+        return error_response(401, 'Invalid username or password')
+    login_user(user)
+    return json_response({'user': _serialize_user(user)})
+
+
+@api_bp.route('/session', methods=['DELETE'])
+@login_required
+def delete_session():
+    logout_user()
+    return json_response({'ok': True})
+
+
+@api_bp.route('/timetable')
+@login_required
+def timetable():
+    from services.timetable import faculty_classes, serialize_allotment, student_classes
+    if current_user.role == 'Faculty' and current_user.faculty_profile:
+        classes = faculty_classes(current_user.faculty_profile)
+    elif current_user.role == 'Student' and current_user.student_profile:
+        classes = student_classes(current_user.student_profile)
+    else:
+        classes = []
+    return json_response({'classes': select_fields([serialize_allotment(a) for a in classes], requested_fields())})
+
+
+@api_bp.route('/attendance')
+@login_required
+@api_role_required('Student')
+def attendance_summary():
+    """Per-subject totals for one term (``?term=2026-2``, the current one by default, or ``all``)."""
+    from services import bitmaps
+    from services.attendance import student_attendance
+    from services.terms import current_term, term_window
+    term, start, end = term_window(request.args.get('term') or current_term())
+    student_id = current_user.student_profile.id
+    if bitmaps.enabled():
+        subjects = bitmaps.subject_summary(student_id, start, end)
+    else:
+        subjects = bitmaps.summarize_marks(student_attendance(student_id, start, end))
+    total = sum(s['total'] for s in subjects)
+    present = sum(s['present'] for s in subjects)
+    return json_response({
+        'term': term,
+        'total': total,
+        'present': present,
+        'absent': sum(s['absent'] for s in subjects),
+        'percentage': round(present * 100.0 / total, 1) if total else 0.0,
+        'subjects': select_fields(subjects, requested_fields()),
+    })
+
+
+@api_bp.route('/fees')
+@login_required
+@api_role_required('Student', 'Admin')
+def fees():
+    """A student's own fees, or the admin ledger (same filters as /fees), newest due date first."""
+    from models import Fee
+    from services.fees import fee_ledger_query, ledger_filters, serialize_fee
+    admin = current_user.role == 'Admin'
+    if admin:
+        query = fee_ledger_query(**ledger_filters(request.args))
+    elif current_user.student_profile:
+        query = current_user.student_profile.fees
+    else:
+        return json_response({'fees': [], 'next': None})
+    items, cursor = keyset_page(query, (Fee.due_date, Fee.id), request.args.get('after'), page_limit())
+    return json_response({'fees': select_fields([serialize_fee(f, with_student=admin) for f in items],
+                                                requested_fields()),
+                          'next': cursor})
+
+
+@api_bp.route('/leaves')
+@login_required
+def leaves():
+    """The leave requests the leaves page shows this user, newest first."""
+    from models import Leaves
+    from services.leaves import serialize_leave, visible_leaves
+    items, cursor = keyset_page(visible_leaves(current_user), (Leaves.id,), request.args.get('after'), page_limit())
+    return json_response({'left': current_user.total_leaves - current_user.leaves_taken,
+                          'leaves': select_fields([serialize_leave(l) for l in items], requested_fields()),
+                          'next': cursor})
+
+
+@api_bp.route('/broadcasts')
+@login_required
+def broadcasts():
+    """One page of the institution feed, or the user's department feed with ``?feed=dept``."""
+    from services.broadcasts import feed, serialize_broadcast
+    if request.args.get('feed') == 'dept':
+        if not current_user.department:
+            return json_response({'broadcasts': [], 'next': None})
+        items, cursor = feed('department', current_user.department, after=request.args.get('after'),
+                             limit=page_limit())
+    else:
+        items, cursor = feed('institution', after=request.args.get('after'), limit=page_limit())
+    return json_response({'broadcasts': select_fields([serialize_broadcast(b) for b in items], requested_fields()),
+                          'next': cursor})
+
+
+@api_bp.route('/calendar')
+@login_required
+def calendar():
+    """Events in [start, end) (ISO dates), or in ``?month=YYYY-MM`` (the current month by default)."""
+    from services.calendar import events_between, month_window, parse_month, parse_range, serialize_event
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start, end = parse_range(request.args.get('start'), request.args.get('end'))
+        except ValueError as e:
+            return error_response(400, str(e))
+    else:
+        start, end = month_window(*parse_month(request.args.get('month')))
+    return json_response({'start': start.isoformat(), 'end': end.isoformat(),
+                          'events': select_fields([serialize_event(e) for e in events_between(start, end)],
+                                                  requested_fields())})
@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 
 from models import User
+from services.ratelimit import check_login, retry_after
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -19,6 +20,10 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        wait = check_login(username)  # before the lookup and the password hash
+        if wait:
+            flash(f'Too many sign-in attempts. Please wait {retry_after(wait)} seconds and try again.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after(wait))}
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
             login_user(user)
@@ -13,6 +13,7 @@ hod_bp = Blueprint('hod', __name__)
 @role_required('HOD')
 def hod_panel():
     from models import User, StudentDetails, FacultyDetails, Leaves, HODDetails
+    from services.attendance import low_attendance
     hod = current_user.hod_profile
 
     if request.method == 'POST' and 'enrollment_no' in request.form:
@@ -46,7 +47,35 @@ def hod_panel():
     }
     dept_faculty = hod.faculties.all()
     dept_students = hod.students.all()
-    return render_template('hod_panel.html', stats=stats, faculty=dept_faculty, students=dept_students)
+    low_attendance_rows = low_attendance(department=hod.department)
+    return render_template('hod_panel.html', stats=stats, faculty=dept_faculty, students=dept_students,
+                           low_attendance=low_attendance_rows)
+
+
+@hod_bp.route('/hod/analytics')
+@login_required
+@role_required('HOD')
+def attendance_analytics():
+    from datetime import date, timedelta
+    from services.analytics import clamp_range, department_report
+    hod = current_user.hod_profile
+    today = date.today()
+    try:
+        start = date.fromisoformat(request.args.get('start', ''))
+    except ValueError:
+        start = today - timedelta(weeks=16)
+    try:
+        end = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        end = today
+    start, end, clamped = clamp_range(start, end, today)
+    if clamped:
+        flash(f'Showing the last {(end - start).days + 1} days of the range; pick a shorter one to see earlier dates.',
+              'info')
+    # Range is inclusive in the UI, half-open in the report
+    report = department_report(hod.department, start, end + timedelta(days=1))
+    return render_template('hod_analytics.html', report=report, start=start, end=end,
+                           department=hod.department)
 
 
 @hod_bp.route('/hod/slots', methods=['GET', 'POST'])
@@ -77,11 +106,13 @@ def time_slots():
 @role_required('HOD')
 def delete_slot(id):
     from models import TimeSlot
+    from services.fragments import bump_version
     slot = TimeSlot.query.get_or_404(id)
     if slot.hod_id != current_user.hod_profile.id:
         flash('Not allowed.', 'danger')
         return redirect(url_for('hod.time_slots'))
     db.session.delete(slot)
+    bump_version('allotments')
     db.session.commit()
     flash('Time slot removed.', 'warning')
     return redirect(url_for('hod.time_slots'))
@@ -91,14 +122,16 @@ def delete_slot(id):
 @login_required
 @role_required('HOD')
 def allot_class():
-    from models import FacultyDetails, ClassAllotment, StudentDetails, TimeSlot, ClassAllotmentRequest
+    from models import (FacultyDetails, ClassAllotment, Course, Department, Section, StudentDetails, Subject,
+                        TimeSlot, ClassAllotmentRequest)
+    from services.dimensions import names
+    from services.fragments import bump_version
     hod = current_user.hod_profile
     faculties = FacultyDetails.query.all()
-    try:
-        allotments = ClassAllotment.query.all()
-    except Exception:
-        db.session.rollback()
-        allotments = []
+    # Left unevaluated: only the {% cache %} block's miss path iterates (and runs) it
+    allotments = ClassAllotment.query.options(
+        db.joinedload(ClassAllotment.faculty).joinedload(FacultyDetails.user),
+        db.joinedload(ClassAllotment.slot)).order_by(ClassAllotment.id)
     try:
         slots = TimeSlot.query.filter_by(hod_id=hod.id).order_by(TimeSlot.day_of_week, TimeSlot.start_time).all()
     except Exception:
@@ -110,20 +143,10 @@ def allot_class():
         db.session.rollback()
         incoming_requests = []
 
-    unique_depts = [x[0] for x in db.session.query(FacultyDetails.department).distinct().all()]
-    unique_depts += [x[0] for x in db.session.query(StudentDetails.department).distinct().all()]
-    unique_depts = sorted(list(set(filter(None, unique_depts))))
-
-    unique_classes = [x[0] for x in db.session.query(StudentDetails.class_name).distinct().all()]
-    unique_classes += [x[0] for x in db.session.query(ClassAllotment.class_name).distinct().all()]
-    unique_classes = sorted(list(set(filter(None, unique_classes))))
-
-    unique_courses = [x[0] for x in db.session.query(StudentDetails.course).distinct().all()]
-    try:
-        unique_courses += [x[0] for x in db.session.query(ClassAllotment.course).distinct().all() if x[0]]
-    except Exception:
-        pass
-    unique_courses = sorted(list(set(filter(None, unique_courses))))
+    # Dropdown vocabularies are whole (small) dimension tables, not DISTINCT scans
+    unique_depts = names(Department)
+    unique_classes = names(Section)
+    unique_courses = names(Course)
 
     unique_semesters = [x[0] for x in db.session.query(StudentDetails.semester).distinct().all()]
     try:
@@ -132,8 +155,7 @@ def allot_class():
         pass
     unique_semesters = sorted(list(set(x for x in unique_semesters if x is not None)))
 
-    unique_subs = [x[0] for x in db.session.query(ClassAllotment.subject).distinct().all()]
-    unique_subs = sorted(list(set(filter(None, unique_subs))))
+    unique_subs = names(Subject)
 
     if request.method == 'POST':
         faculty_id = request.form.get('faculty_id', type=int)
@@ -165,6 +187,7 @@ def allot_class():
                                        department=dept, course=course, semester=semester,
                                        class_name=cls_name, subject=subject, slot_id=slot_id)
             db.session.add(allotment)
+            bump_version('allotments')
             db.session.commit()
             flash('Faculty successfully assigned to class!', 'success')
         return redirect(url_for('hod.allot_class'))
@@ -180,8 +203,10 @@ def allot_class():
 @role_required('HOD')
 def delete_allotment(id):
     from models import ClassAllotment
+    from services.fragments import bump_version
     allotment = ClassAllotment.query.get_or_404(id)
     db.session.delete(allotment)
+    bump_version('allotments')
     db.session.commit()
     flash('Assignment removed!', 'warning')
     return redirect(url_for('hod.allot_class'))
@@ -192,6 +217,7 @@ def delete_allotment(id):
 @role_required('HOD')
 def approve_allotment_request(id):
     from models import ClassAllotmentRequest, ClassAllotment
+    from services.fragments import bump_version
     req = ClassAllotmentRequest.query.get_or_404(id)
     if req.responding_hod_id != current_user.hod_profile.id or req.status != 'Pending':
         flash('Invalid or already processed request.', 'danger')
@@ -203,6 +229,7 @@ def approve_allotment_request(id):
     db.session.add(allotment)
     req.status = 'Approved'
     req.responding_hod_id = current_user.hod_profile.id
+    bump_version('allotments')
     db.session.commit()
     flash('Request approved; faculty assigned to class.', 'success')
     return redirect(url_for('hod.allot_class'))
@@ -227,6 +254,8 @@ def reject_allotment_request(id):
 @role_required('HOD')
 def manage_dept_broadcasts():
     from models import Broadcast
+    from services.broadcasts import feed
+    from services.fragments import bump_version
     hod = current_user.hod_profile
     
     if request.method == 'POST':
@@ -245,12 +274,13 @@ def manage_dept_broadcasts():
             department=hod.department
         )
         db.session.add(new_broadcast)
+        bump_version('broadcasts')
         db.session.commit()
         flash('Department broadcast created successfully!', 'success')
         return redirect(url_for('hod.manage_dept_broadcasts'))
     
-    broadcasts = Broadcast.query.filter_by(scope='department', department=hod.department).order_by(Broadcast.created_at.desc()).all()
-    return render_template('hod_broadcasts.html', broadcasts=broadcasts)
+    broadcasts, next_cursor = feed('department', hod.department, after=request.args.get('after'))
+    return render_template('hod_broadcasts.html', broadcasts=broadcasts, next_cursor=next_cursor)
 
 
 @hod_bp.route('/hod/broadcasts/<int:id>/delete', methods=['POST'])
@@ -258,6 +288,7 @@ def manage_dept_broadcasts():
 @role_required('HOD')
 def delete_dept_broadcast(id):
     from models import Broadcast
+    from services.fragments import bump_version
     broadcast = Broadcast.query.get_or_404(id)
     hod = current_user.hod_profile
     
@@ -266,6 +297,7 @@ def delete_dept_broadcast(id):
         return redirect(url_for('hod.manage_dept_broadcasts'))
     
     db.session.delete(broadcast)
+    bump_version('broadcasts')
     db.session.commit()
     flash('Broadcast deleted', 'success')
     return redirect(url_for('hod.manage_dept_broadcasts'))
@@ -276,6 +308,7 @@ def delete_dept_broadcast(id):
 @role_required('HOD')
 def pin_dept_broadcast(id):
     from models import Broadcast
+    from services.fragments import bump_version
     broadcast = Broadcast.query.get_or_404(id)
     hod = current_user.hod_profile
     
@@ -284,6 +317,7 @@ def pin_dept_broadcast(id):
         return redirect(url_for('hod.manage_dept_broadcasts'))
     
     broadcast.is_pinned = not broadcast.is_pinned
+    bump_version('broadcasts')
     db.session.commit()
     flash(f'Broadcast {"pinned" if broadcast.is_pinned else "unpinned"}', 'success')
     return redirect(url_for('hod.manage_dept_broadcasts'))
\ No newline at end of file
@@ -2,11 +2,12 @@
 import os
 from datetime import datetime
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_from_directory, current_app, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, abort
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 
 from extensions import db
+from services.ratelimit import rate_limited
 from utils import role_required
 
 main_bp = Blueprint('main', __name__)
@@ -17,28 +18,29 @@ main_bp = Blueprint('main', __name__)
 def dashboard():
     allotments = []
     student_classes = []
+    low_attendance_rows = []
     if current_user.role == 'Faculty':
-        allotments = current_user.faculty_profile.allotments.all()
+        from services.attendance import low_attendance
+        from services.timetable import faculty_classes
+        allotments = faculty_classes(current_user.faculty_profile).all()
+        low_attendance_rows = low_attendance(advisor_id=current_user.faculty_profile.id)
     elif current_user.role == 'Student' and current_user.student_profile:
-        from models import ClassAllotment
-        sp = current_user.student_profile
-        q = ClassAllotment.query.filter_by(
-            department=sp.department,
-            class_name=sp.class_name
-        )
-        if getattr(sp, 'course', None):
-            q = q.filter(ClassAllotment.course == sp.course)
-        if getattr(sp, 'semester', None) is not None:
-            q = q.filter(ClassAllotment.semester == sp.semester)
-        student_classes = q.all()
-    return render_template('dashboard.html', allotments=allotments, student_classes=student_classes)
+        from services import timetable
+        student_classes = timetable.student_classes(current_user.student_profile).all()
+    return render_template('dashboard.html', allotments=allotments, student_classes=student_classes,
+                           low_attendance=low_attendance_rows)
 
 
 @main_bp.route('/attendance', methods=['GET', 'POST'])
 @login_required
 @role_required('Faculty')
+@rate_limited()
 def mark_attendance():
-    from models import StudentDetails, Attendance, ClassAllotment
+    from datetime import timedelta
+    from models import StudentDetails, ClassAllotment
+    from services.attendance import upsert_attendance
+    from services.fragments import bump_version
+    from services.terms import attendance_source
     faculty = current_user.faculty_profile
     allotments = faculty.allotments.all()
 
@@ -63,21 +65,22 @@ def mark_attendance():
         selected_allotment = ClassAllotment.query.get(selected_allotment_id)
         if selected_allotment and selected_allotment.faculty_id == faculty.id:
             q = StudentDetails.query.filter_by(
-                department=selected_allotment.department,
-                class_name=selected_allotment.class_name
+                department_id=selected_allotment.department_id,
+                section_id=selected_allotment.section_id
             )
-            if getattr(selected_allotment, 'course', None):
-                q = q.filter_by(course=selected_allotment.course)
+            if getattr(selected_allotment, 'course_id', None):
+                q = q.filter_by(course_id=selected_allotment.course_id)
             if getattr(selected_allotment, 'semester', None) is not None:
                 q = q.filter_by(semester=selected_allotment.semester)
             students = q.all()
 
-            existing_attendance = Attendance.query.filter_by(
-                date=date_obj,
-                subject=selected_allotment.subject
-            ).filter(Attendance.student_id.in_([s.id for s in students])).all()
-
-            marked_status = {a.student_id: a.status for a in existing_attendance}
+            # The date may fall in an archived term
+            source = attendance_source(date_obj, date_obj + timedelta(days=1))
+            marked_status = dict(db.session.execute(
+                db.select(source.c.student_id, source.c.status).where(
+                    source.c.date == date_obj,
+                    source.c.subject_id == selected_allotment.subject_id,
+                    source.c.student_id.in_([s.id for s in students]))).all())
 
     present_count = list(marked_status.values()).count('Present')
     absent_count = list(marked_status.values()).count('Absent')
@@ -91,27 +94,27 @@ def mark_attendance():
 
         post_date_str = request.form.get('date')
         post_date_obj = datetime.strptime(post_date_str, '%Y-%m-%d').date() if post_date_str else datetime.utcnow().date()
-        subject = allotment.subject
+        subject_id = allotment.subject_id
 
         q = StudentDetails.query.filter_by(
-            department=allotment.department,
-            class_name=allotment.class_name
+            department_id=allotment.department_id,
+            section_id=allotment.section_id
         )
-        if getattr(allotment, 'course', None):
-            q = q.filter_by(course=allotment.course)
+        if getattr(allotment, 'course_id', None):
+            q = q.filter_by(course_id=allotment.course_id)
         if getattr(allotment, 'semester', None) is not None:
             q = q.filter_by(semester=allotment.semester)
         students_to_mark = q.all()
 
+        rows = []
         for student in students_to_mark:
             status = request.form.get(f'status_{student.id}')
             if status:
-                existing = Attendance.query.filter_by(student_id=student.id, date=post_date_obj, subject=subject).first()
-                if existing:
-                    existing.status = status
-                else:
-                    att = Attendance(student_id=student.id, date=post_date_obj, status=status, subject=subject)
-                    db.session.add(att)
+                rows.append({'student_id': student.id, 'date': post_date_obj, 'subject_id': subject_id,
+                             'status': status})
+        # One INSERT ... ON CONFLICT for the whole class instead of a lookup per student
+        upsert_attendance(rows)
+        bump_version('attendance')
         db.session.commit()
         flash(f'Attendance for {allotment.class_name} ({allotment.subject}) updated!', 'success')
         return redirect(url_for('main.dashboard'))
@@ -125,47 +128,63 @@ def mark_attendance():
 @login_required
 @role_required('Student')
 def view_attendance():
-    from models import Attendance
-    attendances = Attendance.query.filter_by(student_id=current_user.student_profile.id).all()
+    from services import bitmaps
+    from services.attendance import student_attendance
+    from services.terms import current_term, recent_terms, term_window
+    # One term at a time (the current one by default); 'all' reads every term, archived ones included
+    term, start, end = term_window(request.args.get('term') or current_term())
+    student_id = current_user.student_profile.id
+    if bitmaps.enabled():
+        attendances = bitmaps.student_marks(student_id, start, end)
+        subjects = bitmaps.subject_summary(student_id, start, end)
+    else:
+        attendances = student_attendance(student_id, start, end)
+        subjects = bitmaps.summarize_marks(attendances)
     present_count = sum(1 for a in attendances if a.status == 'Present')
     absent_count = sum(1 for a in attendances if a.status == 'Absent')
-    return render_template('view_attendance.html', attendances=attendances, present=present_count, absent=absent_count)
+    terms = recent_terms()
+    if term not in terms and term != 'all':
+        terms.append(term)
+    return render_template('view_attendance.html', attendances=attendances, present=present_count, absent=absent_count,
+                           term=term, terms=terms, subjects=subjects)
 
 
 @main_bp.route('/attendance/analysis')
 @login_required
 @role_required('Student')
 def attendance_analysis():
-    from models import Attendance
     from datetime import timedelta, date
-    
+    from services.attendance import student_attendance
+    from services.terms import current_term, term_bounds
+
     student_id = current_user.student_profile.id
-    all_attendances = Attendance.query.filter_by(student_id=student_id).order_by(Attendance.date.desc()).all()
-    
+
     # Get analysis period from request
     period = request.args.get('period', 'semester')  # semester, month, week, day
-    
-    # Calculate date range based on period
+
+    # Calculate date range based on period; only that range is read
     today = date.today()
-    
+    end_date = today + timedelta(days=1)
+
     if period == 'day':
-        filter_date = today
+        start_date = today
         period_label = f"Today ({today})"
-        date_filter = all_attendances
     elif period == 'week':
         start_date = today - timedelta(days=today.weekday())
         period_label = f"This Week ({start_date} to {today})"
-        date_filter = [a for a in all_attendances if start_date <= a.date <= today]
     elif period == 'month':
         start_date = date(today.year, today.month, 1)
         period_label = f"This Month ({start_date.strftime('%B %Y')})"
-        date_filter = [a for a in all_attendances if a.date.year == today.year and a.date.month == today.month]
-    else:  # semester
-        # Assuming semester is 6 months
-        start_date = date(today.year, (today.month - 1) // 6 * 6 + 1, 1)
-        semester_num = (today.month - 1) // 6 + 1
-        period_label = f"Semester {semester_num} (6 months)"
-        date_filter = [a for a in all_attendances if a.date >= start_date]
+    else:  # semester: the current academic term, or ?term=<label> for an earlier one
+        term = request.args.get('term') or current_term()
+        try:
+            start_date, end_date = term_bounds(term)
+        except ValueError:
+            term = current_term()
+            start_date, end_date = term_bounds(term)
+        semester_num = term.split('-')[1]
+        period_label = f"Semester {semester_num} ({term})"
+    date_filter = student_attendance(student_id, start_date, end_date)
     
     # Calculate statistics
     present_count = sum(1 for a in date_filter if a.status == 'Present')
@@ -228,8 +247,11 @@ def attendance_analysis():
 
 @main_bp.route('/leaves', methods=['GET', 'POST'])
 @login_required
+@rate_limited()
 def leaves():
     from models import Leaves
+    from services.leaves import visible_leaves
+    from services.streaming import render_page, stream_rows
     if request.method == 'POST':
         leave_type = request.form.get('type')
         reason = request.form.get('reason')
@@ -254,16 +276,8 @@ def leaves():
 
     leaves_left = current_user.total_leaves - current_user.leaves_taken
 
-    if current_user.role == 'Admin':
-        all_leaves = Leaves.query.filter(Leaves.status.in_(['Pending_Admin', 'Approved', 'Rejected'])).all()
-    elif current_user.role == 'HOD':
-        all_leaves = Leaves.query.filter(Leaves.status.in_(['Pending_HOD', 'Pending_Admin'])).all()
-    elif current_user.role == 'Faculty':
-        all_leaves = Leaves.query.filter(Leaves.status.in_(['Pending_Faculty', 'Pending_HOD'])).all()
-    else:
-        all_leaves = current_user.leaves.all()
-
-    return render_template('leaves.html', leaves=all_leaves, left=leaves_left)
+    all_leaves = stream_rows(visible_leaves(current_user).order_by(Leaves.id))
+    return render_page('leaves.html', leaves=all_leaves, left=leaves_left)
 
 
 @main_bp.route('/leaves/approve/<int:id>')
@@ -308,35 +322,53 @@ def reject_leave(id):
 @main_bp.route('/fees')
 @login_required
 def view_fees():
-    from models import Fee
+    from sqlalchemy.orm import joinedload
+    from models import Fee, StudentDetails
+    from services.fees import paginate_fees, outstanding_dues, fee_departments, ledger_filters
+    from services.streaming import render_page, stream_rows
+    pagination = None
+    dues = []
+    departments = []
+    filters = {}
     if current_user.role == 'Student':
-        fees = current_user.student_profile.fees.all()
+        fees = stream_rows(current_user.student_profile.fees
+                           .options(joinedload(Fee.student).joinedload(StudentDetails.user))
+                           .order_by(Fee.due_date.desc()))
     elif current_user.role == 'Admin':
-        fees = Fee.query.all()
+        filters = ledger_filters(request.args)
+        pagination = paginate_fees(page=request.args.get('page', 1, type=int), **filters)
+        fees = pagination.items
+        dues = outstanding_dues()
+        departments = fee_departments()
     else:
         fees = []
-    return render_template('fees.html', fees=fees)
+    return render_page('fees.html', fees=fees, pagination=pagination, dues=dues,
+                       departments=departments, filters=filters)
 
 
 @main_bp.route('/certificates')
 @login_required
 def view_certificates():
-    from models import Certificate
+    from sqlalchemy.orm import joinedload
+    from models import Certificate, StudentDetails
+    from services.streaming import render_page, stream_rows
+    certs = Certificate.query.options(joinedload(Certificate.student).joinedload(StudentDetails.user))
     if current_user.role == 'Student':
-        certs = current_user.student_profile.certificates.all()
+        certs = stream_rows(certs.filter(Certificate.student_id == current_user.student_profile.id)
+                            .order_by(Certificate.id))
     elif current_user.role == 'Admin':
-        certs = Certificate.query.all()
+        certs = stream_rows(certs.order_by(Certificate.id))
     else:
         certs = []
-    return render_template('certificates.html', certificates=certs)
+    return render_page('certificates.html', certificates=certs)
 
 
 @main_bp.route('/notes', methods=['GET', 'POST'])
 @login_required
+@rate_limited()
 def notes():
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    files = os.listdir(upload_folder)
-    notes_list = [f for f in files if os.path.isfile(os.path.join(upload_folder, f))]
+    from services.storage import store_upload
+    from services.notes import paginate_notes, note_facets
 
     if request.method == 'POST' and current_user.role == 'Faculty':
         if 'file' not in request.files:
@@ -347,73 +379,209 @@ def notes():
             flash('No selected file', 'danger')
             return redirect(request.url)
         if file:
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(upload_folder, filename))
+            store_upload(file, kind='note', uploader=current_user, department=current_user.department,
+                         subject=request.form.get('subject', '').strip() or None,
+                         course=request.form.get('course', '').strip() or None)
+            db.session.commit()
             flash('File uploaded successfully!', 'success')
             return redirect(url_for('main.notes'))
 
-    return render_template('notes.html', notes=notes_list)
+    # Default to the user's own department; Admin (no department) sees everything
+    department = request.args.get('department', current_user.department or '').strip() or None
+    filters = {
+        'department': department,
+        'subject': request.args.get('subject', '').strip() or None,
+        'course': request.args.get('course', '').strip() or None,
+        'search': request.args.get('q', '').strip() or None,
+    }
+    pagination = paginate_notes(page=request.args.get('page', 1, type=int), **filters)
+    return render_template('notes.html', uploads=pagination.items, pagination=pagination,
+                           filters=filters, facets=note_facets())
 
 
 @main_bp.route('/download/<path:filename>')
 @login_required
 def download_file(filename):
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    """Legacy note links: loose files at the top of UPLOAD_FOLDER, never anything in a subdirectory."""
+    from services.downloads import send_protected_file
+    folder = current_app.config['UPLOAD_FOLDER']
+    path = safe_join(folder, filename)
+    if path is None or os.path.dirname(os.path.normpath(path)) != os.path.normpath(folder) \
+            or not os.path.isfile(path):
+        abort(404)
+    return send_protected_file(path, download_name=os.path.basename(path))
+
+
+def _may_access_certificate(cert):
+    if current_user.role == 'Admin':
+        return True
+    profile = current_user.student_profile
+    return cert is not None and profile is not None and cert.student_id == profile.id
+
+
+@main_bp.route('/files/<int:id>')
+@login_required
+def download_upload(id):
+    from models import Upload, Certificate
+    from services.storage import upload_path
+    from services.downloads import send_protected_file
+    upload = Upload.query.get_or_404(id)
+    if upload.kind == 'certificate' and \
+            not _may_access_certificate(Certificate.query.filter_by(upload_id=upload.id).first()):
+        flash('You do not have permission to access this file.', 'danger')
+        return redirect(url_for('main.dashboard'))
+    # Blobs are content-addressed, so the SHA-256 is a strong ETag
+    return send_protected_file(upload_path(upload), download_name=upload.filename,
+                               mimetype=upload.mime_type, etag=upload.blob.sha256)
+
+
+@main_bp.route('/certificates/<int:id>/download')
+@login_required
+def download_certificate(id):
+    """A certificate's file, whether it is in the upload store or was uploaded before it."""
+    from models import Certificate
+    from services.storage import legacy_certificate_path
+    from services.downloads import send_protected_file
+    cert = Certificate.query.get_or_404(id)
+    if not _may_access_certificate(cert):
+        flash('You do not have permission to access this file.', 'danger')
+        return redirect(url_for('main.dashboard'))
+    if cert.upload_id:
+        return redirect(url_for('main.download_upload', id=cert.upload_id))
+    path = legacy_certificate_path(cert.file_path)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_protected_file(path, download_name=os.path.basename(path))
+
+
+@main_bp.route('/search')
+@login_required
+def search():
+    from services.search import search as run_search
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    hits, has_next = run_search(query, current_user, page=page) if query else ([], False)
+    for hit in hits:
+        hit['url'] = _search_hit_url(hit)
+    return render_template('search.html', query=query, hits=hits, page=page, has_next=has_next)
+
+
+def _search_hit_url(hit):
+    if hit['kind'] == 'broadcast':
+        return url_for('main.broadcast_detail', id=hit['ref_id'])
+    if hit['kind'] == 'event':
+        return url_for('main.calendar')
+    if hit['kind'] == 'note':
+        return url_for('main.download_upload', id=hit['ref_id'])
+    if hit['kind'] == 'user' and current_user.role == 'Admin':
+        return url_for('admin.edit_user', id=hit['ref_id'])
+    return None
 
 
 @main_bp.route('/calendar')
 @login_required
 def calendar():
-    from models import Event
-    all_events = Event.query.order_by(Event.event_date.asc()).all()
-    return render_template('calendar.html', events=all_events)
+    from services.calendar import parse_month, month_window, events_between, feed_token
+    year, month = parse_month(request.args.get('month'))
+    start, end = month_window(year, month)
+    prev_start, _ = month_window(*((year - 1, 12) if month == 1 else (year, month - 1)))
+    return render_template('calendar.html', events=events_between(start, end),  # run on a fragment cache miss only
+                           month_start=start, month_key=start.strftime('%Y-%m'),
+                           prev_month=prev_start.strftime('%Y-%m'), next_month=end.strftime('%Y-%m'),
+                           feed_url=url_for('main.calendar_feed', token=feed_token(current_user), _external=True))
+
+
+@main_bp.route('/api/events')
+@login_required
+def events_range():
+    """Events with start <= event_date < end (ISO dates), for the calendar view."""
+    from services.calendar import parse_range, events_between, serialize_event
+    try:
+        start, end = parse_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(),
+                    'events': [serialize_event(e) for e in events_between(start, end)]})
+
+
+@main_bp.route('/calendar.ics')
+def calendar_feed():
+    """iCalendar feed for calendar apps; authenticated by session or the signed ``token``."""
+    from services.calendar import ical_feed, user_for_feed_token
+    if not current_user.is_authenticated and user_for_feed_token(request.args.get('token', '')) is None:
+        abort(403)
+    body, etag = ical_feed(request.host)
+    response = current_app.response_class(body, mimetype='text/calendar')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 300
+    return response.make_conditional(request)
 
 @main_bp.route('/broadcasts')
 @login_required
 def broadcasts():
-    from models import Broadcast
-    
-    # Get institution-wide broadcasts
-    institution_broadcasts = Broadcast.query.filter_by(scope='institution').order_by(Broadcast.is_pinned.desc(), Broadcast.created_at.desc()).all()
-    
+    from services.broadcasts import feed, feed_count
+
+    # First page of each feed; older items load through /api/broadcasts/more
+    institution_broadcasts, institution_next = feed('institution')
+    institution_count = feed_count('institution')
+
     # Get department-specific broadcasts if user belongs to a department
-    dept_broadcasts = []
+    dept_broadcasts, dept_next, dept_count = [], None, 0
     if current_user.department:
-        dept_broadcasts = Broadcast.query.filter_by(scope='department', department=current_user.department).order_by(Broadcast.is_pinned.desc(), Broadcast.created_at.desc()).all()
-    
-    return render_template('broadcasts.html', 
+        dept_broadcasts, dept_next = feed('department', current_user.department)
+        dept_count = feed_count('department', current_user.department)
+
+    return render_template('broadcasts.html',
                          institution_broadcasts=institution_broadcasts,
-                         dept_broadcasts=dept_broadcasts)
+                         dept_broadcasts=dept_broadcasts,
+                         institution_next=institution_next, dept_next=dept_next,
+                         institution_count=institution_count, dept_count=dept_count)
+
+
+@main_bp.route('/broadcasts/<int:id>')
+@login_required
+def broadcast_detail(id):
+    """One broadcast, live or archived: the target of search hits, which may be far down a feed."""
+    from models import Broadcast, BroadcastArchive
+    broadcast = db.session.get(Broadcast, id) or db.session.get(BroadcastArchive, id)
+    if broadcast is None or (broadcast.scope == 'department' and current_user.role != 'Admin'
+                             and broadcast.department != current_user.department):
+        abort(404)
+    return render_template('broadcast.html', broadcast=broadcast,
+                           archived=isinstance(broadcast, BroadcastArchive))
 
 
 @main_bp.route('/api/broadcasts/refresh')
 @login_required
 def refresh_broadcasts():
     """API endpoint for auto-refreshing broadcasts (60-second interval)."""
-    from models import Broadcast
-    
-    # Get institution-wide broadcasts
-    institution_broadcasts = Broadcast.query.filter_by(scope='institution').order_by(Broadcast.is_pinned.desc(), Broadcast.created_at.desc()).all()
-    
-    # Get department-specific broadcasts if user belongs to a department
-    dept_broadcasts = []
+    from services.broadcasts import feed, feed_count, serialize_broadcast
+
+    institution_broadcasts, _ = feed('institution')
+    dept_broadcasts, dept_count = [], 0
     if current_user.department:
-        dept_broadcasts = Broadcast.query.filter_by(scope='department', department=current_user.department).order_by(Broadcast.is_pinned.desc(), Broadcast.created_at.desc()).all()
-    
-    def serialize_broadcast(b):
-        return {
-            'id': b.id,
-            'title': b.title,
-            'content': b.content,
-            'created_by': b.created_by.username,
-            'created_at': b.created_at.strftime('%b %d, %Y at %I:%M %p'),
-            'is_pinned': b.is_pinned,
-            'scope': b.scope,
-            'department': b.department or ''
-        }
-    
+        dept_broadcasts, _ = feed('department', current_user.department)
+        dept_count = feed_count('department', current_user.department)
+
     return jsonify({
         'institution_broadcasts': [serialize_broadcast(b) for b in institution_broadcasts],
         'dept_broadcasts': [serialize_broadcast(b) for b in dept_broadcasts],
+        'institution_count': feed_count('institution'),
+        'dept_count': dept_count,
         'timestamp': datetime.utcnow().isoformat()
-    })
\ No newline at end of file
+    })
+
+
+@main_bp.route('/api/broadcasts/more')
+@login_required
+def more_broadcasts():
+    """Next page of a broadcast feed after the given cursor ("load more")."""
+    from services.broadcasts import feed, serialize_broadcast
+    if request.args.get('feed') == 'dept':
+        if not current_user.department:
+            return jsonify({'broadcasts': [], 'next': None})
+        items, next_cursor = feed('department', current_user.department, after=request.args.get('after'))
+    else:
+        items, next_cursor = feed('institution', after=request.args.get('after'))
+    return jsonify({'broadcasts': [serialize_broadcast(b) for b in items], 'next': next_cursor})
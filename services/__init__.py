@@ -0,0 +1 @@
+"""Domain services for Lumen ERP (query helpers and batch operations used by the routes)."""
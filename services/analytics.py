@@ -0,0 +1,211 @@
+"""Department attendance analytics on a columnar NumPy snapshot.
+
+``load_snapshot`` reads a department's attendance for a date range through a
+raw DB-API cursor (no ORM objects) into four compact columns:
+
+* ``student`` int32: index into ``meta['students']`` (StudentDetails ids)
+* ``subject`` int16: index into ``meta['subjects']``
+* ``day``     int32: days since 1970-01-01
+* ``present`` uint8: 1 = Present, 0 = Absent
+
+The snapshot is written to ``<instance>/analytics/<key>.npy`` (one structured
+array) plus a ``.json`` sidecar with the labels, and reopened memory-mapped.
+The key includes the ``attendance`` data version (see services.fragments),
+which every attendance write bumps, so a snapshot is reused until attendance
+changes and never served stale. Ranges are capped at ANALYTICS_MAX_DAYS
+(``clamp_range``), and at most ANALYTICS_MAX_SNAPSHOTS snapshots are kept per
+version: reading one marks it recently used, and the least recently used go
+first, so varying the dates cannot fill the disk.
+
+Reports (student x subject percentage matrix, weekly trend) are computed with
+``np.bincount`` over the columns, so cost is linear in rows with no Python loop
+per mark.
+"""
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+from flask import current_app
+
+from extensions import db
+
+FETCH_SIZE = 50_000
+EPOCH = date(1970, 1, 1)
+MAX_DAYS = 184
+MAX_SNAPSHOTS = 32
+
+ROW_DTYPE = np.dtype([('student', np.int32), ('subject', np.int16),
+                      ('day', np.int32), ('present', np.uint8)])
+
+
+def snapshot_dir():
+    path = os.path.join(current_app.instance_path, 'analytics')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def clamp_range(start, end, today=None):
+    """Order an inclusive [start, end] range, end it no later than today and keep its last ANALYTICS_MAX_DAYS.
+
+    Returns (start, end, clamped).
+    """
+    today = today or date.today()
+    if end < start:
+        start, end = end, start
+    end = min(end, today)
+    start = min(start, end)
+    max_days = current_app.config.get('ANALYTICS_MAX_DAYS', MAX_DAYS)
+    earliest = end - timedelta(days=max_days - 1)
+    return max(start, earliest), end, start < earliest
+
+
+def _prune_snapshots(directory, current):
+    """Delete snapshots of older versions, and the least recently used beyond ANALYTICS_MAX_SNAPSHOTS."""
+    keep = current_app.config.get('ANALYTICS_MAX_SNAPSHOTS', MAX_SNAPSHOTS)
+    snapshots = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if '.tmp' in name:
+            continue
+        if current not in name:
+            os.remove(path)  # an older attendance version can never be hit again
+        elif name.endswith('.npy'):
+            snapshots.append((os.path.getmtime(path), path[:-len('.npy')]))
+    for _, base in sorted(snapshots, reverse=True)[keep:]:
+        for suffix in ('.npy', '.json'):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+
+def _snapshot_key(department, start, end):
+    from services.fragments import versions
+    version, = versions(['attendance'])
+    scope = hashlib.sha1(f'{department}|{start}|{end}'.encode()).hexdigest()[:16]
+    return f'-v{version}.', f'{scope}-v{version}'
+
+
+def _fetch_columns(department, start, end):
+    """Stream (student_id, subject_id, date, status) rows through a raw cursor into arrays."""
+    from models import Subject
+    from services.terms import attendance_from_sql
+    sql = ("SELECT a.student_id, a.subject_id, a.date, a.status FROM {source} a "
+           "JOIN student_details s ON s.id = a.student_id "
+           "WHERE s.department_id = (SELECT id FROM department WHERE name = {p}) "
+           "AND a.date >= {p} AND a.date < {p}")
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        paramstyle = db.engine.dialect.paramstyle
+        cursor.execute(sql.format(source=attendance_from_sql(start, end),
+                                  p='?' if paramstyle == 'qmark' else '%s'),
+                       (department, start.isoformat(), end.isoformat()))
+        subjects = {}
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            student_ids, subject_ids, days, statuses = zip(*rows)
+            chunk = np.empty(len(rows), dtype=ROW_DTYPE)
+            chunk['student'] = np.fromiter(student_ids, dtype=np.int32, count=len(rows))
+            chunk['subject'] = np.fromiter((subjects.setdefault(s, len(subjects)) for s in subject_ids),
+                                           dtype=np.int16, count=len(rows))
+            chunk['day'] = np.array([str(d)[:10] for d in days], dtype='datetime64[D]').astype(np.int32)
+            chunk['present'] = np.fromiter((s == 'Present' for s in statuses), dtype=np.uint8,
+                                           count=len(rows))
+            chunks.append(chunk)
+        cursor.close()
+    finally:
+        conn.close()
+
+    data = np.concatenate(chunks) if chunks else np.empty(0, dtype=ROW_DTYPE)
+    # Dense student index, ordered by StudentDetails id
+    student_ids, data['student'] = np.unique(data['student'], return_inverse=True)
+    subject_names = dict(db.session.query(Subject.id, Subject.name).filter(Subject.id.in_(list(subjects))))
+    return data, {'students': student_ids.tolist(), 'subjects': [subject_names[s] for s in subjects]}
+
+
+def load_snapshot(department, start, end):
+    """(columns, meta) for ``department`` over [start, end), memory-mapped from disk when cached."""
+    directory = snapshot_dir()
+    current, key = _snapshot_key(department, start, end)
+    data_path = os.path.join(directory, key + '.npy')
+    meta_path = os.path.join(directory, key + '.json')
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        os.utime(data_path)  # recently used: pruned last
+        with open(meta_path) as fh:
+            return np.load(data_path, mmap_mode='r'), json.load(fh)
+
+    data, meta = _fetch_columns(department, start, end)
+    meta.update({'department': department, 'start': start.isoformat(), 'end': end.isoformat()})
+    # Write under temp names and rename so concurrent readers never see a partial file
+    np.save(data_path + '.tmp.npy', data)
+    os.replace(data_path + '.tmp.npy', data_path)
+    with open(meta_path + '.tmp', 'w') as fh:
+        json.dump(meta, fh)
+    os.replace(meta_path + '.tmp', meta_path)
+    _prune_snapshots(directory, current)
+    return np.load(data_path, mmap_mode='r'), meta
+
+
+def subject_matrix(data, meta):
+    """(present, total, percentage) arrays of shape (students, subjects); percentage is NaN where no classes."""
+    n_students, n_subjects = len(meta['students']), len(meta['subjects'])
+    cells = data['student'].astype(np.int64) * n_subjects + data['subject']
+    size = n_students * n_subjects
+    total = np.bincount(cells, minlength=size).reshape(n_students, n_subjects)
+    present = np.bincount(cells, weights=data['present'], minlength=size).reshape(n_students, n_subjects)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentage = np.where(total > 0, present * 100.0 / total, np.nan)
+    return present.astype(np.int64), total, percentage
+
+
+def weekly_trend(data, start, end):
+    """[(week_start, present, total, percentage)] for each Monday-based week in [start, end)."""
+    first_monday = start - timedelta(days=start.weekday())
+    origin = (first_monday - EPOCH).days
+    n_weeks = max((end - first_monday).days + 6, 0) // 7
+    weeks = (data['day'] - origin) // 7
+    total = np.bincount(weeks, minlength=n_weeks)[:n_weeks]
+    present = np.bincount(weeks, weights=data['present'], minlength=n_weeks)[:n_weeks]
+    trend = []
+    for i in range(n_weeks):
+        pct = round(float(present[i]) * 100.0 / total[i], 1) if total[i] else None
+        trend.append((first_monday + timedelta(weeks=i), int(present[i]), int(total[i]), pct))
+    return trend
+
+
+def department_report(department, start, end):
+    """Heatmap rows and weekly trend for the HOD analytics page."""
+    from models import StudentDetails, User
+    data, meta = load_snapshot(department, start, end)
+    present, total, percentage = subject_matrix(data, meta)
+    overall_total = total.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overall = np.where(overall_total > 0, present.sum(axis=1) * 100.0 / overall_total, np.nan)
+
+    labels = dict(
+        (sid, (enrollment, username)) for sid, enrollment, username in
+        db.session.query(StudentDetails.id, StudentDetails.enrollment_no, User.username)
+        .join(User, User.id == StudentDetails.user_id)
+        .filter(StudentDetails.department == department)
+    )
+    order = np.argsort(np.nan_to_num(overall, nan=101.0), kind='stable')  # weakest first
+    rows = []
+    for i in order:
+        enrollment, username = labels.get(meta['students'][i], ('?', '?'))
+        rows.append({
+            'student_id': meta['students'][i],
+            'enrollment_no': enrollment,
+            'username': username,
+            'overall': None if np.isnan(overall[i]) else round(float(overall[i]), 1),
+            'cells': [None if np.isnan(p) else round(float(p), 1) for p in percentage[i]],
+        })
+    return {
+        'subjects': meta['subjects'],
+        'rows': rows,
+        'weeks': weekly_trend(data, start, end),
+        'marks': int(len(data)),
+    }
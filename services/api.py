@@ -0,0 +1,121 @@
+"""JSON API plumbing: compact encoding, field selection, keyset pages and ETags.
+
+Bodies are encoded with ``orjson`` when it is installed (several times faster
+than the standard library and already compact) and with ``json`` using tight
+separators otherwise. ``?fields=a,b`` trims every listed item to those keys.
+List endpoints page with an opaque ``after`` cursor over their sort columns
+(like the broadcast feed) rather than an OFFSET. Every body gets an ETag so a
+client polling with If-None-Match gets an empty 304; larger bodies are
+compressed on the way out like every other response (services/compression.py).
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app, request
+
+from extensions import db
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+API_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MIN_INT, MAX_INT = -2 ** 63, 2 ** 63 - 1  # integer cursor values outside this overflow the driver
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Encode ``payload`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def requested_fields():
+    """The ``?fields=`` names as a set, or None when the client wants every field."""
+    fields = {name.strip() for name in request.args.get('fields', '').split(',') if name.strip()}
+    return fields or None
+
+
+def select_fields(items, fields):
+    if not fields:
+        return items
+    return [{key: value for key, value in item.items() if key in fields} for item in items]
+
+
+def page_limit():
+    return max(1, min(request.args.get('limit', API_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+
+def _cursor_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+def _parse_cursor_value(column, text):
+    python_type = column.type.python_type
+    if issubclass(python_type, (date, datetime)):
+        return python_type.fromisoformat(text)
+    value = python_type(text)
+    if python_type is int and not MIN_INT <= value <= MAX_INT:
+        raise ValueError(f'{text} does not fit a 64-bit integer column')
+    return value
+
+
+def decode_cursor(cursor, order):
+    """Parse a ``keyset_page`` cursor for the ``order`` columns; None if missing or malformed."""
+    try:
+        parts = cursor.split('|')
+        if len(parts) != len(order):
+            return None
+        return tuple(_parse_cursor_value(column, text) for column, text in zip(order, parts))
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(query, order, after=None, limit=API_PAGE_SIZE):
+    """One page of ``query`` sorted by the ``order`` columns (all descending), continuing after ``after``.
+
+    The last column must be unique (the primary key) so the position is exact.
+    Returns (rows, next_cursor or None).
+    """
+    position = decode_cursor(after, order) if after else None
+    if position:
+        query = query.filter(db.tuple_(*order) < position)
+    rows = query.order_by(None).order_by(*[column.desc() for column in order]).limit(limit + 1).all()
+    page, more = rows[:limit], len(rows) > limit
+    cursor = '|'.join(_cursor_value(getattr(page[-1], column.key)) for column in order) if more else None
+    return page, cursor
+
+
+def json_response(payload, status=200):
+    """A compact JSON response with an ETag, answered with 304 when the client already has it.
+
+    Compression is left to the response pipeline (services/compression.py).
+    """
+    body = dumps(payload)
+    response = current_app.response_class(body, mimetype='application/json', status=status)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    if status != 200:
+        return response
+    etag = hashlib.sha1(body).hexdigest()[:20]
+    response.set_etag(etag)
+    if request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        response.set_data(b'')
+    return response
+
+
+def error_response(status, message):
+    return json_response({'error': message}, status=status)
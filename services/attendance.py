@@ -0,0 +1,278 @@
+"""Attendance data services: bulk CSV import and export, and the low-attendance report.
+
+``import_attendance_csv`` streams rows of (enrollment_no, date, subject, status)
+from any text stream, so memory use is bounded by the batch size and the
+enrollment-number lookup, not by the size of the file. Each batch is one
+transaction using INSERT ... ON CONFLICT (student_id, date, subject_id) DO UPDATE,
+which makes re-running an import (or importing overlapping exports) safe.
+Subject names are resolved to ``subject`` ids once per batch (new subjects are
+added), and joined back to names on the way out.
+``export_attendance_csv`` writes the same format back out, streaming rows.
+Reads of a date range go through ``services.terms.attendance_source``, so
+terms archived out of the hot table are still included.
+
+``low_attendance`` lists every (student, subject) under the threshold in one
+term (the current one by default) for a department or a faculty advisor's
+students, reading through ``attendance_source`` like the other range reads so
+SQLite and PostgreSQL return the same rows. It is cached in ``cached_stat``
+alongside the ``attendance`` data version and recomputed only after a change.
+"""
+import csv
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+
+IMPORT_BATCH_SIZE = 5000
+REQUIRED_COLUMNS = ('enrollment_no', 'date', 'subject', 'status')
+MAX_ERROR_SAMPLES = 20
+
+STATUS_ALIASES = {
+    'present': 'Present', 'p': 'Present', '1': 'Present',
+    'absent': 'Absent', 'a': 'Absent', '0': 'Absent',
+}
+
+
+def enrollment_index():
+    """{enrollment_no: StudentDetails.id} for every student, loaded in one query."""
+    from models import StudentDetails
+    return dict(db.session.query(StudentDetails.enrollment_no, StudentDetails.id))
+
+
+def _parse_date(value, date_format):
+    if date_format is None:
+        return date.fromisoformat(value)
+    return datetime.strptime(value, date_format).date()
+
+
+def _with_subject_ids(rows):
+    """Attendance dicts keyed by ``subject_id``; ``subject`` names are looked up (or added) in one query."""
+    from models import Subject
+    from services.dimensions import dimension_ids
+    ids = dimension_ids(Subject, {row['subject'] for row in rows if 'subject_id' not in row})
+    return [row if 'subject_id' in row else
+            {**{k: v for k, v in row.items() if k != 'subject'}, 'subject_id': ids[row['subject']]}
+            for row in rows]
+
+
+def upsert_attendance(rows):
+    """INSERT ... ON CONFLICT DO UPDATE a list of attendance dicts (caller commits).
+
+    Rows name their subject (``subject``) or give its id (``subject_id``).
+    Marks dated in an archived term go to that term's table, and with
+    ATTENDANCE_BITMAPS on they are also folded into the bitsets.
+    """
+    from services import bitmaps
+    from services.terms import route_rows
+    if not rows:
+        return
+    rows = _with_subject_ids(rows)
+    dialect = db.session.connection().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    for table, table_rows in route_rows(rows).items():
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=['student_id', 'date', 'subject_id'],
+                                          set_={'status': stmt.excluded.status})
+        db.session.execute(stmt, table_rows)
+    if bitmaps.enabled():
+        bitmaps.apply_marks(rows)
+
+
+def student_attendance(student_id, start=None, end=None):
+    """One student's (date, subject, status) rows dated in [start, end), newest first."""
+    from models import Subject
+    from services.terms import attendance_source
+    source = attendance_source(start, end)
+    query = db.select(source.c.date, Subject.name.label('subject'), source.c.status) \
+        .join_from(source, Subject, Subject.id == source.c.subject_id).where(source.c.student_id == student_id)
+    if start:
+        query = query.where(source.c.date >= start)
+    if end:
+        query = query.where(source.c.date < end)
+    return db.session.execute(query.order_by(source.c.date.desc(), Subject.name)).all()
+
+
+def import_attendance_csv(stream, batch_size=IMPORT_BATCH_SIZE, date_format=None, dry_run=False,
+                          progress=None):
+    """Import attendance from a CSV text stream with a header row.
+
+    Rows whose enrollment number is unknown, or whose date or status cannot be
+    parsed, are counted and skipped (a few are kept as samples for the report).
+    ``progress(report)`` is called after every committed batch. Returns the report.
+    """
+    from services.fragments import bump_version
+    reader = csv.DictReader(stream)
+    header = [(name or '').strip().lower() for name in (reader.fieldnames or [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    reader.fieldnames = header
+
+    students = enrollment_index()
+    report = {'read': 0, 'imported': 0, 'unknown_student': 0, 'invalid': 0,
+              'errors': [], 'seconds': 0.0, 'rows_per_second': 0}
+    start = time.perf_counter()
+    batch = {}
+
+    def skip(kind, line, message):
+        report[kind] += 1
+        if len(report['errors']) < MAX_ERROR_SAMPLES:
+            report['errors'].append(f'line {line}: {message}')
+
+    def flush():
+        if not batch:
+            return
+        if not dry_run:
+            upsert_attendance(list(batch.values()))
+            bump_version('attendance')
+            db.session.commit()
+        report['imported'] += len(batch)
+        batch.clear()
+        report['seconds'] = time.perf_counter() - start
+        report['rows_per_second'] = int(report['read'] / report['seconds']) if report['seconds'] else 0
+        if progress:
+            progress(report)
+
+    for row in reader:
+        report['read'] += 1
+        line = reader.line_num
+        student_id = students.get((row['enrollment_no'] or '').strip())
+        if student_id is None:
+            skip('unknown_student', line, f"unknown enrollment_no {row['enrollment_no']!r}")
+            continue
+        try:
+            day = _parse_date((row['date'] or '').strip(), date_format)
+        except ValueError:
+            skip('invalid', line, f"bad date {row['date']!r}")
+            continue
+        status = STATUS_ALIASES.get((row['status'] or '').strip().lower())
+        subject = (row['subject'] or '').strip()
+        if status is None or not subject:
+            skip('invalid', line, f"bad status {row['status']!r} or empty subject")
+            continue
+        # Later rows for the same (student, date, subject) win, as with the upsert itself
+        batch[(student_id, day, subject)] = {'student_id': student_id, 'date': day,
+                                             'subject': subject, 'status': status}
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = int(report['read'] / report['seconds']) if report['seconds'] else 0
+    return report
+
+
+def _export_query(columns, department=None, start=None, end=None):
+    """SELECT ``columns(source)`` over marks joined to their students and subjects, filtered like the export form."""
+    from models import StudentDetails, Subject
+    from services.terms import attendance_source
+    source = attendance_source(start, end + timedelta(days=1) if end else None)
+    query = db.select(*columns(source)).select_from(source) \
+        .join(StudentDetails, StudentDetails.id == source.c.student_id) \
+        .join(Subject, Subject.id == source.c.subject_id)
+    if department:
+        query = query.where(StudentDetails.department == department)
+    if start:
+        query = query.where(source.c.date >= start)
+    if end:
+        query = query.where(source.c.date <= end)
+    return query, source
+
+
+def count_attendance(department=None, start=None, end=None):
+    """Number of marks ``export_attendance_csv`` would write."""
+    query, _ = _export_query(lambda source: [db.func.count()], department, start, end)
+    return db.session.execute(query).scalar()
+
+
+def export_attendance_csv(stream, department=None, start=None, end=None, batch_size=IMPORT_BATCH_SIZE,
+                          progress=None):
+    """Write attendance to a text stream in the import format; returns the number of rows.
+
+    Rows are streamed from the database ``batch_size`` at a time, so the export
+    can be re-imported elsewhere without ever holding it in memory.
+    ``progress(count)`` is called after every batch.
+    """
+    from models import StudentDetails, Subject
+    writer = csv.writer(stream)
+    writer.writerow(REQUIRED_COLUMNS)
+    query, source = _export_query(
+        lambda source: [StudentDetails.enrollment_no, source.c.date, Subject.name, source.c.status],
+        department, start, end)
+    query = query.order_by(source.c.date, StudentDetails.enrollment_no, Subject.name)
+    written = 0
+    for partition in db.session.execute(query.execution_options(yield_per=batch_size)).partitions():
+        writer.writerows((enrollment, day.isoformat(), subject, status)
+                         for enrollment, day, subject, status in partition)
+        written += len(partition)
+        if progress:
+            progress(len(partition))
+    return written
+
+
+# --- Low-attendance early warning -------------------------------------------
+
+LOW_ATTENDANCE_KEY = 'low_attendance:'
+
+
+def compute_low_attendance(department=None, advisor_id=None, threshold=75, term=None):
+    """Every (student, subject) below ``threshold`` percent in ``term`` (the current one by default).
+
+    Scope it to a ``department`` (HOD view) or to the students advised by the
+    faculty member ``advisor_id``. Rows are ordered worst first.
+    """
+    from models import StudentDetails, Subject, User
+    from services.terms import attendance_source, current_term, term_bounds
+    start, end = term_bounds(term or current_term())
+    source = attendance_source(start, end)
+    present = db.func.sum(db.case((source.c.status == 'Present', 1), else_=0))
+    total = db.func.count(source.c.id)
+    q = db.session.query(StudentDetails.id, StudentDetails.enrollment_no, User.username,
+                         StudentDetails.semester, Subject.name, present, total) \
+        .select_from(source) \
+        .join(Subject, Subject.id == source.c.subject_id) \
+        .join(StudentDetails, StudentDetails.id == source.c.student_id) \
+        .join(User, User.id == StudentDetails.user_id) \
+        .filter(source.c.date >= start, source.c.date < end)
+    if department is not None:
+        q = q.filter(StudentDetails.department == department)
+    if advisor_id is not None:
+        q = q.filter(StudentDetails.faculty_id == advisor_id)
+    q = q.group_by(StudentDetails.id, StudentDetails.enrollment_no, User.username,
+                   StudentDetails.semester, Subject.name) \
+         .having(present * 100 < total * threshold) \
+         .order_by((present * 100.0 / total).asc(), StudentDetails.enrollment_no, Subject.name)
+    return [{'student_id': sid, 'enrollment_no': enrollment, 'username': username, 'semester': semester,
+             'subject': subject, 'present': int(p), 'total': int(t), 'percentage': round(p * 100.0 / t, 1)}
+            for sid, enrollment, username, semester, subject, p, t in q]
+
+
+def low_attendance(department=None, advisor_id=None, threshold=None, term=None):
+    """Cached ``compute_low_attendance``; recomputed only after attendance changes or for another term."""
+    import json
+    from flask import current_app
+    from models import CachedStat
+    from services.fragments import versions
+    from services.terms import current_term
+    if threshold is None:
+        threshold = current_app.config.get('LOW_ATTENDANCE_THRESHOLD', 75)
+    term = term or current_term()
+    version, = versions(['attendance'])
+    scope = f'advisor:{advisor_id}' if advisor_id is not None else f'department:{department}'
+    key = LOW_ATTENDANCE_KEY + scope
+    row = db.session.get(CachedStat, key)
+    if row is not None:
+        cached = json.loads(row.value)
+        if (cached['version'], cached['threshold'], cached.get('term')) == (version, threshold, term):
+            return cached['rows']
+    rows = compute_low_attendance(department=department, advisor_id=advisor_id, threshold=threshold, term=term)
+    # An upsert, like bump_version: two first requests for the same scope must not both INSERT the key
+    table = CachedStat.__table__
+    insert = postgresql.insert if db.session.connection().dialect.name == 'postgresql' else sqlite.insert
+    value = json.dumps({'version': version, 'threshold': threshold, 'term': term, 'rows': rows})
+    stmt = insert(table).values(key=key, value=value, refreshed_at=datetime.utcnow())
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.key], set_={'value': stmt.excluded.value, 'refreshed_at': stmt.excluded.refreshed_at}))
+    db.session.commit()
+    return rows
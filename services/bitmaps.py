@@ -0,0 +1,237 @@
+"""Compact attendance: a pair of bitsets per (student, subject, term).
+
+A mark row carries a date, a subject id and a 10-character status, plus its
+id and two indexes; a student's term in one subject is at most 184
+of them. ``attendance_bitmap`` keeps the same information in one row with two
+bitsets of one bit per day of the term (bit ``n`` is term start + ``n`` days,
+stored as little-endian bytes, 23 bytes for a full term):
+
+* ``sessions``: the subject's class was marked for the student that day;
+* ``present``: ... and the student was present (a subset of ``sessions``).
+
+Attendance rows stay the system of record: imports, exports, analytics and
+term archival read them. With ATTENDANCE_BITMAPS on, ``upsert_attendance``
+also folds every write into the bitsets (``apply_marks``) and the student
+attendance page decodes them (``student_marks``) instead of reading the rows.
+Totals and percentages are popcounts; a streak is the popcount of sessions
+between two absences. ``rebuild`` (``flask attendance build-bitmaps``)
+derives the bitsets from the rows, to backfill before turning the option on.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+from services.terms import term_bounds, term_label, terms_between
+
+REBUILD_BATCH = 5000
+
+Mark = namedtuple('Mark', 'date subject status')
+
+
+def enabled():
+    return current_app.config.get('ATTENDANCE_BITMAPS', False)
+
+
+def to_int(data):
+    return int.from_bytes(data or b'', 'little')
+
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def _bits(value):
+    """Positions of the set bits of ``value``, lowest first."""
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+def _positions():
+    """Memoized ``day -> (term, bit)``; a batch of marks only spans a handful of dates."""
+    cache = {}
+
+    def position(day):
+        if day not in cache:
+            label = term_label(day)
+            cache[day] = label, (day - term_bounds(label)[0]).days
+        return cache[day]
+    return position
+
+
+def fold(rows):
+    """{(student_id, term, subject_id): (touched, present)} bits of attendance dicts; later rows win."""
+    position = _positions()
+    folded = {}
+    for row in rows:
+        term, bit = position(row['date'])
+        key = (row['student_id'], term, row['subject_id'])
+        touched, present = folded.get(key, (0, 0))
+        mask = 1 << bit
+        folded[key] = (touched | mask, present | mask if row['status'] == 'Present' else present & ~mask)
+    return folded
+
+
+def apply_marks(rows):
+    """Fold attendance dicts (keyed by ``subject_id``) into the stored bitsets (caller commits).
+
+    Missing bitsets are created empty with INSERT ... ON CONFLICT DO NOTHING,
+    then every affected one is read (FOR UPDATE on PostgreSQL; SQLite already
+    holds the write lock) and written back, so concurrent markers never lose bits.
+    """
+    from models import AttendanceBitmap
+    folded = fold(rows)
+    if not folded:
+        return
+    table = AttendanceBitmap.__table__
+    dialect = db.session.connection().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    now = datetime.utcnow()
+    db.session.execute(insert(table).on_conflict_do_nothing(), [
+        {'student_id': student_id, 'term': term, 'subject_id': subject_id, 'sessions': b'', 'present': b'',
+         'updated_at': now} for student_id, term, subject_id in folded])
+    query = db.select(table.c.student_id, table.c.term, table.c.subject_id, table.c.sessions, table.c.present) \
+        .where(table.c.student_id.in_({key[0] for key in folded}),
+               table.c.term.in_({key[1] for key in folded}),
+               table.c.subject_id.in_({key[2] for key in folded}))
+    if dialect == 'postgresql':
+        query = query.with_for_update()
+    updates = []
+    for student_id, term, subject_id, sessions, present in db.session.execute(query):
+        key = (student_id, term, subject_id)
+        if key not in folded:
+            continue
+        touched, marked_present = folded[key]
+        updates.append({'b_student_id': student_id, 'b_term': term, 'b_subject_id': subject_id,
+                        'sessions': to_bytes(to_int(sessions) | touched),
+                        'present': to_bytes(to_int(present) & ~touched | marked_present), 'updated_at': now})
+    db.session.execute(table.update().where(
+        table.c.student_id == db.bindparam('b_student_id'), table.c.term == db.bindparam('b_term'),
+        table.c.subject_id == db.bindparam('b_subject_id')), updates)
+
+
+def _stored(student_id, start=None, end=None):
+    """(term, subject name, sessions, present) of one student's bitsets for terms overlapping [start, end)."""
+    from models import AttendanceBitmap, Subject
+    query = db.session.query(AttendanceBitmap.term, Subject.name, AttendanceBitmap.sessions, AttendanceBitmap.present) \
+        .join(Subject, Subject.id == AttendanceBitmap.subject_id).filter(AttendanceBitmap.student_id == student_id)
+    if start is not None and end is not None:
+        query = query.filter(AttendanceBitmap.term.in_(terms_between(start, end)))
+    return [(term, subject, to_int(sessions), to_int(present)) for term, subject, sessions, present in query]
+
+
+def student_marks(student_id, start=None, end=None):
+    """One student's marks in [start, end) decoded from the bitsets, as ``Mark`` rows, newest first."""
+    marks = []
+    for term, subject, sessions, present in _stored(student_id, start, end):
+        first = term_bounds(term)[0]
+        for bit in _bits(sessions):
+            day = first + timedelta(days=bit)
+            if (start is None or day >= start) and (end is None or day < end):
+                marks.append(Mark(day, subject, 'Present' if present >> bit & 1 else 'Absent'))
+    marks.sort(key=lambda mark: mark.subject)
+    marks.sort(key=lambda mark: mark.date, reverse=True)
+    return marks
+
+
+def streaks(sessions, present):
+    """(current, longest) runs of consecutive sessions attended: popcounts of sessions between absences."""
+    absent = sessions & ~present
+    current = (sessions >> absent.bit_length()).bit_count()
+    longest, previous = current, -1
+    for bit in _bits(absent):
+        between = sessions & ((1 << bit) - 1) & ~((1 << (previous + 1)) - 1)
+        longest = max(longest, between.bit_count())
+        previous = bit
+    return current, longest
+
+
+def summarize(subject, sessions, present):
+    total, attended = sessions.bit_count(), present.bit_count()
+    current, longest = streaks(sessions, present)
+    return {'subject': subject, 'total': total, 'present': attended, 'absent': total - attended,
+            'percentage': round(attended * 100.0 / total, 1) if total else 0.0,
+            'current_streak': current, 'longest_streak': longest}
+
+
+def subject_summary(student_id, start=None, end=None):
+    """Per-subject totals, percentage and streaks from the stored bitsets, terms joined end to end."""
+    stored = _stored(student_id, start, end)
+    if not stored:
+        return []
+    base = min(term_bounds(term)[0] for term, *_ in stored).toordinal()
+    combined = {}
+    for term, subject, sessions, present in stored:
+        shift = term_bounds(term)[0].toordinal() - base
+        all_sessions, all_present = combined.get(subject, (0, 0))
+        combined[subject] = (all_sessions | sessions << shift, all_present | present << shift)
+    return [summarize(subject, *combined[subject]) for subject in sorted(combined)]
+
+
+def summarize_marks(marks):
+    """``subject_summary`` for mark rows already loaded (when the bitsets are not kept)."""
+    if not marks:
+        return []
+    base = min(mark.date for mark in marks).toordinal()
+    combined = {}
+    for mark in marks:
+        bit = 1 << (mark.date.toordinal() - base)
+        sessions, present = combined.get(mark.subject, (0, 0))
+        combined[mark.subject] = (sessions | bit, present | bit if mark.status == 'Present' else present)
+    return [summarize(subject, *combined[subject]) for subject in sorted(combined)]
+
+
+def rebuild(term=None, batch_size=REBUILD_BATCH, progress=None):
+    """Recompute the bitsets of one term (or every term) from the attendance rows. Returns bitsets written.
+
+    Rows are streamed in student order and written ``batch_size`` bitsets at a
+    time; ``progress(count)`` is called after every batch.
+    """
+    from models import AttendanceBitmap
+    from services.terms import attendance_source
+    start, end = term_bounds(term) if term else (None, None)
+    deleted = AttendanceBitmap.query
+    if term:
+        deleted = deleted.filter(AttendanceBitmap.term == term)
+    deleted.delete(synchronize_session=False)
+    source = attendance_source(start, end)
+    query = db.select(source.c.student_id, source.c.subject_id, source.c.date, source.c.status)
+    if term:
+        query = query.where(source.c.date >= start, source.c.date < end)
+    query = query.order_by(source.c.student_id)
+    position = _positions()
+    table = AttendanceBitmap.__table__
+    now = datetime.utcnow()
+    pending = {}
+    written = 0
+
+    def flush():
+        nonlocal written
+        db.session.execute(db.insert(table), [
+            {'student_id': student_id, 'term': label, 'subject_id': subject_id, 'sessions': to_bytes(sessions),
+             'present': to_bytes(present), 'updated_at': now}
+            for (student_id, label, subject_id), (sessions, present) in pending.items()])
+        written += len(pending)
+        if progress:
+            progress(len(pending))
+        pending.clear()
+
+    current_student = None
+    for partition in db.session.execute(query.execution_options(yield_per=batch_size * 10)).partitions():
+        for student_id, subject_id, day, status in partition:
+            if student_id != current_student and len(pending) >= batch_size:
+                flush()  # only between students, so no bitset is split across batches
+            current_student = student_id
+            label, bit = position(day)
+            key = (student_id, label, subject_id)
+            sessions, present = pending.get(key, (0, 0))
+            mask = 1 << bit
+            pending[key] = (sessions | mask, present | mask if status == 'Present' else present)
+    if pending:
+        flush()
+    db.session.commit()
+    return written
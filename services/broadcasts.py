@@ -0,0 +1,101 @@
+"""Broadcast feeds: keyset-paginated, pinned first, plus archival of old broadcasts.
+
+Feeds are ordered by (is_pinned DESC, created_at DESC, id DESC), which
+``ix_broadcast_feed`` on (scope, department, is_pinned, created_at) serves
+directly (``is_pinned`` is NOT NULL since migration 0009). Pages continue from
+an opaque cursor instead of an OFFSET, so "load more" costs the same on page 50
+as on page 1.
+
+Broadcasts older than BROADCAST_ARCHIVE_AFTER_MONTHS (pinned ones excepted)
+are moved to ``broadcast_archive`` so the hot table stays small.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+
+FEED_PAGE_SIZE = 20
+ARCHIVE_BATCH = 1000
+
+
+def encode_cursor(broadcast):
+    return f"{int(bool(broadcast.is_pinned))}|{broadcast.created_at.isoformat()}|{broadcast.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from ``encode_cursor``; None if missing or malformed."""
+    from services.api import MAX_INT, MIN_INT
+    try:
+        pinned, created_at, broadcast_id = cursor.split('|')
+        position = bool(int(pinned)), datetime.fromisoformat(created_at), int(broadcast_id)
+    except (AttributeError, ValueError):
+        return None
+    return position if MIN_INT <= position[2] <= MAX_INT else None
+
+
+def feed_query(scope, department=None):
+    from models import Broadcast
+    q = Broadcast.query.filter(Broadcast.scope == scope)
+    # Institution broadcasts have no department; testing for it lets the index seek in that feed too
+    return q.filter(Broadcast.department == department if scope == 'department' else Broadcast.department.is_(None))
+
+
+def feed(scope, department=None, after=None, limit=FEED_PAGE_SIZE):
+    """One page of a feed. Returns (broadcasts, next_cursor or None)."""
+    from models import Broadcast
+    q = feed_query(scope, department)
+    position = decode_cursor(after) if after else None
+    if position:
+        q = q.filter(db.tuple_(Broadcast.is_pinned, Broadcast.created_at, Broadcast.id) < position)
+    rows = q.options(db.joinedload(Broadcast.created_by)) \
+            .order_by(Broadcast.is_pinned.desc(), Broadcast.created_at.desc(), Broadcast.id.desc()) \
+            .limit(limit + 1).all()
+    page, more = rows[:limit], len(rows) > limit
+    return page, (encode_cursor(page[-1]) if more else None)
+
+
+def feed_count(scope, department=None):
+    return feed_query(scope, department).count()
+
+
+def archive_broadcasts(months=None, dry_run=False):
+    """Move unpinned broadcasts older than ``months`` into broadcast_archive. Returns the count."""
+    from models import Broadcast, BroadcastArchive
+    from services.search import remove_documents
+    from services.fragments import bump_version
+    months = months or current_app.config.get('BROADCAST_ARCHIVE_AFTER_MONTHS', 6)
+    cutoff = datetime.utcnow() - timedelta(days=30 * months)
+    stale = Broadcast.query.filter(Broadcast.created_at < cutoff, Broadcast.is_pinned.is_(False))
+    if dry_run:
+        return stale.count()
+
+    columns = ['id', 'title', 'content', 'created_by_id', 'scope', 'department',
+               'created_at', 'updated_at', 'is_pinned']
+    moved = 0
+    while True:
+        ids = [row[0] for row in stale.with_entities(Broadcast.id).order_by(Broadcast.id).limit(ARCHIVE_BATCH)]
+        if not ids:
+            break
+        select = db.select(*[getattr(Broadcast, c) for c in columns], db.literal(datetime.utcnow(), db.DateTime)) \
+                   .where(Broadcast.id.in_(ids))
+        db.session.execute(db.insert(BroadcastArchive).from_select(columns + ['archived_at'], select))
+        Broadcast.query.filter(Broadcast.id.in_(ids)).delete(synchronize_session=False)
+        remove_documents('broadcast', ids)
+        bump_version('broadcasts')
+        db.session.commit()
+        moved += len(ids)
+    return moved
+
+
+def serialize_broadcast(b):
+    return {
+        'id': b.id,
+        'title': b.title,
+        'content': b.content,
+        'created_by': b.created_by.username,
+        'created_at': b.created_at.strftime('%b %d, %Y at %I:%M %p'),
+        'is_pinned': b.is_pinned,
+        'scope': b.scope,
+        'department': b.department or ''
+    }
@@ -0,0 +1,148 @@
+"""Event calendar: date-window queries, the JSON range API and the iCalendar feed.
+
+All reads go through ``events_between`` which filters on the indexed
+``event.event_date`` with a half-open [start, end) range, so a month view
+touches only that month's rows however long the institution's history is.
+
+The iCalendar feed is rebuilt only when the ``events`` data version changes
+(bumped by the event write routes, see services.fragments); its ETag is that
+version, so subscribed calendar clients polling with If-None-Match get a 304.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from extensions import db
+
+MAX_RANGE_DAYS = 400
+FEED_PAST_DAYS = 90
+FEED_FUTURE_DAYS = 365
+
+_feed_cache = {}  # etag -> body
+
+
+def month_window(year, month):
+    """[first day of the month, first day of the next month)."""
+    start = date(year, month, 1)
+    end = date(year + (month == 12), month % 12 + 1, 1)
+    return start, end
+
+
+def week_window(day):
+    """[Monday, next Monday) around ``day``."""
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=7)
+
+
+def parse_month(value, default=None):
+    """Parse ``YYYY-MM``; returns (year, month)."""
+    try:
+        parsed = datetime.strptime(value or '', '%Y-%m')
+        return parsed.year, parsed.month
+    except ValueError:
+        default = default or date.today()
+        return default.year, default.month
+
+
+def parse_range(start, end):
+    """Parse ``start``/``end`` query values (ISO dates or datetimes) into a bounded window.
+
+    Raises ValueError for missing, malformed, reversed or over-long ranges.
+    """
+    start_date = date.fromisoformat((start or '')[:10])
+    end_date = date.fromisoformat((end or '')[:10])
+    if end_date <= start_date:
+        raise ValueError('end must be after start')
+    if (end_date - start_date).days > MAX_RANGE_DAYS:
+        raise ValueError(f'range is limited to {MAX_RANGE_DAYS} days')
+    return start_date, end_date
+
+
+def events_between(start, end):
+    from models import Event
+    return Event.query.filter(Event.event_date >= start, Event.event_date < end) \
+                      .order_by(Event.event_date.asc(), Event.id.asc())
+
+
+def serialize_event(e):
+    return {
+        'id': e.id,
+        'title': e.title,
+        'description': e.description or '',
+        'start': e.event_date.isoformat(),
+        'allDay': True,
+    }
+
+
+# --- iCalendar feed ---------------------------------------------------------
+
+def feed_token(user):
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='calendar-feed').dumps(user.id)
+
+
+def user_for_feed_token(token):
+    from models import User
+    try:
+        user_id = URLSafeSerializer(current_app.config['SECRET_KEY'], salt='calendar-feed').loads(token)
+    except BadSignature:
+        return None
+    return db.session.get(User, user_id)
+
+
+def _ical_escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+                        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Fold content lines longer than 75 octets (RFC 5545 3.1)."""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line
+    parts, current = [], b''
+    for ch in line:
+        encoded = ch.encode('utf-8')
+        if len(current) + len(encoded) > (75 if not parts else 74):
+            parts.append(current.decode('utf-8'))
+            current = b''
+        current += encoded
+    parts.append(current.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def build_ical(events, host):
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Lumen ERP//Event Calendar//EN',
+             'CALSCALE:GREGORIAN', 'X-WR-CALNAME:Lumen ERP Events']
+    for e in events:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:event-{e.id}@{host}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{e.event_date.strftime("%Y%m%d")}',
+            f'DTEND;VALUE=DATE:{(e.event_date + timedelta(days=1)).strftime("%Y%m%d")}',
+            f'SUMMARY:{_ical_escape(e.title)}',
+        ]
+        if e.description:
+            lines.append(f'DESCRIPTION:{_ical_escape(e.description)}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def ical_feed(host):
+    """(body, etag) for the feed window around today, regenerated only when events change."""
+    from services.fragments import versions
+    today = date.today()
+    version, = versions(['events'])
+    etag = hashlib.sha1(f'{version}|{today.isoformat()}|{host}'.encode()).hexdigest()
+    body = _feed_cache.get(etag)
+    if body is None:
+        events = events_between(today - timedelta(days=FEED_PAST_DAYS),
+                                today + timedelta(days=FEED_FUTURE_DAYS)).all()
+        body = build_ical(events, host)
+        _feed_cache.clear()
+        _feed_cache[etag] = body
+    return body, etag
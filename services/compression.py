@@ -0,0 +1,209 @@
+"""Response compression and HTML template minification.
+
+``init_app`` installs an ``after_request`` hook that compresses text responses
+(HTML, JSON, CSS, JS, CSV, iCalendar) with the client's preferred coding from
+Accept-Encoding: brotli when the optional ``brotli`` package is installed and
+the client prefers it (ties go to brotli), gzip otherwise. Bodies under
+COMPRESS_MIN_SIZE are sent as they are, since the coding overhead eats the
+savings on a few hundred bytes. Streamed responses (``stream_template``,
+generators) are compressed chunk by chunk as they are produced, with a sync
+flush every STREAM_FLUSH_SIZE bytes so the browser can start rendering before
+the last row is out. File downloads (``send_file``, X-Sendfile) and range
+responses are left alone. A compressed response's ETag becomes weak, so an
+If-None-Match revalidation still matches whichever coding the client received.
+
+With MINIFY_HTML on, ``.html`` templates lose their indentation and blank
+lines when Jinja loads them (outside ``<pre>``, ``<textarea>`` and
+``<script>``). Only the template source is touched, never the values rendered
+into it, and the work is done once per template instead of on every response.
+
+``compression_stats`` reports the bytes each route produced and sent, for this
+worker process (``/admin/compression/stats``).
+"""
+import gzip
+import re
+import threading
+import zlib
+
+from flask import current_app, request
+from jinja2.ext import Extension
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+MIN_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 11 compresses a little better at many times the CPU; too slow per request
+STREAM_FLUSH_SIZE = 16 * 1024
+COMPRESSIBLE_TYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/calendar', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+})
+
+
+def available():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def negotiate(accept_encodings, size=None, min_size=MIN_SIZE):
+    """The coding for a ``size``-byte body (None if unknown, e.g. streamed), or None to send it as is."""
+    if size is not None and size < min_size:
+        return None
+    return accept_encodings.best_match(available())
+
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class _StreamCompressor:
+    """Incremental gzip/brotli with the same three calls for both."""
+
+    def __init__(self, coding):
+        if coding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    def compress(self, data):
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def flush(self):
+        return self._brotli.flush() if self._brotli else self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._brotli.finish() if self._brotli else self._zlib.flush(zlib.Z_FINISH)
+
+
+def _compress_stream(chunks, coding, record):
+    compressor = _StreamCompressor(coding)
+    size = sent = pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            size += len(chunk)
+            pending += len(chunk)
+            out = compressor.compress(chunk)
+            if pending >= STREAM_FLUSH_SIZE:
+                out += compressor.flush()
+                pending = 0
+            if out:
+                sent += len(out)
+                yield out
+        out = compressor.finish()
+        sent += len(out)
+        yield out
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        record(size, sent)
+
+
+class CompressionStats:
+    """Thread-safe per-route byte counters."""
+
+    def __init__(self):
+        self._routes = {}  # route -> [responses, compressed, bytes, bytes_sent]
+        self._lock = threading.Lock()
+
+    def record(self, route, size, sent, compressed):
+        with self._lock:
+            counters = self._routes.setdefault(route, [0, 0, 0, 0])
+            counters[0] += 1
+            counters[1] += compressed
+            counters[2] += size
+            counters[3] += sent
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self):
+        with self._lock:
+            rows = {route: list(counters) for route, counters in self._routes.items()}
+        routes = {
+            route: {'responses': responses, 'compressed': compressed, 'bytes': size, 'bytes_sent': sent,
+                    'bytes_saved': size - sent, 'ratio': round(sent / size, 3) if size else None}
+            for route, (responses, compressed, size, sent) in rows.items()
+        }
+        return dict(sorted(routes.items(), key=lambda item: -item[1]['bytes_saved']))
+
+
+def compress_response(response):
+    """``after_request`` hook: compress eligible responses for clients that accept it."""
+    config = current_app.config
+    if (not config.get('COMPRESS_ENABLED', True) or response.status_code < 200
+            or response.status_code in (204, 206, 304) or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    stats = current_app.extensions['compression_stats']
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+
+    if response.is_streamed:
+        coding = negotiate(request.accept_encodings)
+        if coding is None:
+            return response
+        response.response = _compress_stream(
+            response.response, coding, lambda size, sent: stats.record(route, size, sent, True))
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        coding = negotiate(request.accept_encodings, len(body), config.get('COMPRESS_MIN_SIZE', MIN_SIZE))
+        if coding is None:
+            stats.record(route, len(body), len(body), False)
+            return response
+        compressed = compress(body, coding)
+        stats.record(route, len(body), len(compressed), True)
+        response.set_data(compressed)
+
+    response.content_encoding = coding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# --- Template minification --------------------------------------------------
+
+_VERBATIM = re.compile(r'<(pre|textarea|script)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_LINE_BREAKS = re.compile(r'\s*\n\s*')
+
+
+def minify_html(source):
+    """Collapse every run of whitespace containing a line break to one newline, except in verbatim elements."""
+    parts, position = [], 0
+    for match in _VERBATIM.finditer(source):
+        parts.append(_LINE_BREAKS.sub('\n', source[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_LINE_BREAKS.sub('\n', source[position:]))
+    return ''.join(parts)
+
+
+class MinifyExtension(Extension):
+    """Minify ``.html`` template sources as Jinja loads them."""
+
+    def preprocess(self, source, name, filename=None):
+        if name and name.endswith('.html'):
+            return minify_html(source)
+        return source
+
+
+def init_app(app):
+    app.extensions['compression_stats'] = CompressionStats()
+    app.after_request(compress_response)
+    if app.config.get('MINIFY_HTML'):
+        app.jinja_env.add_extension(MinifyExtension)
+
+
+def compression_stats():
+    stats = current_app.extensions.get('compression_stats')
+    return stats.stats() if stats else {}
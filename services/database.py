@@ -0,0 +1,74 @@
+"""Database engine profile: SQLite for development, PostgreSQL for production.
+
+``init_app`` runs before ``db.init_app`` so the engine is created with:
+
+* PostgreSQL: a pool of DB_POOL_SIZE connections (plus DB_MAX_OVERFLOW under
+  bursts), pre-ping to replace connections the server has closed, and
+  DB_POOL_RECYCLE. Heroku-style ``postgres://`` URLs are accepted.
+* SQLite: WAL journal mode, so readers never block the writer, and a busy
+  timeout (SQLITE_BUSY_TIMEOUT) so concurrent writers queue for the lock
+  instead of failing with "database is locked".
+
+The helpers below use the SQLAlchemy inspector instead of SQLite-only
+catalogue queries (``sqlite_master``, ``PRAGMA table_info``), so maintenance
+scripts work on either database.
+"""
+import sqlite3
+
+from sqlalchemy import MetaData, event, inspect
+from sqlalchemy.engine import Engine
+
+from extensions import db
+
+
+def init_app(app):
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('postgres://'):
+        uri = app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://' + uri[len('postgres://'):]
+    if 'SQLALCHEMY_ENGINE_OPTIONS' in app.config:
+        return  # set explicitly by the config class
+    if uri.startswith('postgresql'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    elif uri.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT']},
+        }
+        if app.config.get('SQLITE_WAL') and not event.contains(Engine, 'connect', _sqlite_on_connect):
+            event.listen(Engine, 'connect', _sqlite_on_connect)
+
+
+def _sqlite_on_connect(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        # In-memory databases answer 'memory' and stay as they are
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+
+def dialect_name():
+    return db.engine.dialect.name
+
+
+def table_names():
+    return sorted(inspect(db.engine).get_table_names())
+
+
+def columns(table):
+    """[(name, type)] for ``table``, in column order."""
+    return [(c['name'], str(c['type'])) for c in inspect(db.engine).get_columns(table)]
+
+
+def drop_all_tables():
+    """Drop every table in the database, including ones the models no longer define."""
+    from services import search
+    search.drop_search_index()
+    metadata = MetaData()
+    metadata.reflect(bind=db.engine)
+    metadata.drop_all(bind=db.engine)
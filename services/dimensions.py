@@ -0,0 +1,58 @@
+"""Department, course, section and subject names, stored once per name.
+
+Students, allotments, attendance marks and attendance bitsets reference these
+tables by integer id (migration 0008) instead of repeating the name on every
+row. The models keep their ``department``/``course``/``class_name``/``subject``
+attributes as names (``models.dimension_name``): assigning a name goes through
+``dimension``, which adds names it has not seen. Bulk writers that build Core
+rows resolve a whole batch of names at once with ``dimension_ids``, and the
+dropdowns read their vocabulary with ``names``.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+
+
+def _insert_missing(model, names):
+    """INSERT ... ON CONFLICT DO NOTHING, so concurrent writers adding the same name never fail."""
+    insert = postgresql.insert if db.session.connection().dialect.name == 'postgresql' else sqlite.insert
+    db.session.execute(insert(model.__table__).on_conflict_do_nothing(), [{'name': name} for name in names])
+
+
+def dimension(model, name):
+    """The ``model`` row called ``name``, added if missing (None for a blank name)."""
+    name = (name or '').strip()
+    if not name:
+        return None
+    # Names are often assigned while the owning row is half-built; flushing it now would fail
+    with db.session.no_autoflush:
+        for pending in db.session.new:
+            if type(pending) is model and pending.name == name:
+                return pending
+        row = model.query.filter_by(name=name).first()
+        if row is None:
+            _insert_missing(model, [name])
+            row = model.query.filter_by(name=name).one()
+    return row
+
+
+def dimension_ids(model, names):
+    """{name: id} for every name in ``names``, adding the missing ones in one statement."""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    query = db.session.query(model.name, model.id).filter(model.name.in_(names))
+    ids = dict(query.all())
+    missing = names - ids.keys()
+    if missing:
+        _insert_missing(model, sorted(missing))
+        ids = dict(query.all())
+    return ids
+
+
+def names(model, used_by=None):
+    """Sorted names of ``model``; only those referenced by ``used_by`` (a foreign key column) if given."""
+    query = db.session.query(model.name)
+    if used_by is not None:
+        query = query.filter(model.id.in_(db.select(used_by).distinct()))
+    return [name for name, in query.order_by(model.name)]
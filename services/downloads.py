@@ -0,0 +1,93 @@
+"""Download and static-asset delivery.
+
+``send_protected_file`` is called after the route has done its permission
+check. It answers HTTP Range and conditional (ETag) requests itself, or, when
+configured, hands the transfer to the front server so no gunicorn worker is
+held for the length of a large download:
+
+* ``USE_X_SENDFILE = True`` (Flask built-in) emits ``X-Sendfile`` for Apache/lighttpd.
+* ``X_ACCEL_REDIRECT_PREFIX = '/protected-uploads/'`` emits ``X-Accel-Redirect``
+  for nginx, with that prefix mapped to UPLOAD_FOLDER by an ``internal`` location,
+  and ``<prefix>objects/`` and ``<prefix>certificates/`` to those directories
+  of STORAGE_FOLDER.
+
+``static_url`` builds fingerprinted static URLs (``?v=<content hash>``) which
+are served with a year-long immutable Cache-Control.
+"""
+import hashlib
+import os
+from urllib.parse import quote
+
+from flask import current_app, request, send_file, url_for
+
+_static_hashes = {}
+
+
+def _accel_path(path):
+    """``path`` relative to STORAGE_FOLDER if it is in there, else to UPLOAD_FOLDER."""
+    from services.storage import storage_root
+    rel_path = os.path.relpath(path, storage_root())
+    if rel_path.split(os.sep, 1)[0] == os.pardir:
+        rel_path = os.path.relpath(path, current_app.config['UPLOAD_FOLDER'])
+    return rel_path
+
+
+def send_protected_file(path, download_name, mimetype=None, etag=None):
+    """Serve ``path`` (inside STORAGE_FOLDER or UPLOAD_FOLDER) as an attachment with caching headers."""
+    prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    max_age = current_app.config.get('DOWNLOAD_MAX_AGE', 3600)
+    if prefix:
+        rel_path = _accel_path(path)
+        response = current_app.response_class(mimetype=mimetype or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(rel_path.replace(os.sep, '/'))
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        if etag:
+            response.set_etag(etag)
+            if request.if_none_match.contains(etag):
+                response.status_code = 304
+                response.headers.pop('X-Accel-Redirect')
+    else:
+        response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                             etag=etag if etag else True, conditional=True, max_age=max_age)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _content_hash(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()[:12]
+    _static_hashes[path] = (mtime, digest)
+    return digest
+
+
+def static_url(filename):
+    """URL for a static asset, fingerprinted with its content hash."""
+    digest = _content_hash(filename)
+    if digest is None:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=filename, v=digest)
+
+
+def init_app(app):
+    """Register ``static_url`` in Jinja and long-cache fingerprinted static responses."""
+    app.jinja_env.globals['static_url'] = static_url
+
+    @app.after_request
+    def cache_fingerprinted_static(response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config.get('STATIC_FINGERPRINT_MAX_AGE', 31536000)
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,169 @@
+"""Fee ledger: SQL-side filtering, pagination and outstanding-dues aggregates.
+
+Amounts are stored as integer paise (``Fee.amount_paise``) so sums are exact and
+never go through floating point. Everything here is evaluated in the database;
+no function loads the whole fee table into Python.
+"""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+
+FEES_PER_PAGE = 50
+
+
+def rupees(paise):
+    """Convert integer paise (or None) to an exact Decimal rupee amount."""
+    return Decimal(paise or 0).scaleb(-2)
+
+
+def fee_ledger_query(status=None, department=None, semester=None, search=None, overdue=False):
+    """Build a filtered fee query, newest due date first.
+
+    ``status`` and ``overdue`` hit the (student_id, status) / (due_date, status)
+    indexes; department and search filter through the student join.
+    """
+    from models import Fee, StudentDetails, User
+    q = Fee.query.join(StudentDetails, Fee.student_id == StudentDetails.id)
+    if status:
+        q = q.filter(Fee.status == status)
+    if overdue:
+        q = q.filter(Fee.status != 'Paid', Fee.due_date < date.today())
+    if department:
+        q = q.filter(StudentDetails.department == department)
+    if semester is not None:
+        q = q.filter(Fee.semester == semester)
+    if search:
+        like = f'%{search}%'
+        q = q.join(User, StudentDetails.user_id == User.id).filter(
+            db.or_(StudentDetails.enrollment_no.ilike(like), User.username.ilike(like))
+        )
+    return q.options(joinedload(Fee.student).joinedload(StudentDetails.user)) \
+            .order_by(Fee.due_date.desc(), Fee.id.desc())
+
+
+def ledger_filters(args):
+    """``fee_ledger_query`` filters from request args (``status``, ``department``, ``semester``, ``q``)."""
+    return {
+        'status': args.get('status', '').strip() or None,
+        'department': args.get('department', '').strip() or None,
+        'semester': args.get('semester', type=int),
+        'search': args.get('q', '').strip() or None,
+    }
+
+
+def paginate_fees(page=1, per_page=FEES_PER_PAGE, **filters):
+    """Return a Flask-SQLAlchemy pagination of the filtered ledger."""
+    return fee_ledger_query(**filters).paginate(page=page, per_page=per_page, error_out=False)
+
+
+def outstanding_dues():
+    """Outstanding (not Paid) dues per department and semester, in one grouped query."""
+    from models import Department, Fee, StudentDetails
+    rows = db.session.query(
+        Department.name,
+        Fee.semester,
+        db.func.count(db.distinct(Fee.student_id)),
+        db.func.count(Fee.id),
+        db.func.sum(Fee.amount_paise),
+    ).join(StudentDetails, Fee.student_id == StudentDetails.id) \
+     .join(Department, Department.id == StudentDetails.department_id) \
+     .filter(Fee.status != 'Paid') \
+     .group_by(Department.name, Fee.semester) \
+     .order_by(Department.name.asc(), Fee.semester.asc()) \
+     .all()
+    return [
+        {'department': dept, 'semester': sem, 'students': students,
+         'fees': fees, 'outstanding': rupees(total)}
+        for dept, sem, students, fees, total in rows
+    ]
+
+
+def total_collected():
+    """Sum of all Paid fees, as exact rupees."""
+    from models import Fee
+    total = db.session.query(db.func.sum(Fee.amount_paise)).filter(Fee.status == 'Paid').scalar()
+    return rupees(total)
+
+
+def serialize_fee(fee, with_student=False):
+    item = {
+        'id': fee.id,
+        'title': fee.title,
+        'amount_paise': fee.amount_paise,
+        'due_date': fee.due_date.isoformat(),
+        'status': fee.status,
+        'semester': fee.semester,
+    }
+    if with_student:
+        item['student'] = fee.student.user.username
+        item['enrollment_no'] = fee.student.enrollment_no
+    return item
+
+
+def fee_departments():
+    """Distinct student departments, for the ledger filter dropdown."""
+    from models import Department, StudentDetails
+    from services.dimensions import names
+    return names(Department, used_by=StudentDetails.department_id)
+
+
+def _cohort_filter(department=None, course=None, semester=None):
+    from models import StudentDetails
+    clauses = []
+    if department:
+        clauses.append(StudentDetails.department == department)
+    if course:
+        clauses.append(StudentDetails.course == course)
+    if semester is not None:
+        clauses.append(StudentDetails.semester == semester)
+    return clauses
+
+
+def issue_fees(title, amount, due_date, department=None, course=None, semester=None, dry_run=False):
+    """Issue one fee to every student in a department/course/semester cohort.
+
+    Runs as a single set-based ``INSERT ... SELECT`` in one transaction. A
+    student who already has a fee with the same title for their current
+    semester is skipped, so re-running the same issuance never duplicates
+    rows. With ``dry_run`` nothing is written and only the counts are returned.
+
+    Returns a dict with ``matched`` (students in the cohort), ``existing``
+    (already issued) and ``created`` (rows inserted, or that would be).
+    """
+    from models import Fee, StudentDetails, to_paise
+    amount_paise = to_paise(amount)
+    cohort = _cohort_filter(department, course, semester)
+    already_issued = db.exists().where(
+        Fee.student_id == StudentDetails.id,
+        Fee.title == title,
+        Fee.semester == StudentDetails.semester,
+    )
+
+    matched = db.session.query(db.func.count(StudentDetails.id)).filter(*cohort).scalar()
+    pending = db.select(
+        StudentDetails.id,
+        db.literal(title),
+        db.literal(amount_paise, db.BigInteger),
+        db.literal(due_date, db.Date),
+        db.literal('Unpaid'),
+        StudentDetails.semester,
+    ).where(*cohort, ~already_issued)
+
+    if dry_run:
+        created = db.session.execute(
+            db.select(db.func.count()).select_from(pending.subquery())
+        ).scalar()
+    else:
+        stmt = db.insert(Fee).from_select(
+            ['student_id', 'title', 'amount_paise', 'due_date', 'status', 'semester'], pending
+        )
+        try:
+            created = db.session.execute(stmt).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return {'matched': matched, 'existing': matched - created, 'created': created}
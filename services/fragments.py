@@ -0,0 +1,166 @@
+"""Fragment cache for expensive, widely shared parts of Jinja templates.
+
+Wrap a block in ``{% cache 'name', 'namespace', ... %} ... {% endcache %}``.
+The rendered HTML is kept in a size-bounded in-process LRU, keyed by
+(name, role, department, versions of the listed namespaces). Put any other
+variation into the name itself (``'calendar.events.' ~ month``).
+
+Write routes call ``bump_version(namespace)`` before committing. The counter
+lives in ``cached_stat`` (key ``version:<namespace>``) and is committed with the
+change, so every worker process sees the new version on its next request and
+stale entries simply stop being hit until the LRU evicts them.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from extensions import db
+
+VERSION_PREFIX = 'version:'
+
+
+class FragmentCache:
+    """Thread-safe LRU bounded by entry count and total size of the cached HTML."""
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (html, render_seconds)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[1]
+            return entry[0]
+
+    def set(self, key, html, render_seconds):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (html, render_seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'render_ms_saved': round(self.seconds_saved * 1000, 1),
+            }
+
+
+# --- Data versions ----------------------------------------------------------
+
+def bump_version(*namespaces):
+    """Invalidate fragments depending on ``namespaces`` (takes effect when the caller commits)."""
+    from sqlalchemy.dialects import postgresql, sqlite
+    from models import CachedStat
+    table = CachedStat.__table__
+    insert = postgresql.insert if db.session.connection().dialect.name == 'postgresql' else sqlite.insert
+    for namespace in namespaces:
+        # One upsert, so concurrent first bumps cannot both try to INSERT the row
+        stmt = insert(table).values(key=VERSION_PREFIX + namespace, value='1',
+                                    refreshed_at=db.func.current_timestamp())
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'value': db.cast(db.cast(table.c.value, db.Integer) + 1, db.Text),
+                  'refreshed_at': db.func.current_timestamp()}))
+    g.pop('fragment_versions', None)
+
+
+def versions(namespaces):
+    """Current version of each namespace, read once per request."""
+    from models import CachedStat
+    known = g.setdefault('fragment_versions', {})
+    wanted = [n for n in namespaces if n not in known]
+    if wanted:
+        rows = dict(db.session.query(CachedStat.key, CachedStat.value)
+                    .filter(CachedStat.key.in_([VERSION_PREFIX + n for n in wanted])).all())
+        for namespace in wanted:
+            known[namespace] = rows.get(VERSION_PREFIX + namespace, '0')
+    return tuple(known[n] for n in namespaces)
+
+
+# --- Jinja integration ------------------------------------------------------
+
+def fragment_key(name, namespaces):
+    role = department = None
+    if current_user and current_user.is_authenticated:
+        role, department = current_user.role, current_user.department
+    return (name, role, department, versions(namespaces))
+
+
+def render_fragment(name, namespaces, render):
+    """Return cached HTML for the fragment or call ``render()`` and cache its output."""
+    cache = current_app.extensions.get('fragment_cache')
+    if cache is None or not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        return render()
+    key = fragment_key(name, namespaces)
+    html = cache.get(key)
+    if html is None:
+        start = time.perf_counter()
+        html = render()
+        cache.set(key, html, time.perf_counter() - start)
+    return html
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'name', 'namespace', ... %}...{% endcache %}``"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render', [args[0], nodes.List(args[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, namespaces, caller):
+        return Markup(render_fragment(name, namespaces, caller))
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = FragmentCache(
+        max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 512),
+        max_bytes=app.config.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+def cache_stats():
+    cache = current_app.extensions.get('fragment_cache')
+    return cache.stats() if cache else {}
@@ -0,0 +1,266 @@
+"""Background job scheduler backed by the ``job`` table.
+
+Jobs are plain functions registered with ``@scheduled_job(name, cron)``. Their
+schedule, next run time, retry count and lock live in the database, so no
+external broker is needed and several processes can run the scheduler at once:
+a job is claimed with a conditional UPDATE and only the process that wins the
+claim runs it.
+
+Run it as a separate worker (``flask jobs worker``, see the Procfile) or, for
+single-process deployments, in a daemon thread by setting
+``JOB_SCHEDULER_IN_PROCESS = True``.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, date
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+JOBS = {}
+
+LOCK_TIMEOUT = timedelta(minutes=30)
+RETRY_DELAY = timedelta(minutes=1)
+POLL_INTERVAL = 30  # seconds
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+
+def scheduled_job(name, schedule, max_retries=3):
+    """Register ``func`` as a job run on a cron ``schedule``."""
+    CronSchedule(schedule)  # validate at import time
+
+    def decorator(func):
+        JOBS[name] = {'func': func, 'schedule': schedule, 'max_retries': max_retries}
+        return func
+    return decorator
+
+
+class CronSchedule:
+    """Minimal five-field cron expression: ``minute hour day month weekday``.
+
+    Each field accepts ``*``, ``*/n``, ``a``, ``a-b``, ``a-b/n`` and comma lists.
+    Weekday is 0-6 with 0 = Monday (Python's ``date.weekday()``).
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, lo, hi) for field, (lo, hi) in zip(fields, self.RANGES)
+        )
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_str = part.split('/', 1)
+                step = int(step_str)
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < lo or end > hi or step < 1:
+                raise ValueError(f'Cron field {field!r} out of range {lo}-{hi}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def next_after(self, moment):
+        """First matching minute strictly after ``moment``."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if (candidate.month not in self.months or candidate.day not in self.days
+                    or candidate.weekday() not in self.weekdays):
+                candidate = datetime.combine(candidate.date() + timedelta(days=1), datetime.min.time())
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError('Cron expression never matches')
+
+
+def sync_jobs():
+    """Create or update ``job`` rows for every registered job."""
+    from models import Job
+    now = datetime.utcnow()
+    existing = {j.name: j for j in Job.query.all()}
+    for name, spec in JOBS.items():
+        job = existing.get(name)
+        if job is None:
+            job = Job(name=name, schedule=spec['schedule'], max_retries=spec['max_retries'],
+                      next_run_at=CronSchedule(spec['schedule']).next_after(now))
+            db.session.add(job)
+        elif job.schedule != spec['schedule']:
+            job.schedule = spec['schedule']
+            job.next_run_at = CronSchedule(spec['schedule']).next_after(now)
+        job.max_retries = spec['max_retries']
+    db.session.commit()
+
+
+def claim_job(job_id, now, due=True):
+    """Atomically take the lock on a job; True if this process won it.
+
+    With ``due`` the job must still be due at ``now``, so a worker holding a
+    stale list of due jobs cannot claim one that another worker has just run
+    and unlocked. ``due=False`` claims it regardless (``flask jobs run``).
+    """
+    from models import Job
+    conditions = [Job.id == job_id, db.or_(Job.locked_until.is_(None), Job.locked_until < now)]
+    if due:
+        conditions.append(Job.next_run_at <= now)
+    claimed = Job.query.filter(*conditions).update({'locked_by': WORKER_ID, 'locked_until': now + LOCK_TIMEOUT}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def run_job(job):
+    """Run one claimed job and record success, retry or failure."""
+    spec = JOBS.get(job.name)
+    started = datetime.utcnow()
+    try:
+        if spec is None:
+            raise LookupError(f'No registered job named {job.name!r}')
+        result = spec['func']()
+        db.session.commit()
+        job.last_status = 'success'
+        job.last_error = None
+        job.attempts = 0
+        job.next_run_at = CronSchedule(job.schedule).next_after(started)
+        logger.info('Job %s finished: %s', job.name, result)
+    except Exception as exc:
+        db.session.rollback()
+        job.attempts += 1
+        job.last_error = f'{type(exc).__name__}: {exc}'
+        if job.attempts <= job.max_retries:
+            job.last_status = 'retrying'
+            job.next_run_at = started + RETRY_DELAY * (2 ** (job.attempts - 1))
+        else:
+            job.last_status = 'failed'
+            job.attempts = 0
+            job.next_run_at = CronSchedule(job.schedule).next_after(started)
+        logger.exception('Job %s failed (attempt %s)', job.name, job.attempts)
+    job.last_run_at = started
+    job.locked_by = None
+    job.locked_until = None
+    db.session.commit()
+
+
+def run_due_jobs(now=None):
+    """Run every enabled job whose next run time has passed. Returns the names run."""
+    from models import Job
+    now = now or datetime.utcnow()
+    due = Job.query.filter(Job.enabled.is_(True), Job.next_run_at <= now) \
+                   .order_by(Job.next_run_at.asc()).all()
+    ran = []
+    for job in due:
+        if claim_job(job.id, now):
+            db.session.refresh(job)
+            run_job(job)
+            ran.append(job.name)
+    return ran
+
+
+def run_worker(app, poll_interval=POLL_INTERVAL, stop_event=None):
+    """Scheduler loop: sync the registry, then poll for due jobs until stopped."""
+    with app.app_context():
+        sync_jobs()
+    while not (stop_event and stop_event.is_set()):
+        with app.app_context():
+            try:
+                run_due_jobs()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Scheduler poll failed')
+            finally:
+                db.session.remove()
+        if stop_event:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+
+def start_background_scheduler(app):
+    """Run the scheduler loop in a daemon thread inside this process."""
+    thread = threading.Thread(target=run_worker, args=(app,), name='job-scheduler', daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Jobs -------------------------------------------------------------------
+
+@scheduled_job('mark_overdue_fees', '5 0 * * *')
+def mark_overdue_fees():
+    """Flag unpaid fees past their due date as Overdue (uses the due_date/status index)."""
+    from models import Fee
+    return Fee.query.filter(Fee.status == 'Unpaid', Fee.due_date < date.today()) \
+                    .update({'status': 'Overdue'}, synchronize_session=False)
+
+
+@scheduled_job('expire_stale_leaves', '15 0 * * *')
+def expire_stale_leaves():
+    """Close leave requests still awaiting approval after their end date."""
+    from models import Leaves
+    return Leaves.query.filter(
+        Leaves.status.in_(['Pending', 'Pending_Faculty', 'Pending_HOD', 'Pending_Admin']),
+        Leaves.end_date < date.today(),
+    ).update({'status': 'Expired'}, synchronize_session=False)
+
+
+@scheduled_job('refresh_cached_stats', '*/10 * * * *')
+def refresh_cached_stats():
+    """Recompute the admin dashboard figures into the cached_stat table."""
+    from services.stats import refresh_admin_stats
+    return refresh_admin_stats()
+
+
+@scheduled_job('reconcile_notes', '30 1 * * *')
+def reconcile_notes():
+    """Nightly sync of the notes catalogue with the object store (loose files are left alone)."""
+    from services.notes import reconcile_notes as reconcile
+    return reconcile()
+
+
+@scheduled_job('archive_broadcasts', '45 1 * * 6')
+def archive_broadcasts():
+    """Weekly move of old unpinned broadcasts out of the hot feed."""
+    from services.broadcasts import archive_broadcasts as archive
+    return archive()
+
+
+@scheduled_job('refresh_low_attendance', '0 6 * * *')
+def refresh_low_attendance():
+    """Warm the low-attendance report for every department before the day starts."""
+    from models import Department, StudentDetails
+    from services.attendance import low_attendance
+    from services.dimensions import names
+    departments = names(Department, used_by=StudentDetails.department_id)
+    for department in departments:
+        low_attendance(department=department)
+    return len(departments)
+
+
+@scheduled_job('prepare_attendance_terms', '20 0 * * *')
+def prepare_attendance_terms():
+    """Create the current and next term's attendance partitions ahead of time (PostgreSQL)."""
+    from services.terms import prepare_terms
+    return len(prepare_terms())
+
+
+@scheduled_job('archive_attendance_terms', '30 2 1 * *')
+def archive_attendance_terms():
+    """Move terms that have ended out of the hot attendance table (a no-op once they are moved)."""
+    from services.terms import archive_terms
+    return sum(archive_terms().values())
@@ -0,0 +1,38 @@
+"""Leave requests: which ones each role sees.
+
+Admins see the requests waiting on them plus decided ones, HODs and faculty
+see the stages they act on, everyone else sees their own. Shared by the
+leaves page and the JSON API.
+"""
+from sqlalchemy.orm import joinedload
+
+VISIBLE_STATUSES = {
+    'Admin': ('Pending_Admin', 'Approved', 'Rejected'),
+    'HOD': ('Pending_HOD', 'Pending_Admin'),
+    'Faculty': ('Pending_Faculty', 'Pending_HOD'),
+}
+
+
+def visible_leaves(user):
+    """Query of the leave requests ``user`` sees, with each requester loaded alongside."""
+    from models import Leaves
+    statuses = VISIBLE_STATUSES.get(user.role)
+    if statuses:
+        q = Leaves.query.filter(Leaves.status.in_(statuses))
+    else:
+        q = Leaves.query.filter(Leaves.user_id == user.id)
+    return q.options(joinedload(Leaves.user))
+
+
+def serialize_leave(leave):
+    return {
+        'id': leave.id,
+        'user': leave.user.username,
+        'role': leave.user.role,
+        'type': leave.type,
+        'reason': leave.reason,
+        'start_date': leave.start_date.isoformat(),
+        'end_date': leave.end_date.isoformat(),
+        'status': leave.status,
+        'submitted_at': leave.date_submitted.isoformat(),
+    }
@@ -0,0 +1,165 @@
+"""Notes catalogue: indexed, paginated listing of study material.
+
+The catalogue is the ``upload`` table (kind='note'), filled on upload, so the
+notes page never touches the filesystem. ``reconcile_notes`` brings it back in
+line with what is on disk: rows whose blob has vanished are removed, and
+unreferenced blobs are deleted, as are files in the store that have no blob
+row (left by an upload whose transaction rolled back) once they are older
+than ORPHAN_FILE_GRACE.
+
+Loose files at the top of UPLOAD_FOLDER (uploads from before the catalogue,
+manual copies) are catalogued by copying them into the object store: once
+automatically, by ``import_loose_notes_once`` from ``schema.bootstrap``, and
+again on request with ``flask notes reconcile --import-loose`` (never the
+nightly job). The originals stay where they are, since ``/download/<name>``
+links to them keep serving them, and a file already catalogued with the same
+name and content is not imported twice.
+"""
+import hashlib
+import json
+import os
+import time
+
+from flask import current_app
+
+from extensions import db
+
+NOTES_PER_PAGE = 25
+
+ORPHAN_FILE_GRACE = 3600  # seconds: newer files may belong to an upload that has not committed yet
+LOOSE_IMPORT_KEY = 'notes:loose_imported'  # cached_stat row recording the automatic import
+
+
+def notes_query(department=None, subject=None, course=None, search=None):
+    """Filtered note uploads, newest first. ``search`` matches every word (as a prefix) through the search index."""
+    from models import Upload
+    from services.search import matching_refs
+    q = Upload.query.filter(Upload.kind == 'note')
+    if department:
+        q = q.filter(db.or_(Upload.department == department, Upload.department.is_(None)))
+    if subject:
+        q = q.filter(Upload.subject == subject)
+    if course:
+        q = q.filter(Upload.course == course)
+    matches = matching_refs('note', search)
+    if matches is not None:
+        q = q.filter(Upload.id.in_(matches))
+    return q.options(db.joinedload(Upload.blob)).order_by(Upload.created_at.desc(), Upload.id.desc())
+
+
+def paginate_notes(page=1, per_page=NOTES_PER_PAGE, **filters):
+    return notes_query(**filters).paginate(page=page, per_page=per_page, error_out=False)
+
+
+def note_facets():
+    """Distinct departments, subjects and courses used by notes, for the filter dropdowns."""
+    from models import Upload
+
+    def distinct(column):
+        rows = db.session.query(column).filter(Upload.kind == 'note', column.isnot(None)).distinct().all()
+        return sorted(r[0] for r in rows)
+
+    return {
+        'departments': distinct(Upload.department),
+        'subjects': distinct(Upload.subject),
+        'courses': distinct(Upload.course),
+    }
+
+
+def _file_sha256(path):
+    from services.storage import CHUNK_SIZE
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _already_imported(name, sha256):
+    from werkzeug.utils import secure_filename
+    from models import Upload, StoredFile
+    return db.session.query(Upload.id).join(Upload.blob).filter(
+        Upload.kind == 'note', Upload.filename == (secure_filename(name) or 'upload'),
+        StoredFile.sha256 == sha256).first() is not None
+
+
+def import_loose_notes(dry_run=False):
+    """Copy the loose files at the top of UPLOAD_FOLDER into the catalogue; returns how many (would be) imported."""
+    from services.storage import store_stream
+    with os.scandir(current_app.config['UPLOAD_FOLDER']) as entries:
+        loose = [e for e in entries if e.is_file() and not e.name.startswith('.')]
+    imported = 0
+    for entry in loose:
+        if _already_imported(entry.name, _file_sha256(entry.path)):
+            continue
+        imported += 1
+        if dry_run:
+            continue
+        with open(entry.path, 'rb') as fh:
+            store_stream(fh, entry.name, kind='note')
+        db.session.commit()
+    return imported
+
+
+def import_loose_notes_once():
+    """Run ``import_loose_notes`` if it has not run on this database yet; returns the count, or None if skipped."""
+    from models import CachedStat
+    if db.session.get(CachedStat, LOOSE_IMPORT_KEY) is not None:
+        return None
+    imported = import_loose_notes()
+    db.session.add(CachedStat(key=LOOSE_IMPORT_KEY, value=json.dumps({'imported': imported})))
+    db.session.commit()
+    return imported
+
+
+def reconcile_notes(dry_run=False, import_loose=False):
+    """Sync the catalogue with the filesystem; returns counts of what changed (or would)."""
+    from models import Upload, StoredFile
+    from services.storage import blob_path, objects_root
+    from services.search import remove_documents
+    report = {'imported': 0, 'missing': 0, 'blobs_removed': 0, 'orphan_files': 0}
+
+    # 1. Loose files at the top of UPLOAD_FOLDER, copied in on request
+    if import_loose:
+        report['imported'] = import_loose_notes(dry_run)
+
+    # 2. Catalogue rows whose blob is gone from disk
+    blobs = StoredFile.query.all()
+    missing_ids = [b.id for b in blobs if not os.path.exists(blob_path(b.sha256))]
+    if missing_ids:
+        missing = Upload.query.filter(Upload.kind == 'note', Upload.stored_file_id.in_(missing_ids))
+        report['missing'] = missing.count()
+        if not dry_run:
+            remove_documents('note', [u.id for u in missing.with_entities(Upload.id)])
+            missing.delete(synchronize_session=False)
+
+    # 3. Blobs nothing points at any more
+    referenced = db.session.query(Upload.stored_file_id).distinct()
+    orphans = StoredFile.query.filter(StoredFile.id.notin_(referenced)).all()
+    report['blobs_removed'] = len(orphans)
+    if not dry_run:
+        for blob in orphans:
+            path = blob_path(blob.sha256)
+            if os.path.exists(path):
+                os.remove(path)
+            db.session.delete(blob)
+        # Keep ref_count equal to the real number of uploads per blob
+        counts = dict(db.session.query(Upload.stored_file_id, db.func.count(Upload.id))
+                      .group_by(Upload.stored_file_id).all())
+        for blob in StoredFile.query.all():
+            if blob.ref_count != counts.get(blob.id, 0):
+                blob.ref_count = counts.get(blob.id, 0)
+        db.session.commit()
+
+    # 4. Files in the store without a blob row
+    known = {sha256 for sha256, in db.session.query(StoredFile.sha256)}
+    cutoff = time.time() - ORPHAN_FILE_GRACE
+    for dirpath, _, filenames in os.walk(objects_root()):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name in known or os.path.getmtime(path) > cutoff:
+                continue
+            report['orphan_files'] += 1
+            if not dry_run:
+                os.remove(path)
+    return report
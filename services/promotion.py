@@ -0,0 +1,138 @@
+"""Semester promotion: move whole cohorts to the next semester at term end.
+
+``promote_semester`` promotes every student in a department (optionally one
+course) with a single set-based UPDATE, in one transaction together with:
+
+* archiving the term's class allotments to ``class_allotment_archive``
+  (INSERT ... SELECT), tagged with the term label;
+* keeping those allotments as the timetable template for the next term (the
+  incoming cohort of each semester gets the same faculty, subjects and slots,
+  so HODs only edit what changed), or clearing them with ``keep_timetable=False``;
+* renaming sections through a ``{old: new}`` mapping (one CASE expression),
+  for section names that encode the year, e.g. ``I-CS`` -> ``II-CS``;
+* bumping the ``allotments`` and ``attendance`` data versions, so fragment
+  caches, low-attendance reports and analytics snapshots that show a
+  student's semester or section are rebuilt.
+
+Students already in ``final_semester`` are counted as graduating and left as
+they are. ``dry_run`` returns the same report from grouped SELECTs without
+writing. Each (term, department, course) scope can be promoted once; the
+report is kept in ``cached_stat`` and a second run is refused unless ``force``.
+"""
+import json
+import time
+from datetime import datetime
+
+from extensions import db
+from services.terms import current_term
+
+DEFAULT_FINAL_SEMESTER = 8
+PROMOTION_KEY = 'promotion:'
+
+
+def parse_sections(text):
+    """``{old: new}`` from lines or commas of ``OLD=NEW`` (as typed in the form or passed on the CLI)."""
+    mapping = {}
+    for item in text.replace(',', '\n').splitlines():
+        if not item.strip():
+            continue
+        old, sep, new = item.partition('=')
+        if not sep or not old.strip() or not new.strip():
+            raise ValueError(f'Section mapping {item.strip()!r} is not OLD=NEW')
+        mapping[old.strip()] = new.strip()
+    return mapping
+
+
+def _promotion_key(term, department, course):
+    return f'{PROMOTION_KEY}{term}:{department or "*"}:{course or "*"}'[:100]
+
+
+def promotion_history(limit=20):
+    """Reports of past promotions, newest first."""
+    from models import CachedStat
+    rows = CachedStat.query.filter(CachedStat.key.startswith(PROMOTION_KEY)) \
+        .order_by(CachedStat.refreshed_at.desc()).limit(limit)
+    return [json.loads(row.value) for row in rows]
+
+
+def promote_semester(department=None, course=None, final_semester=DEFAULT_FINAL_SEMESTER, sections=None,
+                     term=None, keep_timetable=True, dry_run=False, force=False):
+    """Promote a department/course cohort to the next semester. Returns a report dict.
+
+    Raises ``ValueError`` if this scope was already promoted for ``term``.
+    """
+    from models import CachedStat, ClassAllotment, ClassAllotmentArchive, Course, Department, Section, StudentDetails
+    from services.dimensions import dimension_ids
+    from services.fragments import bump_version
+    start = time.perf_counter()
+    term = term or current_term()
+    sections = {old: new for old, new in (sections or {}).items() if old != new}
+    key = _promotion_key(term, department, course)
+    already_promoted = db.session.get(CachedStat, key) is not None
+    if already_promoted and not dry_run and not force:
+        raise ValueError(f"{department or 'All departments'}{f' / {course}' if course else ''} was already "
+                         f"promoted for term {term}.")
+
+    students = []
+    allotments = []
+    if department:
+        students.append(StudentDetails.department == department)
+        allotments.append(ClassAllotment.department == department)
+    if course:
+        students.append(StudentDetails.course == course)
+        allotments.append(ClassAllotment.course == course)
+    promoting = students + [StudentDetails.semester < final_semester]
+
+    cohorts = [
+        {'department': dept, 'course': crs, 'semester': sem, 'students': count,
+         'to_semester': sem + 1 if sem < final_semester else None}
+        for dept, crs, sem, count in db.session.query(
+            Department.name, Course.name, StudentDetails.semester, db.func.count(StudentDetails.id))
+        .join(Department, Department.id == StudentDetails.department_id)
+        .join(Course, Course.id == StudentDetails.course_id)
+        .filter(*students)
+        .group_by(Department.name, Course.name, StudentDetails.semester)
+        .order_by(Department.name, Course.name, StudentDetails.semester)
+    ]
+    report = {
+        'term': term, 'department': department, 'course': course, 'final_semester': final_semester,
+        'dry_run': dry_run, 'already_promoted': already_promoted, 'keep_timetable': keep_timetable,
+        'sections': sections, 'cohorts': cohorts,
+        'promoted': sum(c['students'] for c in cohorts if c['to_semester']),
+        'graduating': sum(c['students'] for c in cohorts if not c['to_semester']),
+        'sections_renamed': db.session.query(db.func.count(StudentDetails.id)).filter(
+            *promoting, StudentDetails.class_name.in_(list(sections))).scalar() if sections else 0,
+        'allotments_archived': db.session.query(db.func.count(ClassAllotment.id)).filter(*allotments).scalar(),
+    }
+    if dry_run:
+        report['seconds'] = time.perf_counter() - start
+        return report
+
+    archive_columns = ['allotment_id', 'term', 'faculty_id', 'faculty_name', 'department', 'course',
+                       'semester', 'class_name', 'subject', 'slot_id', 'archived_at']
+    db.session.execute(db.insert(ClassAllotmentArchive).from_select(archive_columns, db.select(
+        ClassAllotment.id, db.literal(term), ClassAllotment.faculty_id, ClassAllotment.faculty_name,
+        ClassAllotment.department, ClassAllotment.course, ClassAllotment.semester, ClassAllotment.class_name,
+        ClassAllotment.subject, ClassAllotment.slot_id, db.literal(datetime.utcnow(), db.DateTime),
+    ).where(*allotments)))
+    if not keep_timetable:
+        db.session.execute(db.delete(ClassAllotment).where(*allotments)
+                           .execution_options(synchronize_session=False))
+
+    values = {StudentDetails.semester: StudentDetails.semester + 1}
+    if sections:
+        ids = dimension_ids(Section, set(sections) | set(sections.values()))
+        renames = {ids[old]: ids[new] for old, new in sections.items()}
+        values[StudentDetails.section_id] = db.case(renames, value=StudentDetails.section_id,
+                                                    else_=StudentDetails.section_id)
+    db.session.execute(db.update(StudentDetails).where(*promoting).values(values)
+                       .execution_options(synchronize_session=False))
+
+    bump_version('allotments', 'attendance')
+    report['seconds'] = time.perf_counter() - start
+    row = db.session.get(CachedStat, key) or CachedStat(key=key)
+    row.value = json.dumps(report)
+    row.refreshed_at = datetime.utcnow()
+    db.session.add(row)
+    db.session.commit()
+    return report
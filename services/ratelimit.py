@@ -0,0 +1,275 @@
+"""Token-bucket rate limits for sign-in and the write-heavy routes.
+
+A limit such as ``10/minute`` is a bucket holding up to 10 tokens that refills
+at 10 per minute. Each request takes one token from each of its buckets, and is
+refused with a Retry-After when one is empty. Sign-in (the login form and
+``POST /api/v1/session``) has a bucket per client IP and one per username, and
+both are checked before the user is looked up, so a refused attempt never
+costs a password hash. Routes marked ``@rate_limited(scope)`` take a token per
+write (POST/PUT/PATCH/DELETE) from a bucket per signed-in user, or per IP.
+
+Buckets live in a small SQLite file (RATELIMIT_STORAGE='sqlite', the default,
+``instance/ratelimit.sqlite`` unless RATELIMIT_SQLITE_PATH is set), shared by
+every worker process on the host; each take is one short IMMEDIATE
+transaction. 'memory' keeps them per process instead (development, a single
+worker). If the store fails, requests are let through and the error is logged:
+an outage of the limiter must not lock everyone out.
+
+The IP is ``request.remote_addr``: behind a proxy, wrap the app in Werkzeug's
+ProxyFix so that it is the client's. ``ratelimit_stats`` reports allowed and
+refused requests per scope for this worker process (``/admin/ratelimit/stats``).
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, flash, redirect, request, url_for
+from flask_login import current_user
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+PRUNE_EVERY = 1000  # takes between deletions of long-idle buckets (SQLite store)
+
+
+def parse_limit(limit):
+    """``'10/minute'`` -> (capacity, tokens per second); None for '' or '0' (no limit)."""
+    if not limit or limit.strip() in ('0', 'none', 'off'):
+        return None
+    count, _, period = limit.strip().partition('/')
+    period = period.strip().rstrip('s') or 'minute'
+    if period not in PERIODS or int(count) <= 0:
+        raise ValueError(f'Invalid rate limit {limit!r}; expected e.g. "10/minute"')
+    return int(count), int(count) / PERIODS[period]
+
+
+def _refill(tokens, updated, now, capacity, rate):
+    """Take a token from a bucket last seen at ``updated``: (tokens left, seconds to wait or 0)."""
+    tokens = capacity if tokens is None else min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets in a dict, for one process."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, wait = _refill(tokens, updated, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file shared by the worker processes of one host.
+
+    Each thread opens its own connection on first use (so nothing crosses a
+    gunicorn fork) and takes a token in one IMMEDIATE transaction.
+    """
+
+    def __init__(self, path, busy_timeout=5):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # losing the last few takes in a crash is harmless
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate):
+        conn = self._connection()
+        now = time.time()  # wall clock: shared between processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, wait = _refill(row[0] if row else None, row[1] if row else now, now, capacity, rate)
+            conn.execute('INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._takes += 1
+        if self._takes % PRUNE_EVERY == 0:
+            # Idle a day: refilled to capacity under any limit of at least 1/day
+            conn.execute('DELETE FROM bucket WHERE updated < ?', (now - PERIODS['day'],))
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM bucket')
+
+    def size(self):
+        return self._connection().execute('SELECT COUNT(*) FROM bucket').fetchone()[0]
+
+
+class RateLimitStats:
+    """Thread-safe allowed/refused counters per scope."""
+
+    def __init__(self):
+        self._scopes = {}  # scope -> [allowed, limited]
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def record(self, scope, allowed):
+        with self._lock:
+            counters = self._scopes.setdefault(scope, [0, 0])
+            counters[0 if allowed else 1] += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self.errors = 0
+
+    def stats(self):
+        with self._lock:
+            scopes = {scope: {'allowed': allowed, 'limited': limited}
+                      for scope, (allowed, limited) in self._scopes.items()}
+            return {'scopes': scopes, 'store_errors': self.errors}
+
+
+class RateLimiter:
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits  # scope -> (capacity, rate) or None
+        self.stats = RateLimitStats()
+
+    def hit(self, scope, key):
+        """Take a token from ``key``'s bucket in ``scope``: seconds to wait, or 0 if allowed."""
+        limit = self.limits.get(scope)
+        if limit is None:
+            return 0
+        try:
+            wait = self.store.take(f'{scope}:{key}', *limit)
+        except sqlite3.Error:
+            current_app.logger.exception('Rate limit store failed; letting the request through')
+            self.stats.record_error()
+            return 0
+        self.stats.record(scope, not wait)
+        return wait
+
+
+def _limiter():
+    return current_app.extensions.get('ratelimit')
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def check_login(username):
+    """Seconds the client must wait before this sign-in attempt may be checked, or 0."""
+    limiter = _limiter()
+    if limiter is None:
+        return 0
+    wait = limiter.hit('login_ip', f'ip:{client_ip()}')
+    if not wait and username:  # a client refused for its IP does not drain the username's bucket too
+        wait = limiter.hit('login_user', f'user:{str(username).strip().lower()}')
+    return wait
+
+
+def retry_after(wait):
+    """Whole seconds for a Retry-After header."""
+    return max(1, int(wait + 0.999))
+
+
+def limit_request(scope='writes'):
+    """Take a token from ``scope`` for this request's user (or IP): the refusal response, or None if allowed.
+
+    For views that limit one branch only; ``@rate_limited`` charges every write.
+    """
+    limiter = _limiter()
+    if limiter is None:
+        return None
+    key = f'user:{current_user.id}' if current_user.is_authenticated else f'ip:{client_ip()}'
+    wait = limiter.hit(scope, key)
+    return _too_many_requests(wait) if wait else None
+
+
+def rate_limited(scope='writes'):
+    """Limit writes to a route to ``scope``'s rate per signed-in user (per IP when anonymous).
+
+    Reads pass through. Refused page requests are redirected back with a flash
+    message; refused API requests get a JSON 429.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                refused = limit_request(scope)
+                if refused is not None:
+                    return refused
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _too_many_requests(wait):
+    seconds = retry_after(wait)
+    if request.blueprint == 'api':
+        from services.api import error_response
+        response = error_response(429, f'Too many requests. Try again in {seconds} s.')
+    else:
+        flash(f'Too many requests. Please wait {seconds} seconds and try again.', 'danger')
+        response = redirect(request.referrer or url_for('main.dashboard'))
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+def init_app(app):
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return
+    if app.config.get('RATELIMIT_STORAGE', 'sqlite') == 'memory':
+        store = MemoryBucketStore()
+    else:
+        path = app.config.get('RATELIMIT_SQLITE_PATH') or os.path.join(app.instance_path, 'ratelimit.sqlite')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store = SQLiteBucketStore(path)
+    limits = {scope: parse_limit(app.config.get(setting)) for scope, setting in (
+        ('login_ip', 'RATELIMIT_LOGIN_PER_IP'),
+        ('login_user', 'RATELIMIT_LOGIN_PER_USER'),
+        ('writes', 'RATELIMIT_WRITES'),
+        ('bulk', 'RATELIMIT_BULK'),
+    )}
+    app.extensions['ratelimit'] = RateLimiter(store, limits)
+
+
+def ratelimit_stats():
+    limiter = _limiter()
+    if limiter is None:
+        return {'enabled': False}
+    stats = limiter.stats.stats()
+    try:
+        stats['buckets'] = limiter.store.size()
+    except sqlite3.Error:
+        stats['buckets'] = None
+    stats['limits'] = {scope: {'capacity': limit[0], 'per_second': round(limit[1], 4)} if limit else None
+                       for scope, limit in limiter.limits.items()}
+    return {'enabled': True, **stats}
@@ -0,0 +1,39 @@
+"""Schema bootstrap: the database work needed before the app can serve.
+
+``bootstrap`` upgrades the schema to the latest Alembic revision in
+``migrations/``, builds the search index, seeds the first admin account, moves
+private files left under ``static/`` to STORAGE_FOLDER, and the first time,
+catalogues the notes already lying in UPLOAD_FOLDER.
+Databases created before migrations existed are adopted by the baseline
+revision (0001), which only adds what is missing. Schema changes are new
+revisions (``flask db migrate``/``flask db upgrade``), not startup patches.
+
+Run it once per deploy with ``flask schema bootstrap`` (the Procfile
+``release`` step) rather than in every gunicorn worker. ``create_app`` calls it
+itself only when BOOTSTRAP_ON_STARTUP is set, the default outside production,
+so ``python app.py`` still works on a fresh checkout.
+"""
+from extensions import db
+
+
+def bootstrap():
+    """Bring the database schema up to date and seed the default admin (idempotent)."""
+    from flask_migrate import upgrade
+    from services import search
+    from services.notes import import_loose_notes_once
+    from services.storage import move_private_files
+
+    upgrade()
+    search.init_search_index()
+    seed_admin()
+    move_private_files()
+    import_loose_notes_once()
+
+
+def seed_admin():
+    from models import User
+    if not User.query.filter_by(role='Admin').first():
+        admin = User(username='admin', role='Admin')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
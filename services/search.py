@@ -0,0 +1,304 @@
+"""Full-text search over broadcasts, events, notes and users.
+
+Every searchable record is mirrored into ``search_document`` by ORM events, in
+the same transaction as the write. The text index on top of it depends on the
+database:
+
+* SQLite: an external-content FTS5 table ``search_document_fts`` kept in step
+  by triggers, ranked with bm25().
+* PostgreSQL: a GIN expression index over ``to_tsvector('simple', ...)``,
+  ranked with ts_rank().
+
+Bulk SQL (``query.update``/``delete``, ``INSERT ... SELECT``) bypasses ORM
+events; run ``flask search reindex`` after such changes to searchable tables.
+"""
+import re
+from datetime import datetime
+
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+
+from extensions import db
+
+RESULTS_PER_PAGE = 20
+MAX_TERMS = 8
+REINDEX_BATCH = 1000
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_document_fts USING fts5(
+        title, body, content='search_document', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN
+        INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN
+        INSERT INTO search_document_fts(search_document_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN
+        INSERT INTO search_document_fts(search_document_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_document_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+POSTGRES_VECTOR = "to_tsvector('simple', coalesce(d.title, '') || ' ' || coalesce(d.body, ''))"
+POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(body, '')))",
+]
+
+
+def init_search_index():
+    """Create the dialect-specific text index; on first creation, build it from existing data."""
+    conn = db.session.connection()
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_document_fts'")).first()
+        for ddl in SQLITE_DDL:
+            conn.exec_driver_sql(ddl)
+        db.session.commit()
+        if not exists:
+            reindex()
+    elif dialect == 'postgresql':
+        for ddl in POSTGRES_DDL:
+            conn.exec_driver_sql(ddl)
+        db.session.commit()
+
+
+def drop_search_index():
+    """Drop the SQLite FTS table (its triggers go with search_document; the Postgres index with its table)."""
+    conn = db.session.connection()
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('DROP TABLE IF EXISTS search_document_fts')
+        db.session.commit()
+
+
+# --- Documents --------------------------------------------------------------
+
+def _broadcast_doc(b):
+    return {'kind': 'broadcast', 'ref_id': b.id, 'title': b.title, 'body': b.content,
+            'department': b.department if b.scope == 'department' else None, 'audience': 'all'}
+
+
+def _event_doc(e):
+    return {'kind': 'event', 'ref_id': e.id, 'title': e.title, 'body': e.description,
+            'department': None, 'audience': 'all'}
+
+
+def _note_doc(u):
+    # PostgreSQL's parser reads 'unit_3-notes.pdf' as one file token: index the filename's words too
+    words = ' '.join(re.findall(r'[^\W_]+', u.filename or ''))
+    return {'kind': 'note', 'ref_id': u.id, 'title': u.filename,
+            'body': ' '.join(filter(None, [u.subject, u.course, words])),
+            'department': u.department, 'audience': 'all'}
+
+
+def _user_rows(conn, *where):
+    from models import User, StudentDetails
+    return conn.execute(
+        db.select(User.id, User.username, User.role, User.department,
+                  StudentDetails.enrollment_no, StudentDetails.department, StudentDetails.course)
+        .outerjoin(StudentDetails, StudentDetails.user_id == User.id)
+        .where(*where)
+    )
+
+
+def _user_doc(row):
+    uid, username, role, user_dept, enrollment, student_dept, course = row
+    return {'kind': 'user', 'ref_id': uid, 'title': username,
+            'body': ' '.join(filter(None, [role, enrollment, course])),
+            'department': student_dept or user_dept, 'audience': 'staff'}
+
+
+def _reindex_user(conn, user_id):
+    from models import User
+    row = _user_rows(conn, User.id == user_id).first()
+    if row is not None:
+        _put(conn, _user_doc(row))
+
+
+def _put(conn, doc):
+    from models import SearchDocument
+    table = SearchDocument.__table__
+    _remove(conn, doc['kind'], [doc['ref_id']])
+    conn.execute(table.insert().values(updated_at=datetime.utcnow(), **doc))
+
+
+def _remove(conn, kind, ref_ids):
+    from models import SearchDocument
+    table = SearchDocument.__table__
+    conn.execute(table.delete().where(table.c.kind == kind, table.c.ref_id.in_(ref_ids)))
+
+
+def remove_documents(kind, ref_ids):
+    """Drop index entries for records removed with bulk SQL (caller commits)."""
+    if ref_ids:
+        _remove(db.session.connection(), kind, list(ref_ids))
+
+
+def _listen(model, build, kind, only=None):
+    def upsert(mapper, conn, target):
+        if only is None or only(target):
+            _put(conn, build(target))
+
+    def delete(mapper, conn, target):
+        _remove(conn, kind, [target.id])
+
+    event.listen(model, 'after_insert', upsert)
+    event.listen(model, 'after_update', upsert)
+    event.listen(model, 'after_delete', delete)
+
+
+_events_registered = False
+
+
+def register_events():
+    """Attach the ORM listeners that keep search_document in sync (idempotent)."""
+    global _events_registered
+    if _events_registered:
+        return
+    _events_registered = True
+    from models import Broadcast, Event, Upload, User, StudentDetails
+    _listen(Broadcast, _broadcast_doc, 'broadcast')
+    _listen(Event, _event_doc, 'event')
+    _listen(Upload, _note_doc, 'note', only=lambda u: u.kind == 'note')
+
+    def user_changed(mapper, conn, target):
+        _reindex_user(conn, target.id)
+
+    def student_changed(mapper, conn, target):
+        _reindex_user(conn, target.user_id)
+
+    event.listen(User, 'after_insert', user_changed)
+    event.listen(User, 'after_update', user_changed)
+    event.listen(User, 'after_delete', lambda m, conn, t: _remove(conn, 'user', [t.id]))
+    event.listen(StudentDetails, 'after_insert', student_changed)
+    event.listen(StudentDetails, 'after_update', student_changed)
+
+
+def reindex():
+    """Rebuild every search document from the source tables. Returns the number indexed."""
+    from models import SearchDocument, Broadcast, Event, Upload
+    conn = db.session.connection()
+    table = SearchDocument.__table__
+    conn.execute(table.delete())
+    now = datetime.utcnow()
+    total = 0
+
+    def flush(batch):
+        nonlocal total
+        if batch:
+            conn.execute(table.insert(), [dict(doc, updated_at=now) for doc in batch])
+            total += len(batch)
+        return []
+
+    sources = [
+        (Broadcast.query, _broadcast_doc),
+        (Event.query, _event_doc),
+        (Upload.query.filter(Upload.kind == 'note'), _note_doc),
+    ]
+    for query, build in sources:
+        batch = []
+        for record in query.yield_per(REINDEX_BATCH):
+            batch.append(build(record))
+            if len(batch) >= REINDEX_BATCH:
+                batch = flush(batch)
+        flush(batch)
+
+    batch = []
+    for row in _user_rows(conn).yield_per(REINDEX_BATCH):
+        batch.append(_user_doc(row))
+        if len(batch) >= REINDEX_BATCH:
+            batch = flush(batch)
+    flush(batch)
+    db.session.commit()
+    return total
+
+
+# --- Querying ---------------------------------------------------------------
+
+def _terms(query):
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _visibility(user, params):
+    """SQL restricting documents to what ``user`` may see (Admin sees everything)."""
+    if user.role == 'Admin':
+        return ''
+    params['dept'] = user.department
+    params['is_staff'] = user.role in ('HOD', 'Asst_HOD', 'Faculty')
+    return (" AND ((d.audience = 'all' AND (d.department IS NULL OR d.department = :dept))"
+            " OR (d.audience = 'staff' AND :is_staff AND d.department = :dept))")
+
+
+def _fts_match(terms):
+    """SQLite FTS5 query: every term, as a prefix."""
+    return ' '.join(f'"{t}"*' for t in terms)
+
+
+def _tsquery(terms):
+    """PostgreSQL tsquery: every term, as a prefix."""
+    return ' & '.join(f'{t}:*' for t in terms)
+
+
+def matching_refs(kind, query):
+    """Select of the ``ref_id`` of each ``kind`` document matching every word of ``query``; None if it has none.
+
+    For filtering a listing through the text index, e.g. ``Upload.id.in_(matching_refs('note', q))``.
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    if db.session.connection().dialect.name == 'postgresql':
+        sql = text(f"SELECT d.ref_id FROM search_document d "
+                   f"WHERE d.kind = :kind AND {POSTGRES_VECTOR} @@ to_tsquery('simple', :tsquery)"
+                   ).bindparams(kind=kind, tsquery=_tsquery(terms))
+    else:
+        sql = text("SELECT d.ref_id FROM search_document_fts "
+                   "JOIN search_document d ON d.id = search_document_fts.rowid "
+                   "WHERE search_document_fts MATCH :match AND d.kind = :kind"
+                   ).bindparams(kind=kind, match=_fts_match(terms))
+    return sql.columns(db.column('ref_id', db.Integer))
+
+
+def search(query, user, page=1, per_page=RESULTS_PER_PAGE):
+    """Ranked, paginated search. Returns (hits, has_next); each hit is a dict."""
+    terms = _terms(query)
+    if not terms:
+        return [], False
+    params = {'limit': per_page + 1, 'offset': (max(page, 1) - 1) * per_page}
+    visibility = _visibility(user, params)
+    dialect = db.session.connection().dialect.name
+    if dialect == 'postgresql':
+        params['tsquery'] = _tsquery(terms)
+        sql = f"""
+            SELECT d.id, d.kind, d.ref_id, d.title, d.department,
+                   ts_headline('simple', coalesce(d.body, d.title), q,
+                               'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=24, MinWords=8')
+                       AS snippet,
+                   ts_rank({POSTGRES_VECTOR}, q) AS score
+            FROM search_document d, to_tsquery('simple', :tsquery) q
+            WHERE {POSTGRES_VECTOR} @@ q {visibility}
+            ORDER BY score DESC, d.id DESC LIMIT :limit OFFSET :offset"""
+    else:
+        params['match'] = _fts_match(terms)
+        sql = f"""
+            SELECT d.id, d.kind, d.ref_id, d.title, d.department,
+                   snippet(search_document_fts, -1, char(2), char(3), '…', 16) AS snippet,
+                   bm25(search_document_fts, 10.0, 1.0) AS score
+            FROM search_document_fts
+            JOIN search_document d ON d.id = search_document_fts.rowid
+            WHERE search_document_fts MATCH :match {visibility}
+            ORDER BY score, d.id DESC LIMIT :limit OFFSET :offset"""
+    rows = db.session.execute(text(sql), params).mappings().all()
+    hits = [dict(row, snippet=_highlight(row['snippet'])) for row in rows[:per_page]]
+    return hits, len(rows) > per_page
+
+
+def _highlight(snippet):
+    """Escape a snippet and turn the \\x02/\\x03 match markers into <mark> tags."""
+    if not snippet:
+        return ''
+    return Markup(str(escape(snippet)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
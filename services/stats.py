@@ -0,0 +1,44 @@
+"""Dashboard statistics, precomputed by the scheduler and read from cached_stat."""
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from extensions import db
+
+ADMIN_STATS_KEY = 'admin_panel'
+MAX_STALENESS = timedelta(minutes=30)
+
+
+def compute_admin_stats():
+    from models import User, StudentDetails, FacultyDetails, Leaves
+    from services.fees import total_collected
+    return {
+        'total_users': User.query.count(),
+        'total_students': StudentDetails.query.count(),
+        'total_faculty': FacultyDetails.query.count(),
+        'pending_leaves': Leaves.query.filter_by(status='Pending_Admin').count(),
+        'total_revenue': total_collected()
+    }
+
+
+def refresh_admin_stats():
+    """Recompute the admin stats and store them; returns the fresh values."""
+    from models import CachedStat
+    stats = compute_admin_stats()
+    row = db.session.get(CachedStat, ADMIN_STATS_KEY) or CachedStat(key=ADMIN_STATS_KEY)
+    row.value = json.dumps(stats, default=str)
+    row.refreshed_at = datetime.utcnow()
+    db.session.add(row)
+    db.session.commit()
+    return stats
+
+
+def admin_stats():
+    """Cached admin stats, falling back to a live computation when missing or stale."""
+    from models import CachedStat
+    row = db.session.get(CachedStat, ADMIN_STATS_KEY)
+    if row is None or datetime.utcnow() - row.refreshed_at > MAX_STALENESS:
+        return compute_admin_stats()
+    stats = json.loads(row.value)
+    stats['total_revenue'] = Decimal(stats['total_revenue'])
+    return stats
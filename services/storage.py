@@ -0,0 +1,180 @@
+"""Content-addressed, deduplicated upload store.
+
+Uploaded bytes are copied in fixed-size chunks to a temporary file inside
+STORAGE_FOLDER while being hashed, then moved to ``objects/<sha[:2]>/<sha>``
+there. STORAGE_FOLDER (default ``instance/storage``) is outside ``static/``:
+blobs, private certificates included, are only served by ``/files/<id>`` after
+its permission check. ``move_private_files`` moves the store and the legacy
+certificates that earlier versions kept under UPLOAD_FOLDER.
+Identical content is stored once (``StoredFile.ref_count`` counts the uploads
+pointing at it) and two uploads with the same name never overwrite each other.
+Werkzeug already spools large multipart files to disk, so a large PPTX or PDF
+is never held in memory in full.
+
+Files change only in the safe order around the caller's commit. A new blob is
+moved into place before its row is committed, so a committed row never points
+at a missing file; if the transaction rolls back instead, the file is left
+without a row and ``reconcile_notes`` removes it later. A released blob's file
+is deleted only after the commit that removed its row
+(``remove_released_blobs``).
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from extensions import db
+
+CHUNK_SIZE = 64 * 1024
+PRIVATE_DIRS = ('objects', 'certificates')  # kept under UPLOAD_FOLDER by earlier versions
+
+
+def storage_root():
+    return current_app.config.get('STORAGE_FOLDER') or os.path.join(current_app.instance_path, 'storage')
+
+
+def objects_root():
+    return os.path.join(storage_root(), 'objects')
+
+
+def blob_path(sha256):
+    """Absolute path of the blob with the given hex digest."""
+    return os.path.join(objects_root(), sha256[:2], sha256)
+
+
+def _spool_and_hash(stream):
+    """Copy ``stream`` to a temp file next to the object store; return (path, sha256, size)."""
+    tmp_dir = os.path.join(storage_root(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix='upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def _get_or_create_blob(sha256, size, mime_type, tmp_path):
+    """Find the blob row for ``sha256`` (moving ``tmp_path`` into place if new) and take a reference."""
+    from models import StoredFile
+    blob = StoredFile.query.filter_by(sha256=sha256).first()
+    if blob is None:
+        try:
+            with db.session.begin_nested():
+                blob = StoredFile(sha256=sha256, size=size, mime_type=mime_type, ref_count=0)
+                db.session.add(blob)
+        except IntegrityError:
+            # Another worker stored the same content concurrently
+            blob = StoredFile.query.filter_by(sha256=sha256).first()
+
+    # Same digest, same bytes: replacing an existing file is harmless, and restores it if a
+    # concurrent release deleted it after its own commit
+    target = blob_path(sha256)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+
+    StoredFile.query.filter_by(id=blob.id).update(
+        {'ref_count': StoredFile.ref_count + 1}, synchronize_session=False)
+    return blob
+
+
+def store_stream(stream, filename, kind, mime_type=None, uploader=None, department=None,
+                 subject=None, course=None):
+    """Store bytes read from ``stream`` and return the new (uncommitted) ``Upload`` row."""
+    from models import Upload
+    filename = secure_filename(filename) or 'upload'
+    mime_type = mime_type or mimetypes.guess_type(filename)[0]
+    tmp_path, sha256, size = _spool_and_hash(stream)
+    blob = _get_or_create_blob(sha256, size, mime_type, tmp_path)
+    upload = Upload(blob=blob, filename=filename, kind=kind,
+                    uploader_id=uploader.id if uploader else None, department=department,
+                    subject=subject, course=course)
+    db.session.add(upload)
+    return upload
+
+
+def store_upload(file, kind, uploader=None, department=None, subject=None, course=None):
+    """Store a Werkzeug ``FileStorage`` and return the new (uncommitted) ``Upload`` row."""
+    mime_type = file.mimetype if file.mimetype != 'application/octet-stream' else None
+    return store_stream(file.stream, file.filename, kind, mime_type=mime_type, uploader=uploader,
+                        department=department, subject=subject, course=course)
+
+
+def release_upload(upload):
+    """Delete an upload row and drop its blob row once nothing references it (caller commits).
+
+    Returns the blob's digest when its row was deleted, else None. Pass the
+    digests to ``remove_released_blobs`` after the commit.
+    """
+    from models import StoredFile
+    blob = upload.blob
+    db.session.delete(upload)
+    StoredFile.query.filter_by(id=blob.id).update(
+        {'ref_count': StoredFile.ref_count - 1}, synchronize_session=False)
+    db.session.refresh(blob)
+    if blob.ref_count <= 0:
+        db.session.delete(blob)
+        return blob.sha256
+    return None
+
+
+def remove_released_blobs(digests):
+    """Delete the files of blobs released by ``release_upload``, once their deletion is committed.
+
+    A digest that has been stored again since (a new row exists) keeps its file.
+    """
+    from models import StoredFile
+    for sha256 in set(filter(None, digests)):
+        if StoredFile.query.filter_by(sha256=sha256).first() is not None:
+            continue
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def upload_path(upload):
+    """Absolute path of the bytes behind an ``Upload``."""
+    return blob_path(upload.blob.sha256)
+
+
+
+def legacy_certificate_path(file_path):
+    """Path of a certificate uploaded before the store (``Certificate.file_path`` without an upload), or None."""
+    return safe_join(os.path.join(storage_root(), 'certificates'), file_path)
+
+
+def move_private_files():
+    """Move blobs and legacy certificates from UPLOAD_FOLDER (served publicly from static/) to STORAGE_FOLDER.
+
+    Returns the number of files moved; run by ``schema.bootstrap``.
+    """
+    moved = 0
+    for name in PRIVATE_DIRS:
+        legacy = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+        root = os.path.join(storage_root(), name)
+        if not os.path.isdir(legacy) or os.path.abspath(legacy) == os.path.abspath(root):
+            continue
+        for dirpath, _, filenames in os.walk(legacy):
+            for filename in filenames:
+                target = os.path.join(root, os.path.relpath(os.path.join(dirpath, filename), legacy))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(os.path.join(dirpath, filename), target)
+                moved += 1
+        shutil.rmtree(legacy, ignore_errors=True)
+    return moved
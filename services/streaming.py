@@ -0,0 +1,57 @@
+"""Streamed rendering for pages that list whole tables (users, certificates, leaves, fees).
+
+``render_page`` renders with ``stream_template`` when STREAM_TEMPLATES is on:
+the head of the page and the first rows go out while later rows are still
+being read, and the full HTML never sits in the worker as one string. Rows
+come from ``stream_rows``, which reads the query STREAM_BATCH_SIZE rows at a
+time with ``yield_per`` (a server-side cursor on PostgreSQL), so only one
+batch of ORM objects is alive at once. Jinja emits a chunk per output
+statement; chunks are joined to STREAM_BUFFER_SIZE bytes before they reach
+the server (and services.compression, which compresses streams as they go).
+
+Headers, including the session cookie, are sent before the body renders, so
+flashed messages are taken out of the session up front. The request's
+database session is also closed by then (app context teardown runs when the
+view returns): the body renders with a new one, the signed-in user is loaded
+again into it, and anything else the view passes in must either be a
+``stream_rows`` query or be loaded eagerly (joinedload) before returning.
+An error halfway through cuts the page short rather than turning it into an
+error page.
+"""
+from flask import current_app, g, get_flashed_messages, render_template, stream_template, stream_with_context
+
+STREAM_BUFFER_SIZE = 8 * 1024
+
+
+def stream_rows(query, batch_size=None):
+    """Iterate ``query`` ``batch_size`` rows at a time, starting only when the template reaches it."""
+    yield from query.yield_per(batch_size or current_app.config.get('STREAM_BATCH_SIZE', 500))
+
+
+def _coalesce(chunks, size):
+    buffer, buffered = [], 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= size:
+                yield ''.join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        chunks.close()  # a client gone mid-page releases the query cursor and the request context now
+
+
+def render_page(template, **context):
+    """``render_template``, streamed when STREAM_TEMPLATES is on."""
+    if not current_app.config.get('STREAM_TEMPLATES', True):
+        return render_template(template, **context)
+    get_flashed_messages()  # pops them now, while the session can still be saved
+
+    @stream_with_context
+    def generate():
+        g.pop('_login_user', None)  # reload current_user into the database session the body renders with
+        yield from stream_template(template, **context)
+
+    return current_app.response_class(_coalesce(generate(), STREAM_BUFFER_SIZE), mimetype='text/html')
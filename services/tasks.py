@@ -0,0 +1,307 @@
+"""Background execution of long admin operations, with progress tracking.
+
+Operations such as deleting a user with years of history, importing a large
+attendance CSV, exporting a department's attendance or promoting a semester
+run as *tasks*: the
+request inserts a ``task`` row and returns at once, and a runner works through
+the operation in chunks of TASK_CHUNK_SIZE rows, committing as it goes.
+``/admin/tasks/<id>`` shows a progress bar that polls ``/admin/tasks/<id>.json``.
+
+Tasks are plain functions registered with ``@task(kind)`` and called as
+``func(ctx, **params)``. ``ctx.set_total(n)`` and ``ctx.advance(k)`` record
+progress; the return value is stored as the task's JSON result.
+
+Where tasks run is set by TASK_RUNNER:
+
+* ``thread`` (default): a small pool of TASK_WORKERS threads in each web
+  process runs the tasks that process enqueued.
+* ``worker``: tasks stay queued for ``flask tasks worker``, a separate process
+  that claims them with a conditional UPDATE, like the job scheduler.
+* ``inline``: run inside ``enqueue`` (scripts and tests).
+
+A running task updates ``heartbeat_at`` with every progress report. If its
+runner dies, the next runner to start marks it failed after TASK_STALE_AFTER
+seconds without a heartbeat. Tasks still queued in a web process that stopped
+are picked up by the next thread pool to start (``init_app`` starts one on a
+process's first request); the claim keeps a task that is queued in two pools
+from running twice.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+POLL_INTERVAL = 2  # seconds
+
+_executor_lock = threading.Lock()
+
+
+def task(kind):
+    """Register ``func(ctx, **params)`` as the task ``kind``."""
+    def decorator(func):
+        TASKS[kind] = func
+        return func
+    return decorator
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def task_dir():
+    """Scratch directory for task input and output files (uploaded CSVs, exports)."""
+    path = os.path.join(current_app.instance_path, 'tasks')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class TaskContext:
+    """Handed to a running task to report progress; ``on_progress(ctx)`` is an optional observer."""
+
+    def __init__(self, task_id, chunk_size, on_progress=None):
+        self.task_id = task_id
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.done = 0
+        self.total = None
+        self.message = None
+
+    def set_total(self, total, message=None):
+        db.session.commit()  # end the counting query's read transaction before writing elsewhere
+        self.total = total
+        self._save(message)
+
+    def advance(self, count=1, message=None):
+        self.done += count
+        self._save(message)
+
+    def _save(self, message):
+        # On its own connection: committing the task's session here would end a streaming read
+        from models import Task
+        values = {'done': self.done, 'total': self.total, 'heartbeat_at': datetime.utcnow()}
+        if message is not None:
+            self.message = values['message'] = message[:255]
+        with db.engine.begin() as conn:
+            conn.execute(db.update(Task).where(Task.id == self.task_id).values(values))
+        if self.on_progress:
+            self.on_progress(self)
+
+
+def enqueue(kind, params=None, user=None):
+    """Record a queued task and hand it to the configured runner. Returns the ``Task`` row."""
+    from models import Task
+    if kind not in TASKS:
+        raise LookupError(f'No registered task named {kind!r}')
+    row = Task(kind=kind, params=json.dumps(params or {}),
+               created_by_id=user.id if user is not None else None)
+    db.session.add(row)
+    db.session.commit()
+    runner = current_app.config.get('TASK_RUNNER', 'thread')
+    if runner == 'inline':
+        run_task(row.id)
+    elif runner == 'thread':
+        app = current_app._get_current_object()
+        _executor(app).submit(_run_in_app, app, row.id)
+    return row
+
+
+def _executor(app):
+    """This process's thread pool (created lazily, so gunicorn --preload forks never share one)."""
+    with _executor_lock:
+        pid, executor = app.extensions.get('task_executor', (None, None))
+        if pid != os.getpid():
+            executor = ThreadPoolExecutor(max_workers=app.config.get('TASK_WORKERS', 2),
+                                          thread_name_prefix='task')
+            app.extensions['task_executor'] = (os.getpid(), executor)
+            recover_stale_tasks()
+            for task_id in queued_task_ids():
+                executor.submit(_run_in_app, app, task_id)
+        return executor
+
+
+def init_app(app):
+    """With TASK_RUNNER=thread, start this process's pool on its first request to run leftover queued tasks."""
+    if app.config.get('TASK_RUNNER', 'thread') != 'thread':
+        return
+
+    @app.before_request
+    def start_task_pool():
+        if app.extensions.get('task_executor', (None,))[0] != os.getpid():
+            _executor(app)
+
+
+def _run_in_app(app, task_id):
+    with app.app_context():
+        try:
+            run_task(task_id)
+        finally:
+            db.session.remove()
+
+
+def claim_task(task_id):
+    """Atomically move a queued task to running; True if this runner won it."""
+    from models import Task
+    now = datetime.utcnow()
+    claimed = Task.query.filter_by(id=task_id, status='queued').update(
+        {'status': 'running', 'locked_by': worker_id(), 'started_at': now, 'heartbeat_at': now},
+        synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def run_task(task_id, on_progress=None):
+    """Claim and run one queued task; returns the finished ``Task``, or None if another runner has it."""
+    from models import Task
+    if not claim_task(task_id):
+        return None
+    row = db.session.get(Task, task_id)
+    ctx = TaskContext(task_id, current_app.config.get('TASK_CHUNK_SIZE', 2000), on_progress)
+    try:
+        func = TASKS.get(row.kind)
+        if func is None:
+            raise LookupError(f'No registered task named {row.kind!r}')
+        result = func(ctx, **json.loads(row.params))
+        db.session.commit()
+        values = {'status': 'succeeded', 'result': json.dumps(result, default=str), 'error': None}
+        logger.info('Task %s (%s) finished: %s', task_id, row.kind, result)
+    except Exception as exc:
+        db.session.rollback()
+        values = {'status': 'failed', 'error': f'{type(exc).__name__}: {exc}'}
+        logger.exception('Task %s (%s) failed', task_id, row.kind)
+    values.update({'finished_at': datetime.utcnow(), 'locked_by': None})
+    Task.query.filter_by(id=task_id).update(values, synchronize_session=False)
+    db.session.commit()
+    db.session.expire_all()
+    return db.session.get(Task, task_id)
+
+
+def recover_stale_tasks():
+    """Fail running tasks whose runner stopped sending heartbeats. Returns how many."""
+    from models import Task
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('TASK_STALE_AFTER', 600))
+    count = Task.query.filter(Task.status == 'running', Task.heartbeat_at < cutoff).update(
+        {'status': 'failed', 'error': 'Interrupted: the runner stopped before the task finished.',
+         'finished_at': datetime.utcnow(), 'locked_by': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def queued_task_ids():
+    """Ids of the queued tasks, oldest first."""
+    from models import Task
+    return [task_id for task_id, in db.session.query(Task.id).filter_by(status='queued').order_by(Task.id.asc())]
+
+
+def run_queued_tasks():
+    """Run every queued task, oldest first. Returns the ids this runner completed."""
+    ran = []
+    for task_id in queued_task_ids():
+        if run_task(task_id) is not None:
+            ran.append(task_id)
+    return ran
+
+
+def run_worker(app, poll_interval=POLL_INTERVAL, stop_event=None):
+    """Task runner loop for TASK_RUNNER=worker: poll for queued tasks until stopped."""
+    with app.app_context():
+        recover_stale_tasks()
+    while not (stop_event and stop_event.is_set()):
+        with app.app_context():
+            try:
+                run_queued_tasks()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Task poll failed')
+            finally:
+                db.session.remove()
+        if stop_event:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+
+def serialize_task(row):
+    return {
+        'id': row.id, 'kind': row.kind, 'status': row.status, 'done': row.done, 'total': row.total,
+        'percent': row.percent, 'message': row.message, 'error': row.error,
+        'result': json.loads(row.result) if row.result else None,
+        'created_at': row.created_at.isoformat(),
+        'started_at': row.started_at.isoformat() if row.started_at else None,
+        'finished_at': row.finished_at.isoformat() if row.finished_at else None,
+    }
+
+
+# --- Tasks ------------------------------------------------------------------
+
+@task('delete_user')
+def delete_user(ctx, user_id):
+    """Delete a user and their history, chunk by chunk."""
+    from services.users import delete_user as delete, history_size
+    ctx.set_total(history_size(user_id) + 1, 'Deleting history')
+    return delete(user_id, chunk_size=ctx.chunk_size, progress=ctx.advance)
+
+
+@task('reset_except_admin')
+def reset_except_admin(ctx):
+    """Remove every record except Admin accounts."""
+    from services.users import reset_except_admin as reset, reset_size
+    ctx.set_total(reset_size(), 'Deleting records')
+    return reset(chunk_size=ctx.chunk_size, progress=ctx.advance)
+
+
+@task('import_attendance')
+def import_attendance(ctx, path, date_format=None, dry_run=False):
+    """Import an attendance CSV saved under task_dir(); the file is removed afterwards."""
+    from services.attendance import import_attendance_csv
+    try:
+        with open(path, 'rb') as fh:
+            ctx.set_total(max(sum(chunk.count(b'\n') for chunk in iter(lambda: fh.read(1 << 20), b'')) - 1, 0),
+                          'Importing')
+        with open(path, newline='', encoding='utf-8-sig') as fh:
+            def progress(report):
+                ctx.advance(report['read'] - ctx.done,
+                            f"{report['imported']:,} upserted, {report['rows_per_second']:,} rows/s")
+            report = import_attendance_csv(fh, batch_size=ctx.chunk_size, date_format=date_format,
+                                           dry_run=dry_run, progress=progress)
+        ctx.advance(report['read'] - ctx.done)
+        return report
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@task('export_attendance')
+def export_attendance(ctx, department=None, start=None, end=None):
+    """Write attendance as CSV (the import format) to task_dir() for download."""
+    from datetime import date
+    from services.attendance import count_attendance, export_attendance_csv
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    ctx.set_total(count_attendance(department, start, end), 'Exporting')
+    path = os.path.join(task_dir(), f'export-{ctx.task_id}.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        rows = export_attendance_csv(fh, department=department, start=start, end=end,
+                                     batch_size=ctx.chunk_size, progress=ctx.advance)
+    return {'path': path, 'rows': rows,
+            'filename': f"attendance-{department or 'all'}-{start or 'start'}-{end or 'end'}.csv"}
+
+
+@task('promote_semester')
+def promote_semester(ctx, **options):
+    """Promote a department/course cohort to the next semester (one transaction)."""
+    from services.promotion import promote_semester as promote
+    ctx.set_total(1, 'Promoting')
+    report = promote(**options)
+    ctx.advance(1, f"{report['promoted']:,} promoted, {report['graduating']:,} graduating")
+    return report
@@ -0,0 +1,294 @@
+"""Academic terms and term-partitioned attendance storage.
+
+A term is half a calendar year: ``<year>-1`` is January-June and ``<year>-2``
+July-December (the same halves the attendance analysis page has always called
+a semester). Attendance for a term lives in ``attendance_<year>_<n>``:
+
+* PostgreSQL: ``attendance`` is range-partitioned on ``date`` (migration 0006)
+  and each term is a native partition, so the planner prunes every term
+  outside a query's date range. Marks for a term without its own partition
+  land in ``attendance_default``; ``ensure_term_partition`` moves them into a
+  new partition, and the ``prepare_attendance_terms`` job creates the current
+  and next term's partitions ahead of time.
+* SQLite: the ``attendance`` table holds the open terms. ``archive_terms``
+  moves closed terms into per-term tables of the same shape, and
+  ``attendance_source`` adds them back (UNION ALL) only for queries whose
+  date range reaches into an archived term. Writes for an archived term's
+  dates go to its table (``upsert_attendance``).
+
+Either way, ``attendance_term`` records each term's table, and
+``attendance_source(start, end)`` is the FROM clause every read of a date
+range should use.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Column, Index, MetaData, Table
+
+from extensions import db
+
+ARCHIVE_BATCH = 50_000
+
+_tables = {}
+
+
+def term_label(day):
+    """Academic term containing ``day``: ``<year>-1`` for January-June, ``<year>-2`` for July-December."""
+    return f'{day.year}-{1 if day.month <= 6 else 2}'
+
+
+def current_term():
+    return term_label(date.today())
+
+
+def term_bounds(label):
+    """(first day, first day of the next term) of a term label such as ``2026-1``."""
+    try:
+        year, half = (int(part) for part in label.split('-'))
+    except (AttributeError, ValueError):
+        raise ValueError(f'Not a term label: {label!r}')
+    if half not in (1, 2):
+        raise ValueError(f'Not a term label: {label!r}')
+    start = date(year, 1 if half == 1 else 7, 1)
+    return start, date(year + 1, 1, 1) if half == 2 else date(year, 7, 1)
+
+
+def term_window(term):
+    """(label, start, end) for a term picker value: ``all`` is unbounded, anything invalid the current term."""
+    if term == 'all':
+        return term, None, None
+    try:
+        return (term, *term_bounds(term))
+    except ValueError:
+        term = current_term()
+        return (term, *term_bounds(term))
+
+
+def previous_term(label):
+    return term_label(term_bounds(label)[0] - timedelta(days=1))
+
+
+def next_term(label):
+    return term_label(term_bounds(label)[1])
+
+
+def terms_between(start, end):
+    """Labels of every term overlapping [start, end), oldest first."""
+    labels = []
+    label = term_label(start)
+    while term_bounds(label)[0] < end:
+        labels.append(label)
+        label = next_term(label)
+    return labels
+
+
+def recent_terms(count=6):
+    """The current term and the ``count - 1`` before it, newest first (for term pickers)."""
+    labels = [current_term()]
+    while len(labels) < count:
+        labels.append(previous_term(labels[-1]))
+    return labels
+
+
+def term_table_name(label):
+    return 'attendance_' + label.replace('-', '_')
+
+
+def _term_table(name):
+    """A Table with attendance's columns (no foreign key: archived history outlives constraints)."""
+    from models import Attendance
+    if name not in _tables:
+        columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+                   for c in Attendance.__table__.columns]
+        table = Table(name, MetaData(), *columns)
+        Index(f'uq_{name}_student_date_subject', table.c.student_id, table.c.date, table.c.subject_id,
+              unique=True)
+        _tables[name] = table
+    return _tables[name]
+
+
+def _archived_terms(start=None, end=None):
+    """AttendanceTerm rows of terms moved out of the SQLite hot table, optionally overlapping [start, end)."""
+    from models import AttendanceTerm
+    q = AttendanceTerm.query.filter(AttendanceTerm.storage == 'table')
+    if start is not None:
+        q = q.filter(AttendanceTerm.end_date > start)
+    if end is not None:
+        q = q.filter(AttendanceTerm.start_date < end)
+    return q.order_by(AttendanceTerm.start_date).all()
+
+
+def archived_tables():
+    """Tables of archived terms (SQLite); empty on PostgreSQL, where terms are partitions of attendance."""
+    return [_term_table(term.table_name) for term in _archived_terms()]
+
+
+def attendance_source(start=None, end=None):
+    """FROM clause (with attendance's columns) for marks dated in [start, end).
+
+    The hot ``attendance`` table unless the range reaches into archived terms,
+    in which case their tables are appended with UNION ALL. Callers still
+    filter on ``date`` themselves.
+    """
+    from models import Attendance
+    table = Attendance.__table__
+    if db.engine.dialect.name == 'postgresql':
+        return table  # partition pruning does the routing
+    archived = _archived_terms(start, end)
+    if not archived:
+        return table
+    names = [c.name for c in table.columns]
+    parts = [db.select(*[table.c[n] for n in names])]
+    for term in archived:
+        archive = _term_table(term.table_name)
+        parts.append(db.select(*[archive.c[n] for n in names]))
+    return db.union_all(*parts).subquery('attendance')
+
+
+def attendance_from_sql(start=None, end=None):
+    """``attendance_source`` as SQL text, for raw DB-API queries (it has no bound parameters)."""
+    source = attendance_source(start, end)
+    if isinstance(source, Table):
+        return source.name
+    return f'({source.element.compile(dialect=db.engine.dialect)})'
+
+
+def route_rows(rows):
+    """Split attendance dicts into {table: rows}; marks for archived terms go to their tables (SQLite)."""
+    from models import Attendance
+    table = Attendance.__table__
+    if not rows or db.session.connection().dialect.name == 'postgresql':
+        return {table: rows}
+    dates = [row['date'] for row in rows]
+    archived = {term.term: term for term in _archived_terms(min(dates), max(dates) + timedelta(days=1))}
+    if not archived:
+        return {table: rows}
+    routed = {}
+    for row in rows:
+        term = archived.get(term_label(row['date']))
+        target = _term_table(term.table_name) if term else table
+        routed.setdefault(target, []).append(row)
+    return routed
+
+
+# --- Partitions (PostgreSQL) and archival ------------------------------------
+
+def _register(label, storage, rows=None, archived=False):
+    from models import AttendanceTerm
+    start, end = term_bounds(label)
+    term = db.session.get(AttendanceTerm, label) or AttendanceTerm(
+        term=label, start_date=start, end_date=end, table_name=term_table_name(label), storage=storage)
+    if rows is not None:
+        term.rows = rows
+    if archived:
+        term.archived_at = datetime.utcnow()
+    db.session.add(term)
+    return term
+
+
+def _partition_exists(name):
+    return db.session.execute(db.text(
+        "SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'attendance'::regclass AND c.relname = :name"), {'name': name}).first() is not None
+
+
+def ensure_term_partition(label):
+    """Create ``label``'s partition (PostgreSQL), moving its rows out of the default partition. Caller commits."""
+    name = term_table_name(label)
+    if _partition_exists(name):
+        return _register(label, 'partition')
+    start, end = term_bounds(label)
+    params = {'start': start, 'end': end}
+    # Built detached and attached afterwards: a plain PARTITION OF would fail if the default
+    # partition already holds rows for this range
+    db.session.execute(db.text(f'CREATE TABLE {name} (LIKE attendance INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(db.text(f'INSERT INTO {name} SELECT * FROM attendance_default '
+                               f'WHERE date >= :start AND date < :end'), params)
+    db.session.execute(db.text('DELETE FROM attendance_default WHERE date >= :start AND date < :end'), params)
+    db.session.execute(db.text(f"ALTER TABLE attendance ATTACH PARTITION {name} "
+                               f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"))
+    return _register(label, 'partition')
+
+
+def prepare_terms():
+    """Make sure the current and next term have partitions (PostgreSQL; nothing to do on SQLite)."""
+    if db.engine.dialect.name != 'postgresql':
+        return []
+    labels = [current_term(), next_term(current_term())]
+    for label in labels:
+        ensure_term_partition(label)
+    db.session.commit()
+    return labels
+
+
+def closed_terms(before=None):
+    """Terms that ended before ``before`` and still have marks in the hot table (SQLite) or are not yet archived."""
+    from models import Attendance
+    before = before or current_term()
+    cutoff = term_bounds(before)[0]
+    oldest = db.session.query(db.func.min(Attendance.date)).scalar()
+    if oldest is None or oldest >= cutoff:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        from models import AttendanceTerm
+        archived = {term for term, in db.session.query(AttendanceTerm.term)
+                    .filter(AttendanceTerm.archived_at.isnot(None))}
+        return [label for label in terms_between(oldest, cutoff) if label not in archived]
+    return [label for label in terms_between(oldest, cutoff)
+            if Attendance.query.filter(Attendance.date >= term_bounds(label)[0],
+                                       Attendance.date < term_bounds(label)[1]).first() is not None]
+
+
+def archive_term(label, batch_size=ARCHIVE_BATCH):
+    """Move one closed term out of the hot table. Returns the number of marks in the term's table.
+
+    SQLite: the term is registered first, so reads already include its table,
+    then rows move in batches; each batch is inserted and deleted in one
+    transaction, so every mark is always in exactly one of the two tables.
+    PostgreSQL: the term gets its own partition and is marked archived.
+    """
+    from models import Attendance
+    from sqlalchemy.dialects import sqlite
+    start, end = term_bounds(label)
+    if label >= current_term():
+        raise ValueError(f'Term {label} has not ended yet')
+    if db.engine.dialect.name == 'postgresql':
+        ensure_term_partition(label)
+        count = db.session.execute(db.text(f'SELECT count(*) FROM {term_table_name(label)}')).scalar()
+        _register(label, 'partition', rows=count, archived=True)
+        db.session.commit()
+        return count
+
+    archive = _term_table(term_table_name(label))
+    archive.create(db.engine, checkfirst=True)
+    for index in archive.indexes:
+        index.create(db.engine, checkfirst=True)
+    _register(label, 'table')
+    db.session.commit()
+    hot = Attendance.__table__
+    names = [c.name for c in hot.columns]
+    in_term = db.and_(hot.c.date >= start, hot.c.date < end)
+    while True:
+        ids = [row_id for row_id, in db.session.execute(
+            db.select(hot.c.id).where(in_term).order_by(hot.c.id).limit(batch_size))]
+        if not ids:
+            break
+        # A mark written to the archive while the term was moving wins over the hot copy
+        db.session.execute(sqlite.insert(archive).from_select(
+            names, db.select(*[hot.c[n] for n in names]).where(hot.c.id.in_(ids))).on_conflict_do_nothing())
+        db.session.execute(hot.delete().where(hot.c.id.in_(ids)))
+        db.session.commit()
+    count = db.session.execute(db.select(db.func.count()).select_from(archive)).scalar()
+    _register(label, 'table', rows=count, archived=True)
+    db.session.commit()
+    return count
+
+
+def archive_terms(before=None, dry_run=False):
+    """Archive every closed term before ``before`` (default: the current term). Returns {term: marks}."""
+    labels = closed_terms(before)
+    if dry_run:
+        from models import Attendance
+        return {label: Attendance.query.filter(Attendance.date >= term_bounds(label)[0],
+                                               Attendance.date < term_bounds(label)[1]).count()
+                for label in labels}
+    return {label: archive_term(label) for label in labels}
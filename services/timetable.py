@@ -0,0 +1,44 @@
+"""Class timetables: the allotments a student attends and the ones a faculty member teaches.
+
+Shared by the dashboard and the JSON API so both list the same classes. The
+slot and the teaching faculty (with their user) are loaded with the allotments
+instead of one query per card.
+"""
+from sqlalchemy.orm import joinedload
+
+
+def _with_details(query):
+    from models import ClassAllotment, FacultyDetails
+    return query.options(joinedload(ClassAllotment.slot),
+                         joinedload(ClassAllotment.faculty).joinedload(FacultyDetails.user))
+
+
+def student_classes(profile):
+    """Allotments for the student's department and section (and course and semester, when set)."""
+    from models import ClassAllotment
+    q = ClassAllotment.query.filter_by(department_id=profile.department_id, section_id=profile.section_id)
+    if getattr(profile, 'course_id', None):
+        q = q.filter(ClassAllotment.course_id == profile.course_id)
+    if getattr(profile, 'semester', None) is not None:
+        q = q.filter(ClassAllotment.semester == profile.semester)
+    return _with_details(q).order_by(ClassAllotment.id)
+
+
+def faculty_classes(faculty):
+    """Allotments taught by ``faculty``."""
+    from models import ClassAllotment
+    return _with_details(faculty.allotments).order_by(ClassAllotment.id)
+
+
+def serialize_allotment(a):
+    return {
+        'id': a.id,
+        'subject': a.subject,
+        'department': a.department,
+        'course': a.course,
+        'semester': a.semester,
+        'class_name': a.class_name,
+        'faculty': a.faculty_name or a.faculty.user.username,
+        'slot': {'name': a.slot.name, 'day': a.slot.day_of_week,
+                 'start': a.slot.start_time, 'end': a.slot.end_time} if a.slot else None,
+    }
@@ -0,0 +1,194 @@
+"""Bulk removal of users and their history, in committed chunks.
+
+A student with several years of attendance owns tens of thousands of rows, and
+deleting them through ORM cascades loads every row into the session and holds
+one write transaction for the whole delete. Here the large child tables are
+deleted ``chunk_size`` ids at a time, each chunk its own short transaction, so
+other writers get the lock in between and ``progress(count)`` can report how
+far along the delete is. These run as background tasks (services/tasks.py).
+"""
+from extensions import db
+
+
+def _delete_in_chunks(model, condition, chunk_size, progress=None):
+    """DELETE rows of ``model`` matching ``condition``, ``chunk_size`` at a time. Returns the count."""
+    deleted = 0
+    while True:
+        ids = [row_id for row_id, in db.session.query(model.id).filter(condition).limit(chunk_size)]
+        if not ids:
+            return deleted
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if progress:
+            progress(len(ids))
+
+
+def _release_certificates(condition, chunk_size, progress=None):
+    """Delete certificates and release their uploaded files, ``chunk_size`` at a time."""
+    from models import Certificate
+    from services.storage import release_upload, remove_released_blobs
+    deleted = 0
+    while True:
+        chunk = Certificate.query.filter(condition).limit(chunk_size).all()
+        if not chunk:
+            return deleted
+        released = []
+        for certificate in chunk:
+            upload = certificate.upload
+            db.session.delete(certificate)
+            if upload is not None:
+                db.session.flush()
+                released.append(release_upload(upload))
+        db.session.commit()
+        remove_released_blobs(released)  # files go only once the rows' deletion is committed
+        deleted += len(chunk)
+        if progress:
+            progress(len(chunk))
+
+
+def _student_ids(user_id):
+    from models import StudentDetails
+    return db.session.query(StudentDetails.id).filter(StudentDetails.user_id == user_id).scalar_subquery()
+
+
+def history_size(user_id):
+    """Rows ``delete_user`` removes in chunks (attendance, fees, certificates, leaves)."""
+    from models import Attendance, Certificate, Fee, Leaves
+    from services.terms import archived_tables
+    student = _student_ids(user_id)
+    return sum(db.session.query(db.func.count(model.id)).filter(condition).scalar() for model, condition in (
+        (Attendance, Attendance.student_id.in_(student)),
+        (Fee, Fee.student_id.in_(student)),
+        (Certificate, Certificate.student_id.in_(student)),
+        (Leaves, Leaves.user_id == user_id),
+    )) + sum(db.session.execute(db.select(db.func.count()).select_from(table)
+                                .where(table.c.student_id.in_(student))).scalar() for table in archived_tables())
+
+
+def _delete_archived_attendance(condition, progress=None):
+    """DELETE matching marks from every archived term table (SQLite); ``condition(table)``. Returns the count."""
+    from services.terms import archived_tables
+    deleted = 0
+    for table in archived_tables():
+        count = db.session.execute(table.delete().where(condition(table))).rowcount
+        db.session.commit()
+        deleted += count
+        if progress and count:
+            progress(count)
+    return deleted
+
+
+def delete_user(user_id, chunk_size=2000, progress=None):
+    """Delete a user, their profile and everything hanging off it. Returns a summary dict."""
+    from models import (Attendance, AttendanceBitmap, Broadcast, BroadcastArchive, Certificate,
+                        ClassAllotmentRequest, Fee, Leaves, Task, Upload, User)
+    from services import search
+    from services.fragments import bump_version
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise LookupError(f'User {user_id} no longer exists')
+    username = user.username
+    student = _student_ids(user_id)
+    summary = {
+        'username': username,
+        'attendance': _delete_in_chunks(Attendance, Attendance.student_id.in_(student), chunk_size, progress),
+        'fees': _delete_in_chunks(Fee, Fee.student_id.in_(student), chunk_size, progress),
+        'certificates': _release_certificates(Certificate.student_id.in_(student), chunk_size, progress),
+        'leaves': _delete_in_chunks(Leaves, Leaves.user_id == user_id, chunk_size, progress),
+    }
+    summary['attendance'] += _delete_archived_attendance(lambda table: table.c.student_id.in_(student), progress)
+    AttendanceBitmap.query.filter(AttendanceBitmap.student_id.in_(student)).delete(synchronize_session=False)
+    if summary['attendance']:
+        bump_version('attendance')
+
+    # Rows that reference the user without being owned by the profile cascades
+    broadcast_ids = [b_id for b_id, in db.session.query(Broadcast.id).filter_by(created_by_id=user_id)]
+    if broadcast_ids:
+        Broadcast.query.filter(Broadcast.id.in_(broadcast_ids)).delete(synchronize_session=False)
+        search.remove_documents('broadcast', broadcast_ids)
+        bump_version('broadcasts')
+    summary['broadcasts'] = len(broadcast_ids)
+    for column in (BroadcastArchive.created_by_id, Task.created_by_id, Upload.uploader_id):
+        db.session.execute(db.update(column.class_).where(column == user_id).values({column: None}))
+    db.session.refresh(user)
+    profiles = [user.faculty_profile.id] if user.faculty_profile else []
+    hod_ids = [user.hod_profile.id] if user.hod_profile else []
+    if profiles or hod_ids:
+        ClassAllotmentRequest.query.filter(db.or_(
+            ClassAllotmentRequest.faculty_id.in_(profiles),
+            ClassAllotmentRequest.requesting_hod_id.in_(hod_ids),
+            ClassAllotmentRequest.responding_hod_id.in_(hod_ids),
+        )).delete(synchronize_session=False)
+
+    # What is left (profile, allotments, time slots) is small: let the ORM cascades handle it
+    db.session.delete(user)
+    bump_version('allotments')
+    db.session.commit()
+    if progress:
+        progress(1)
+    return summary
+
+
+def _reset_plan():
+    """(model, condition) pairs ``reset_except_admin`` deletes, children before parents."""
+    from models import (Attendance, AttendanceBitmap, Broadcast, BroadcastArchive, CachedStat, ClassAllotment,
+                        ClassAllotmentArchive, ClassAllotmentRequest, Event, FacultyDetails, Fee, HODDetails, Leaves,
+                        StudentDetails, TimeSlot, User)
+    from services.fragments import VERSION_PREFIX
+    admins = db.session.query(User.id).filter(User.role == 'Admin').scalar_subquery()
+    return [
+        (ClassAllotmentRequest, db.true()),
+        (ClassAllotment, db.true()),
+        (ClassAllotmentArchive, db.true()),
+        (TimeSlot, db.true()),
+        (Attendance, db.true()),
+        (AttendanceBitmap, db.true()),
+        (Fee, db.true()),
+        (Leaves, db.true()),
+        (Event, db.true()),
+        # NOT IN is NULL for a NULL author, so authorless rows need their own test (the old script deleted them)
+        (Broadcast, Broadcast.created_by_id.not_in(admins) | Broadcast.created_by_id.is_(None)),
+        (BroadcastArchive, BroadcastArchive.created_by_id.not_in(admins) | BroadcastArchive.created_by_id.is_(None)),
+        (StudentDetails, db.true()),
+        (FacultyDetails, db.true()),
+        (HODDetails, db.true()),
+        (User, User.role != 'Admin'),
+        # Keep the data versions counting up: back at 1, pre-reset fragments and snapshots would be valid again
+        (CachedStat, CachedStat.key.notlike(VERSION_PREFIX + '%')),
+    ]
+
+
+def reset_size():
+    """Rows ``reset_except_admin`` will delete."""
+    from models import Certificate
+    from services.terms import archived_tables
+    plan = [(Certificate, db.true())] + _reset_plan()
+    return sum(db.session.query(db.func.count()).select_from(model).filter(condition).scalar()
+               for model, condition in plan) + \
+        sum(db.session.execute(db.select(db.func.count()).select_from(table)).scalar() for table in archived_tables())
+
+
+def reset_except_admin(chunk_size=2000, progress=None):
+    """Remove every record except Admin accounts, in dependency order. Returns counts per table."""
+    from models import Task, Upload, User
+    from services import search
+    from services.fragments import bump_version
+    admins = db.session.query(User.id).filter(User.role == 'Admin').scalar_subquery()
+    for column in (Task.created_by_id, Upload.uploader_id):
+        db.session.execute(db.update(column.class_).where(column.not_in(admins)).values({column: None}))
+    db.session.commit()
+    summary = {'certificate': _release_certificates(db.true(), chunk_size, progress)}
+    for model, condition in _reset_plan():
+        if 'id' not in model.__table__.c:  # keyed by name or composite key, not id
+            summary[model.__tablename__] = model.query.filter(condition).delete(synchronize_session=False)
+            db.session.commit()
+        else:
+            summary[model.__tablename__] = _delete_in_chunks(model, condition, chunk_size, progress)
+        if model.__tablename__ == 'attendance':
+            summary['attendance'] += _delete_archived_attendance(lambda table: db.true(), progress)
+    search.reindex()
+    for namespace in ('attendance', 'allotments', 'broadcasts', 'events'):
+        bump_version(namespace)
+    db.session.commit()
+    return summary
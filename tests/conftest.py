@@ -0,0 +1,44 @@
+"""Fixtures: every test that takes ``app`` runs once on SQLite and once on PostgreSQL.
+
+Each run gets a fresh database upgraded to the latest migration. PostgreSQL is
+the server at TEST_POSTGRES_URL if set; otherwise one throwaway server is
+started for the session with the optional ``pgserver`` package (pip install
+pgserver), and its tests are skipped if that is not installed.
+"""
+import os
+
+import pytest
+
+from benchmarks.common import make_app, postgres_url
+
+
+@pytest.fixture(scope='session')
+def postgres_server(tmp_path_factory):
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if url:
+        yield url
+        return
+    pgserver = pytest.importorskip('pgserver', reason='PostgreSQL tests need TEST_POSTGRES_URL or pgserver')
+    server = pgserver.get_server(str(tmp_path_factory.mktemp('postgres')), cleanup_mode='stop')
+    yield server.get_uri()
+    server.cleanup()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def app(request):
+    db_url = postgres_url(request.getfixturevalue('postgres_server')) if request.param == 'postgresql' else None
+    app = make_app(db_url, TASK_RUNNER='inline')
+    with app.test_request_context():
+        yield app
+        from extensions import db
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def students(app):
+    """Ids of three seeded students (``StudentDetails.id``)."""
+    from benchmarks.common import seed_students
+    from models import StudentDetails
+    seed_students(3)
+    return [sid for sid, in StudentDetails.query.with_entities(StudentDetails.id).order_by(StudentDetails.id)]
@@ -0,0 +1,105 @@
+"""The code paths that differ between SQLite and PostgreSQL give the same results on both."""
+from datetime import date, datetime, timedelta
+
+from extensions import db
+
+
+def _mark(student_id, day, status, subject='Maths'):
+    return {'student_id': student_id, 'date': day, 'status': status, 'subject': subject}
+
+
+def _school_days(start, count):
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _old_term():
+    from services.terms import current_term, previous_term
+    return previous_term(previous_term(current_term()))
+
+
+def test_feed_pages_pinned_first_without_gaps(app):
+    from models import Broadcast, User
+    from services.broadcasts import feed
+    admin = User.query.filter_by(role='Admin').first()
+    tie = datetime(2026, 3, 1, 9, 0)
+    for i in range(9):
+        db.session.add(Broadcast(title=f'b{i}', content='c', created_by_id=admin.id, scope='institution',
+                                 created_at=tie if i % 3 else tie + timedelta(hours=i), is_pinned=i % 4 == 0))
+    db.session.add(Broadcast(title='other', content='c', created_by_id=admin.id, scope='department',
+                             department='CS'))
+    db.session.commit()
+
+    expected = [b.title for b in sorted(Broadcast.query.filter_by(scope='institution'),
+                                        key=lambda b: (b.is_pinned, b.created_at, b.id), reverse=True)]
+    seen, cursor = [], None
+    while True:
+        page, cursor = feed('institution', after=cursor, limit=2)
+        seen += [b.title for b in page]
+        if cursor is None:
+            break
+    assert seen == expected
+    assert [b.title for b in feed('department', 'CS')[0]] == ['other']
+
+
+def test_attendance_upsert_updates_in_place(app, students):
+    from models import Attendance
+    from services.attendance import student_attendance, upsert_attendance
+    day = date.today()
+    upsert_attendance([_mark(students[0], day, 'Present'), _mark(students[1], day, 'Present')])
+    db.session.commit()
+    upsert_attendance([_mark(students[0], day, 'Absent')])
+    db.session.commit()
+
+    assert Attendance.query.count() == 2
+    assert [tuple(row) for row in student_attendance(students[0])] == [(day, 'Maths', 'Absent')]
+
+
+def test_marks_of_an_archived_term_are_read_and_upserted_through_the_source(app, students):
+    from services.attendance import student_attendance, upsert_attendance
+    from services.terms import archive_term, attendance_source, closed_terms, term_bounds
+    old = _old_term()
+    start, end = term_bounds(old)
+    upsert_attendance([_mark(students[0], start + timedelta(days=7), 'Present'),
+                       _mark(students[0], date.today(), 'Present')])
+    db.session.commit()
+    assert old in closed_terms()
+
+    assert archive_term(old) == 1
+    assert old not in closed_terms()
+    # Later corrections to the closed term land next to its marks
+    upsert_attendance([_mark(students[0], start + timedelta(days=7), 'Absent'),
+                       _mark(students[0], start + timedelta(days=8), 'Present')])
+    db.session.commit()
+
+    assert [(row.date, row.status) for row in student_attendance(students[0], start, end)] == [
+        (start + timedelta(days=8), 'Present'), (start + timedelta(days=7), 'Absent')]
+    source = attendance_source(start, None)
+    assert db.session.execute(db.select(db.func.count()).select_from(source)).scalar() == 3
+
+
+def test_low_attendance_report_covers_one_term(app, students):
+    from services.attendance import compute_low_attendance, low_attendance, upsert_attendance
+    from services.terms import archive_term, current_term, term_bounds
+    old = _old_term()
+    this_term = _school_days(term_bounds(current_term())[0], 4)
+    last_year = _school_days(term_bounds(old)[0], 4)
+    upsert_attendance([_mark(students[0], day, 'Present' if n < 2 else 'Absent') for n, day in enumerate(this_term)]
+                      + [_mark(students[1], day, 'Present') for day in this_term]
+                      + [_mark(students[1], day, 'Absent') for day in last_year])
+    db.session.commit()
+    archive_term(old)
+
+    current = compute_low_attendance(threshold=75)
+    assert [(r['student_id'], r['subject'], r['present'], r['total'], r['percentage']) for r in current] == [
+        (students[0], 'Maths', 2, 4, 50.0)]
+    assert [(r['student_id'], r['percentage']) for r in compute_low_attendance(threshold=75, term=old)] == [
+        (students[1], 0.0)]
+    assert compute_low_attendance(threshold=0) == []
+    assert low_attendance(threshold=75) == current
+    assert low_attendance(threshold=75) == current  # served from cached_stat
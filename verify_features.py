@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 """Verify all broadcast and attendance analysis routes are properly configured."""
 from app import create_app
-from extensions import db
 
 app = create_app()
 
@@ -59,9 +58,8 @@ with app.app_context():
     print("DATABASE SCHEMA:")
     print("=" * 70)
     
-    from sqlalchemy import text
-    result = db.session.execute(text("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"))
-    tables = [row[0] for row in result]
+    from services.database import table_names
+    tables = table_names()
     
     critical_tables = {
         'broadcast': 'Broadcast Messages',